@@ -3,17 +3,22 @@ from tkinter import ttk, messagebox, filedialog
 from tkcalendar import DateEntry
 from datetime import datetime
 import getpass
-import pandas as pd
+import sqlite3
 
-from widgets import AutocompleteCombobox, add_row
-from db import get_inventory_conn, fetch_values, get_branches
+from widgets import AutocompleteCombobox, ProgressDialog, add_row
+from db import get_inventory_conn, inventory_writes, fetch_values, get_branches, next_asset_id, peek_asset_id
+from importer import import_records
+from worker import get_executor
+from probe import on_info
 
-def build_add_tab(root, notebook, platform_info, refresh_manage_callback=None):
+def build_add_tab(root, notebook, platform_info, refresh_manage_callback=None, tab=None):
     conn = get_inventory_conn()
     cursor = conn.cursor()
+    executor = get_executor(root)
 
-    tab = ttk.Frame(notebook)
-    notebook.add(tab, text="➕ ADD DEVICE")
+    if tab is None:
+        tab = ttk.Frame(notebook)
+        notebook.add(tab, text="➕ ADD DEVICE")
 
     form_frame = ttk.LabelFrame(tab, text="ASSET DETAIL", padding=15)
     form_frame.pack(fill="x", padx=20, pady=10)
@@ -26,19 +31,24 @@ def build_add_tab(root, notebook, platform_info, refresh_manage_callback=None):
     cb_status = ttk.Combobox(form_frame, values=[], state="readonly", width=30)
     cb_desc   = ttk.Combobox(form_frame, values=[], state="readonly", width=70)
 
-    brand, device_name, serial_number, manufactured_date = platform_info
     brand_entry = tk.Entry(form_frame, width=34)
-    brand_entry.insert(0, brand)
-    brand_entry.config(state="readonly")
     device_entry = tk.Entry(form_frame, width=34)
-    device_entry.insert(0, device_name)
-    device_entry.config(state="readonly")
     serial_entry = tk.Entry(form_frame, width=34)
-    serial_entry.insert(0, serial_number)
-    serial_entry.config(state="readonly")
     mdate_entry = tk.Entry(form_frame, width=34)
-    mdate_entry.insert(0, manufactured_date)
-    mdate_entry.config(state="readonly")
+    hardware_entries = (brand_entry, device_entry, serial_entry, mdate_entry)
+
+    def show_platform_info(info):
+        # called again when the background hardware probe finishes
+        nonlocal platform_info
+        platform_info = info
+        for entry, value in zip(hardware_entries, info):
+            entry.config(state="normal")
+            entry.delete(0, tk.END)
+            entry.insert(0, value)
+            entry.config(state="readonly")
+
+    show_platform_info(platform_info)
+    on_info(show_platform_info)
     date_acquired_entry = DateEntry(form_frame, width=32, background='darkblue',
                                     foreground='white', borderwidth=2, date_pattern='yyyy-mm-dd')
     date_acquired_entry.set_date(datetime.now())
@@ -93,6 +103,19 @@ def build_add_tab(root, notebook, platform_info, refresh_manage_callback=None):
         except: pass
 
     
+    def insert_record(c, values):
+        # runs on the write queue: allocate the asset id in the same transaction as the row
+        values = list(values)
+        values[1] = next_asset_id(c)
+        c.execute("""
+            INSERT INTO inventory (
+                asset_class, asset_id, asset_name, manufactured_date, date_acquired,
+                business_unit, department, branch, brand, description,
+                serial_number, custodian, device_status
+            ) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)
+        """, values)
+        return values[1]
+
     def save_to_db():
         required_fields = {
             "Tool of Trade": cb_asset.get().strip(),
@@ -119,23 +142,18 @@ def build_add_tab(root, notebook, platform_info, refresh_manage_callback=None):
             messagebox.showwarning("Duplicate Entry", "This serial number already exists in the database!")
             return
 
-        cursor.execute("SELECT COUNT(*) FROM inventory")
-        asset_id = f"ASSET_{cursor.fetchone()[0]+1:05d}"
-
-        cursor.execute("""
-            INSERT INTO inventory (
-                asset_class, asset_id, asset_name, manufactured_date, date_acquired,
-                business_unit, department, branch, brand, description,
-                serial_number, custodian, device_status
-            ) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)
-        """, (
-            cb_asset.get().strip(), asset_id, device_entry.get().strip(), mdate_entry.get().strip(),
+        values = [
+            cb_asset.get().strip(), None, device_entry.get().strip(), mdate_entry.get().strip(),
             date_acquired_entry.get_date().strftime("%Y-%m-%d"), cb_unit.get().strip(),
             cb_dept.get().strip(), cb_branch.get().strip(), brand_entry.get().strip(),
             cb_desc.get().strip(), serial_entry.get().strip(), custodian_entry.get().strip(),
             cb_status.get().strip()
-        ))
-        conn.commit()
+        ]
+        try:
+            inventory_writes().run(lambda c: insert_record(c, values))
+        except sqlite3.IntegrityError:
+            messagebox.showwarning("Duplicate Entry", "This serial number already exists in the database!")
+            return
         messagebox.showinfo("Saved", "Asset details saved successfully!")
         refresh_all_comboboxes()
         
@@ -152,8 +170,7 @@ def build_add_tab(root, notebook, platform_info, refresh_manage_callback=None):
         win.title("➕ Manual Entry")
         entry_widgets = {}
 
-        cursor.execute("SELECT COUNT(*) FROM inventory")
-        next_asset_id = f"ASSET_{cursor.fetchone()[0]+1:05d}"
+        preview_asset_id = peek_asset_id(conn)
 
         manual_fields = [
             "TOOL OF TRADE", "ASSET ID", "DEVICE NAME", "MANUFACTURED DATE",
@@ -185,7 +202,7 @@ def build_add_tab(root, notebook, platform_info, refresh_manage_callback=None):
                 entry_widgets[field] = de
             elif field == "ASSET ID":
                 entry = tk.Entry(win, width=35)
-                entry.insert(0, next_asset_id)
+                entry.insert(0, preview_asset_id)
                 entry.config(state="readonly")
                 entry.grid(row=i, column=1, padx=5, pady=3)
                 entry_widgets[field] = entry
@@ -214,15 +231,14 @@ def build_add_tab(root, notebook, platform_info, refresh_manage_callback=None):
                 messagebox.showwarning("Duplicate Entry", "This serial number already exists!")
                 return
 
-            cursor.execute("""
-                INSERT INTO inventory (
-                    asset_class, asset_id, asset_name, manufactured_date, date_acquired,
-                    business_unit, department, branch, brand, description,
-                    serial_number, custodian, device_status
-                ) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)
-            """, values)
-            conn.commit()
-            messagebox.showinfo("Saved", "Manual entry added successfully!")
+            # the form only previews the id; the real one is reserved with the insert
+            values[manual_fields.index("ASSET ID")] = None
+            try:
+                asset_id = inventory_writes().run(lambda c: insert_record(c, values))
+            except sqlite3.IntegrityError:
+                messagebox.showwarning("Duplicate Entry", "This serial number already exists!")
+                return
+            messagebox.showinfo("Saved", f"Manual entry {asset_id} added successfully!")
             win.destroy()
             refresh_all_comboboxes()
            
@@ -237,54 +253,31 @@ def build_add_tab(root, notebook, platform_info, refresh_manage_callback=None):
         if not file:
             return
 
-        try:
-            df = pd.read_csv(file) if file.lower().endswith(".csv") else pd.read_excel(file)
-            imported_count = 0
-            skipped_count = 0
-
-            for _, row in df.iterrows():
-                serial_number = row.get("SERIAL NUMBER", "").strip()
-                if not serial_number:
-                    skipped_count += 1
-                    continue
-
-                # Check for duplicate
-                cursor.execute("SELECT COUNT(*) FROM inventory WHERE serial_number=? AND cancelled=0", (serial_number,))
-                if cursor.fetchone()[0] > 0:
-                    skipped_count += 1
-                    continue
-
-                # Auto-generate ASSET ID if missing
-                cursor.execute("SELECT COUNT(*) FROM inventory")
-                asset_id = row.get("ASSET ID") or f"ASSET_{cursor.fetchone()[0]+1:05d}"
-
-                cursor.execute("""
-                    INSERT INTO inventory (
-                        asset_class, asset_id, asset_name, manufactured_date, date_acquired,
-                        business_unit, department, branch, brand, description,
-                        serial_number, custodian, device_status
-                    ) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)
-                """, (
-                    row.get("TOOL OF TRADE",""), asset_id, row.get("ASSET NAME",""),
-                    row.get("MANUFACTURED DATE",""), row.get("DATE RECEIVED",""),
-                    row.get("BUSINESS UNIT",""), row.get("DEPARTMENT",""), row.get("BRANCH",""),
-                    row.get("BRAND",""), row.get("ASSET DESCRIPTION",""), serial_number,
-                    row.get("CUSTODIAN",""), row.get("ASSET STATUS","")
-                ))
-                imported_count += 1
-
-            conn.commit()
+        progress_win = ProgressDialog(root, "Importing...")
+
+        # the import runs on a worker thread with its own write connection;
+        # progress is posted back to the Tk thread
+        def run(write_conn):
+            return import_records(write_conn, file,
+                                  progress=lambda processed, total: executor.post(progress_win.update_progress, processed, total))
+
+        def done(result):
+            imported_count, skipped_count = result
+            progress_win.destroy()
             messagebox.showinfo(
                 "Import Result",
                 f"Imported: {imported_count} records\nSkipped (duplicates/empty serial): {skipped_count}"
             )
-
             refresh_all_comboboxes()
             if refresh_manage_callback:
                 refresh_manage_callback()
 
-        except Exception as e:
-            return
+        def failed(e):
+            progress_win.destroy()
+            messagebox.showerror("Import Failed", f"Could not import {file}:\n{e}")
+
+        executor.submit(run, done, failed, write=True)
+
     # --- Buttons Frame ---
     btn_frame = tk.Frame(tab, bg="#E0DDD9")
     btn_frame.pack(pady=10)
@@ -298,4 +291,4 @@ def build_add_tab(root, notebook, platform_info, refresh_manage_callback=None):
         .grid(row=0, column=3, padx=5)
 
     refresh_all_comboboxes()
-    return tab
+    return tab, refresh_all_comboboxes
@@ -0,0 +1,307 @@
+"""
+Benchmarks for the inventory hot paths, run headlessly against synthetic data.
+
+    python bench.py                          # 10k and 100k rows
+    python bench.py --sizes 10000 100000 1000000 --repeat 5 --output results.json
+
+A seeded generator builds DeviceInventory-style databases (cached in
+--data-dir, so the 1M-row file is only generated once) and every benchmark
+drives the same records / importer / exporter layer the tabs use. Results are
+written as JSON so runs from different commits can be compared.
+"""
+import argparse
+import csv
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+from db import (get_manager, init_inventory_db, pause_search_trigger, resume_search_trigger,
+                reserve_asset_ids, format_asset_id)
+from records import FIELDS, REPORT_METRICS, RecordSource, search_source, report_counts, summary_branches, \
+    summary_total, changed_since, current_version, aging_report, acquisition_trend
+from importer import IMPORT_COLUMNS, import_records
+from exporter import export_records
+
+DEFAULT_SIZES = [10_000, 100_000]
+
+ASSET_CLASSES = ["LAPTOP", "DESKTOP", "MONITOR", "PRINTER", "SCANNER", "UPS", "ROUTER", "SWITCH", "TABLET", "PHONE"]
+BUSINESS_UNITS = ["RETAIL", "CORPORATE", "OPERATIONS", "FINANCE", "SALES"]
+DEPARTMENTS = ["IT", "HR", "ACCOUNTING", "AUDIT", "LOGISTICS", "MARKETING", "LEGAL", "TREASURY", "ADMIN", "COLLECTIONS"]
+BRANCHES = ["HOME OFFICE"] + [f"BRANCH {city}" for city in (
+    "ANGELES", "BACOLOD", "BAGUIO", "BATANGAS", "BUTUAN", "CABANATUAN", "CAGAYAN", "CALAMBA", "CEBU", "DAGUPAN",
+    "DAVAO", "DUMAGUETE", "GENSAN", "ILOILO", "LAOAG", "LEGAZPI", "LIPA", "LUCENA", "MAKATI", "MALOLOS",
+    "NAGA", "ORMOC", "PASIG", "QUEZON", "ROXAS", "SAN FERNANDO", "TACLOBAN", "TAGUIG", "TARLAC", "ZAMBOANGA")]
+BRANDS = ["DELL", "HP", "LENOVO", "ACER", "ASUS", "APPLE", "EPSON", "CANON", "CISCO", "APC"]
+# weights roughly match a live inventory: most devices active, a tail in each other state
+STATUSES = [("ACTIVE", 80), ("FOR REPLACEMENT", 7), ("FOR REPAIR", 5), ("RETIRED", 4), ("FOR DISPOSAL", 4)]
+CANCELLED_RATE = 0.03
+
+
+# --- synthetic data ---
+def synthetic_rows(count, seed, start=0):
+    """Yield ``count`` inventory rows (IMPORT_COLUMNS order, blank asset_id) from a seeded generator."""
+    rng = random.Random(seed)
+    statuses, weights = zip(*STATUSES)
+    epoch = date(2015, 1, 1)
+    for i in range(start, start + count):
+        asset_class = rng.choice(ASSET_CLASSES)
+        brand = rng.choice(BRANDS)
+        manufactured = epoch + timedelta(days=rng.randrange(3650))
+        acquired = manufactured + timedelta(days=rng.randrange(365))
+        yield [
+            asset_class, "", f"{brand} {asset_class} {i:07d}", manufactured.isoformat(), acquired.isoformat(),
+            rng.choice(BUSINESS_UNITS), rng.choice(DEPARTMENTS), rng.choice(BRANCHES), brand,
+            f"{brand} {asset_class} {rng.choice(('STANDARD', 'PERFORMANCE', 'COMPACT', 'RUGGED'))}",
+            f"SN{seed:03d}{i:08d}{rng.randrange(16 ** 4):04X}", f"EMPLOYEE {rng.randrange(count // 3 + 1):06d}",
+            rng.choices(statuses, weights)[0],
+        ]
+
+
+def generate_db(path, rows, seed=42, chunk_size=10_000):
+    """Create a fully initialised inventory database with ``rows`` synthetic records."""
+    init_inventory_db(path)
+    conn = get_manager(path).writer()
+    cur = conn.cursor()
+    for table, names in (("asset_classes", ASSET_CLASSES), ("business_units", BUSINESS_UNITS),
+                         ("departments", DEPARTMENTS), ("branches", BRANCHES),
+                         ("device_status", [s for s, _ in STATUSES])):
+        cur.executemany(f"INSERT OR IGNORE INTO {table} (name) VALUES (?)", [(n,) for n in names])
+    conn.commit()
+    columns = list(IMPORT_COLUMNS.values()) + ["cancelled"]
+    sql = f"INSERT INTO inventory ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+    rng = random.Random(seed + 1)
+    with conn:
+        cur.execute("BEGIN IMMEDIATE")
+        search_trigger = pause_search_trigger(cur)
+        batch = []
+        for row in synthetic_rows(rows, seed):
+            batch.append(row + [1 if rng.random() < CANCELLED_RATE else 0])
+            if len(batch) == chunk_size:
+                _insert_batch(conn, cur, sql, batch)
+                batch = []
+        if batch:
+            _insert_batch(conn, cur, sql, batch)
+        resume_search_trigger(cur, search_trigger, 0)
+    cur.execute("ANALYZE")
+    cur.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    get_manager(path).close()
+
+
+def _insert_batch(conn, cur, sql, batch):
+    for row, number in zip(batch, reserve_asset_ids(conn, len(batch))):
+        row[1] = format_asset_id(number)
+    cur.executemany(sql, batch)
+
+
+def dataset(data_dir, rows, seed):
+    """Path of the cached synthetic database for (rows, seed), generating it if needed."""
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f"inventory_{rows}_{seed}.db")
+    if not os.path.exists(path):
+        partial = path + ".partial"
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(partial + suffix):
+                os.remove(partial + suffix)
+        started = time.perf_counter()
+        generate_db(partial, rows, seed)
+        os.replace(partial, path)
+        print(f"generated {path} in {time.perf_counter() - started:.1f}s")
+    return path
+
+
+def write_import_file(path, rows, seed):
+    """A CSV in the spreadsheet layout the Import button accepts."""
+    with open(path, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.writer(f)
+        writer.writerow(IMPORT_COLUMNS)
+        writer.writerows(synthetic_rows(rows, seed, start=10 ** 7))
+
+
+# --- benchmarks: each takes (conn, context) and returns the number of rows touched ---
+def bench_load_all(conn, ctx):
+    """Manage tab initial load: count + first page, then a jump to the middle of the list."""
+    source = RecordSource(conn, FIELDS, "cancelled=0", counter=lambda: summary_total(conn, 0))
+    total = source.count()
+    rows = len(source.fetch(None, 200))
+    middle = source.key_at(total // 2)
+    return rows + len(source.fetch(middle, 200))
+
+
+def bench_search(conn, ctx):
+    """Search box: count + first page for a trigram term and a short (LIKE) term."""
+    touched = 0
+    for term in ("CEBU", "LAPTOP 00012", "HP"):
+        source = search_source(conn, term, FIELDS, "cancelled=0")
+        source.count()
+        touched += len(source.fetch(None, 200))
+    return touched
+
+
+def bench_report_counts(conn, ctx):
+    """Reports tab refresh: every metric plus the branch list."""
+    report_counts(conn)
+    return len(summary_branches(conn))
+
+
+def bench_trends(conn, ctx):
+    """Aging & Trends panel: every report, overall and per branch/department."""
+    rows = 0
+    for group_by in (None, "branch", "department"):
+        rows += len(aging_report(conn, "acquired", group_by))
+        rows += len(aging_report(conn, "manufactured", group_by))
+        rows += len(acquisition_trend(conn, group_by))
+    return rows
+
+
+def bench_drilldown(conn, ctx):
+    """Clicking each report metric: count + first page of its records."""
+    touched = 0
+    for where in REPORT_METRICS.values():
+        source = RecordSource(conn, FIELDS, where)
+        source.count()
+        touched += len(source.fetch(None, 200))
+    return touched
+
+
+def bench_changed_since(conn, ctx):
+    """Refresh after an edit: the rows changed since the previous version."""
+    ids, _ = changed_since(conn, ctx["version"] - 10)
+    return len(ids)
+
+
+def prepare_import(ctx):
+    """Untimed: a scratch copy of the dataset for the import to write into."""
+    ctx["scratch"] = os.path.join(ctx["tmp"], "import.db")
+    get_manager(ctx["scratch"]).close()
+    for suffix in ("-wal", "-shm"):
+        if os.path.exists(ctx["scratch"] + suffix):
+            os.remove(ctx["scratch"] + suffix)
+    shutil.copyfile(ctx["db"], ctx["scratch"])
+
+
+def bench_import(conn, ctx):
+    """Import button: stream the CSV into a scratch copy of the database."""
+    with get_manager(ctx["scratch"]).connection() as target:
+        imported, _ = import_records(target, ctx["import_file"])
+    return imported
+
+
+def bench_export_csv(conn, ctx):
+    """Export Filtered (CSV) of every active record."""
+    source = RecordSource(conn, FIELDS, "cancelled=0")
+    return export_records(source, os.path.join(ctx["tmp"], "export.csv"), FIELDS)
+
+
+def bench_export_xlsx(conn, ctx):
+    """Export Filtered (XLSX, write-only workbook) of every active record."""
+    source = RecordSource(conn, FIELDS, "cancelled=0")
+    return export_records(source, os.path.join(ctx["tmp"], "export.xlsx"), FIELDS)
+
+
+BENCHMARKS = {
+    "load_all": bench_load_all,
+    "search": bench_search,
+    "report_counts": bench_report_counts,
+    "trends": bench_trends,
+    "drilldown": bench_drilldown,
+    "changed_since": bench_changed_since,
+    "import": bench_import,
+    "export_csv": bench_export_csv,
+    "export_xlsx": bench_export_xlsx,
+}
+# untimed setup run before every timed run of a benchmark
+SETUP = {"import": prepare_import}
+# too slow to repeat on the large datasets by default; run them with --only
+SLOW_BENCHMARKS = {"export_xlsx"}
+
+
+def run_benchmark(name, db_path, ctx, repeat):
+    fn, setup = BENCHMARKS[name], SETUP.get(name)
+    timings = []
+    touched = 0
+    for _ in range(repeat):
+        if setup:
+            setup(ctx)
+        # a fresh connection per run, so page cache warm-up is part of every timing
+        with get_manager(db_path).connection() as conn:
+            started = time.perf_counter()
+            touched = fn(conn, ctx)
+            timings.append(time.perf_counter() - started)
+    return {
+        "runs": repeat,
+        "rows": touched,
+        "min_s": min(timings),
+        "median_s": statistics.median(timings),
+        "max_s": max(timings),
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run(sizes, names, repeat=3, seed=42, data_dir="bench_data", import_rows=None):
+    report = {
+        "commit": _git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "seed": seed,
+        "results": [],
+    }
+    for size in sizes:
+        db_path = dataset(data_dir, size, seed)
+        with tempfile.TemporaryDirectory() as tmp:
+            import_file = os.path.join(tmp, "import.csv")
+            write_import_file(import_file, import_rows or max(size // 10, 1000), seed)
+            with get_manager(db_path).connection() as conn:
+                version = current_version(conn)
+            ctx = {"db": db_path, "tmp": tmp, "import_file": import_file, "version": version}
+            for name in names:
+                result = run_benchmark(name, db_path, ctx, repeat)
+                result.update(dataset_rows=size, benchmark=name)
+                report["results"].append(result)
+                print(f"{size:>9,} rows  {name:<14} median {result['median_s'] * 1000:10.1f} ms"
+                      f"  (min {result['min_s'] * 1000:.1f}, {result['rows']:,} rows)")
+        get_manager(db_path).close()
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the inventory hot paths on synthetic data.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                        help="dataset sizes in rows (default: 10000 100000)")
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS), help="benchmarks to run")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per benchmark (median is reported)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--data-dir", default="bench_data", help="where generated databases are cached")
+    parser.add_argument("--import-rows", type=int, help="rows in the import file (default: 10%% of the dataset)")
+    parser.add_argument("--output", help="JSON results file (default: bench_results/<timestamp>.json)")
+    args = parser.parse_args(argv)
+
+    names = args.only or [name for name in BENCHMARKS if name not in SLOW_BENCHMARKS]
+    report = run(args.sizes, names, args.repeat, args.seed, args.data_dir, args.import_rows)
+    output = args.output
+    if not output:
+        os.makedirs("bench_results", exist_ok=True)
+        output = os.path.join("bench_results", f"{datetime.now():%Y%m%d-%H%M%S}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
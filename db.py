@@ -1,8 +1,13 @@
 import sqlite3
 from pathlib import Path
+from contextlib import contextmanager
+import atexit
+import threading
 import sys
 import os
 
+from tracing import connection_factory
+
 # Determine base directory depending on whether running as .exe or .py
 if getattr(sys, 'frozen', False):
     BASE_DIR = Path(sys._MEIPASS)  # PyInstaller temp folder
@@ -15,14 +20,188 @@ else:
 DB_FILE = str(EXE_DIR / "DeviceInventory.db")
 ACCOUNTS_DB = str(EXE_DIR / "accounts.db")
 
+# Inventory columns covered by the full-text search index
+SEARCH_COLUMNS = [
+    "asset_class", "asset_id", "asset_name", "manufactured_date", "business_unit",
+    "department", "branch", "brand", "description", "serial_number",
+    "custodian", "device_status"
+]
+
+# columns the record grids are commonly sorted by (see records.RecordSource.sorted_by)
+SORT_INDEX_COLUMNS = ["branch", "device_status", "date_acquired", "custodian"]
+
+# --- Connections ---
+# Tuning applied to every connection; override with INVENTORY_<NAME> env vars.
+BUSY_TIMEOUT_MS = int(os.environ.get("INVENTORY_BUSY_TIMEOUT_MS", 10000))
+CACHE_SIZE_KB = int(os.environ.get("INVENTORY_CACHE_SIZE_KB", 32768))
+MMAP_SIZE = int(os.environ.get("INVENTORY_MMAP_SIZE", 256 * 1024 * 1024))
+STATEMENT_CACHE = 256
+READER_POOL_SIZE = 4
+
+
+def _journal_mode(path):
+    # WAL needs shared memory between processes, which a network share
+    # (\\server\share\...) cannot provide; keep the rollback journal there.
+    mode = os.environ.get("INVENTORY_JOURNAL_MODE")
+    if mode:
+        return mode
+    return "DELETE" if path.startswith(("\\\\", "//")) else "WAL"
+
+
+class ConnectionManager:
+    """
+    One shared writer connection plus a small pool of reader connections per
+    database file, all opened with the same tuned pragmas.
+    - writer(): the long-lived connection every module writes through.
+      It and the group-commit queue run with synchronous=FULL: a write they
+      acknowledge has been fsynced, as with SQLite's default. Readers use NORMAL.
+    - reader(): context manager lending a read-only connection from the pool.
+    """
+    def __init__(self, path, readers=READER_POOL_SIZE):
+        self.path = path
+        self.max_readers = readers
+        self._writer = None
+        self._readers = []
+        self._write_queue = None
+        self._result_cache = None
+        self._lock = threading.Lock()
+
+    def _connect(self, synchronous="NORMAL"):
+        conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_MS / 1000, factory=connection_factory(),
+                               check_same_thread=False, cached_statements=STATEMENT_CACHE)
+        conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+        conn.execute(f"PRAGMA journal_mode = {_journal_mode(self.path)}")
+        conn.execute(f"PRAGMA synchronous = {synchronous}")
+        conn.execute(f"PRAGMA cache_size = -{CACHE_SIZE_KB}")
+        conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        return conn
+
+    def writer(self):
+        with self._lock:
+            if self._writer is None:
+                self._writer = self._connect("FULL")
+            return self._writer
+
+    @contextmanager
+    def reader(self):
+        with self._lock:
+            conn = self._readers.pop() if self._readers else None
+        if conn is None:
+            conn = self._connect()
+            conn.execute("PRAGMA query_only = 1")
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            with self._lock:
+                if len(self._readers) < self.max_readers:
+                    self._readers.append(conn)
+                    conn = None
+            if conn is not None:
+                conn.close()
+
+    @contextmanager
+    def connection(self):
+        """A private tuned connection for long-running work (e.g. a bulk import on a worker thread)."""
+        conn = self._connect()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def write_queue(self):
+        """The group-commit queue for small mutations (see writequeue.py), on its own connection."""
+        with self._lock:
+            if self._write_queue is None:
+                from writequeue import WriteQueue
+                self._write_queue = WriteQueue(lambda: self._connect("FULL"))
+            return self._write_queue
+
+    def result_cache(self):
+        """The read result cache (see resultcache.py), watching data_version on its own connection."""
+        with self._lock:
+            if self._result_cache is None:
+                from resultcache import ResultCache
+                self._result_cache = ResultCache(self._connect)
+            return self._result_cache
+
+    def close(self):
+        if self._write_queue is not None:
+            self._write_queue.close()
+            self._write_queue = None
+        if self._result_cache is not None:
+            self._result_cache.close()
+            self._result_cache = None
+        with self._lock:
+            for conn in self._readers + ([self._writer] if self._writer else []):
+                conn.close()
+            self._readers = []
+            self._writer = None
+
+
+_managers = {}
+_managers_lock = threading.Lock()
+
+# Client mode: with INVENTORY_SERVICE_URL set the databases are reached through
+# the inventory service (service.py) instead of opening the files directly.
+SERVICE_URL = os.environ.get("INVENTORY_SERVICE_URL") or None
+
+def use_service(url):
+    """Switch between direct file access (None) and the inventory service at ``url``."""
+    global SERVICE_URL
+    close_all()
+    with _managers_lock:
+        _managers.clear()
+    SERVICE_URL = url or None
+
+def get_manager(path):
+    with _managers_lock:
+        if path not in _managers:
+            if SERVICE_URL:
+                from service_client import ServiceManager
+                names = {DB_FILE: "inventory", ACCOUNTS_DB: "accounts"}
+                if path not in names:
+                    raise ValueError(f"{path} is not served by the inventory service")
+                _managers[path] = ServiceManager(SERVICE_URL, names[path])
+            else:
+                _managers[path] = ConnectionManager(path)
+        return _managers[path]
+
+@atexit.register
+def close_all():
+    with _managers_lock:
+        for manager in _managers.values():
+            manager.close()
+
 def get_inventory_conn():
-    return sqlite3.connect(DB_FILE)
+    """The shared inventory writer connection (do not close it)."""
+    return get_manager(DB_FILE).writer()
 
 def get_accounts_conn():
-    return sqlite3.connect(ACCOUNTS_DB)
+    """The shared accounts writer connection (do not close it)."""
+    return get_manager(ACCOUNTS_DB).writer()
+
+def inventory_reader():
+    """``with inventory_reader() as conn:`` borrows a pooled read-only connection."""
+    return get_manager(DB_FILE).reader()
+
+def accounts_reader():
+    return get_manager(ACCOUNTS_DB).reader()
 
-def init_inventory_db():
-    conn = get_inventory_conn()
+def inventory_writes():
+    """``inventory_writes().run(lambda conn: ...)`` applies a mutation through group commit."""
+    return get_manager(DB_FILE).write_queue()
+
+def inventory_cache():
+    """Result cache for repeated inventory reads, e.g. RecordSource(..., cache=inventory_cache())."""
+    return get_manager(DB_FILE).result_cache()
+
+def init_inventory_db(path=DB_FILE):
+    if SERVICE_URL:
+        return  # the service creates and migrates the database it owns
+    conn = get_manager(path).writer()
     cur = conn.cursor()
     cur.execute("""
     CREATE TABLE IF NOT EXISTS inventory (
@@ -50,11 +229,355 @@ def init_inventory_db():
     cur.execute("CREATE TABLE IF NOT EXISTS departments (name TEXT UNIQUE)")
     cur.execute("CREATE TABLE IF NOT EXISTS branches (name TEXT UNIQUE)")
     cur.execute("CREATE TABLE IF NOT EXISTS device_status (name TEXT UNIQUE)")
+    # Base schema, deliberately outside the user_version migrations: these steps
+    # predate the runner (databases from before it have them at user_version 0),
+    # each one checks what is already there, and repeating them costs a few
+    # sqlite_master lookups. The search index must be retried on every start
+    # anyway: it is skipped on SQLite builds without FTS5, and a numbered step
+    # would never run again after an upgrade to a build that has it.
+    # New schema changes go into INVENTORY_MIGRATIONS.
+    init_search_index(cur)
+    init_summary_counts(cur)
+    init_change_tracking(cur)
+    init_asset_sequence(cur)
     conn.commit()
-    conn.close()
+    migrate_inventory_db(conn)
+
+def init_search_index(cur):
+    """
+    Create the FTS5 trigram index over SEARCH_COLUMNS and the triggers that keep
+    it in sync with inventory. Existing databases get the index built once.
+    Silently skipped when the SQLite build has no FTS5/trigram support.
+    """
+    cur.execute("SELECT 1 FROM sqlite_master WHERE name='inventory_fts'")
+    if cur.fetchone():
+        return
+    cols = ", ".join(SEARCH_COLUMNS)
+    new_vals = ", ".join(f"new.{c}" for c in SEARCH_COLUMNS)
+    old_vals = ", ".join(f"old.{c}" for c in SEARCH_COLUMNS)
+    try:
+        cur.execute(f"""
+            CREATE VIRTUAL TABLE inventory_fts USING fts5(
+                {cols}, content='inventory', content_rowid='id', tokenize='trigram'
+            )
+        """)
+    except sqlite3.OperationalError:
+        return
+    cur.executescript(f"""
+        CREATE TRIGGER IF NOT EXISTS inventory_fts_insert AFTER INSERT ON inventory BEGIN
+            INSERT INTO inventory_fts(rowid, {cols}) VALUES (new.id, {new_vals});
+        END;
+        CREATE TRIGGER IF NOT EXISTS inventory_fts_delete AFTER DELETE ON inventory BEGIN
+            INSERT INTO inventory_fts(inventory_fts, rowid, {cols}) VALUES ('delete', old.id, {old_vals});
+        END;
+        CREATE TRIGGER IF NOT EXISTS inventory_fts_update AFTER UPDATE OF {cols} ON inventory BEGIN
+            INSERT INTO inventory_fts(inventory_fts, rowid, {cols}) VALUES ('delete', old.id, {old_vals});
+            INSERT INTO inventory_fts(rowid, {cols}) VALUES (new.id, {new_vals});
+        END;
+    """)
+    cur.execute("INSERT INTO inventory_fts(inventory_fts) VALUES ('rebuild')")
+
+def init_summary_counts(cur):
+    """
+    Create inventory_summary: record counts per (device_status, branch, cancelled),
+    kept current by triggers so reports never have to scan inventory.
+    Existing databases get the counts built once.
+    """
+    cur.execute("SELECT 1 FROM sqlite_master WHERE name='inventory_summary'")
+    if cur.fetchone():
+        return
+    cur.executescript("""
+        CREATE TABLE inventory_summary (
+            device_status TEXT NOT NULL,
+            branch TEXT NOT NULL,
+            cancelled INTEGER NOT NULL,
+            total INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (device_status, branch, cancelled)
+        );
+        CREATE TRIGGER IF NOT EXISTS inventory_summary_insert AFTER INSERT ON inventory BEGIN
+            INSERT INTO inventory_summary (device_status, branch, cancelled, total)
+            VALUES (IFNULL(new.device_status, ''), IFNULL(new.branch, ''), IFNULL(new.cancelled, 0), 1)
+            ON CONFLICT (device_status, branch, cancelled) DO UPDATE SET total = total + 1;
+        END;
+        CREATE TRIGGER IF NOT EXISTS inventory_summary_delete AFTER DELETE ON inventory BEGIN
+            UPDATE inventory_summary SET total = total - 1
+            WHERE device_status = IFNULL(old.device_status, '') AND branch = IFNULL(old.branch, '')
+              AND cancelled = IFNULL(old.cancelled, 0);
+        END;
+        CREATE TRIGGER IF NOT EXISTS inventory_summary_update
+        AFTER UPDATE OF device_status, branch, cancelled ON inventory BEGIN
+            UPDATE inventory_summary SET total = total - 1
+            WHERE device_status = IFNULL(old.device_status, '') AND branch = IFNULL(old.branch, '')
+              AND cancelled = IFNULL(old.cancelled, 0);
+            INSERT INTO inventory_summary (device_status, branch, cancelled, total)
+            VALUES (IFNULL(new.device_status, ''), IFNULL(new.branch, ''), IFNULL(new.cancelled, 0), 1)
+            ON CONFLICT (device_status, branch, cancelled) DO UPDATE SET total = total + 1;
+        END;
+    """)
+    cur.execute(SUMMARY_REBUILD_SQL)
 
-def init_user_db():
-    conn = get_accounts_conn()
+SUMMARY_REBUILD_SQL = """
+    INSERT INTO inventory_summary (device_status, branch, cancelled, total)
+    SELECT IFNULL(device_status, ''), IFNULL(branch, ''), IFNULL(cancelled, 0), COUNT(*)
+    FROM inventory GROUP BY 1, 2, 3
+"""
+
+def _month_of(column):
+    # 'YYYY-MM' of an ISO date; a bare year counts as its January; anything else is ''
+    return (f"CASE WHEN {column} GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]*' THEN substr({column}, 1, 7) "
+            f"WHEN {column} GLOB '[0-9][0-9][0-9][0-9]' THEN {column} || '-01' ELSE '' END")
+
+# kind of inventory_monthly row -> the date column it counts
+ROLLUP_DATES = {"acquired": "date_acquired", "manufactured": "manufactured_date"}
+
+MONTHLY_REBUILD_SQL = " UNION ALL ".join(f"""
+    SELECT '{kind}', {_month_of(column)}, IFNULL(branch, ''), IFNULL(department, ''), IFNULL(cancelled, 0), COUNT(*)
+    FROM inventory GROUP BY 2, 3, 4, 5""" for kind, column in ROLLUP_DATES.items())
+
+def rebuild_derived_tables(conn):
+    """
+    Recompute everything the triggers maintain from inventory itself: the
+    search index, inventory_summary and inventory_monthly. For repairs and
+    after bulk edits made with the triggers bypassed; runs in one write transaction.
+    """
+    cur = conn.cursor()
+    with conn:
+        if not conn.in_transaction:
+            cur.execute("BEGIN IMMEDIATE")
+        if has_search_index(conn):
+            cur.execute("INSERT INTO inventory_fts(inventory_fts) VALUES ('rebuild')")
+        cur.execute("DELETE FROM inventory_summary")
+        cur.execute(SUMMARY_REBUILD_SQL)
+        cur.execute("DELETE FROM inventory_monthly")
+        cur.execute(f"INSERT INTO inventory_monthly (kind, month, branch, department, cancelled, total) "
+                    f"{MONTHLY_REBUILD_SQL}")
+
+def init_change_tracking(cur):
+    """
+    Stamp every inserted/updated inventory row with a database-wide, increasing
+    row_version (from inventory_clock) and an updated_at timestamp, so views can
+    ask for "rows changed since version N" instead of reloading everything.
+    """
+    cur.execute("PRAGMA table_info(inventory)")
+    existing = {row[1] for row in cur.fetchall()}
+    if "row_version" not in existing:
+        cur.execute("ALTER TABLE inventory ADD COLUMN row_version INTEGER NOT NULL DEFAULT 0")
+    if "updated_at" not in existing:
+        cur.execute("ALTER TABLE inventory ADD COLUMN updated_at TEXT")
+    cur.executescript("""
+        CREATE TABLE IF NOT EXISTS inventory_clock (version INTEGER NOT NULL);
+        INSERT INTO inventory_clock (version)
+        SELECT (SELECT IFNULL(MAX(row_version), 0) FROM inventory)
+        WHERE NOT EXISTS (SELECT 1 FROM inventory_clock);
+        CREATE INDEX IF NOT EXISTS idx_inventory_row_version ON inventory(row_version);
+        CREATE TRIGGER IF NOT EXISTS inventory_stamp_insert AFTER INSERT ON inventory BEGIN
+            UPDATE inventory_clock SET version = version + 1;
+            UPDATE inventory SET row_version = (SELECT version FROM inventory_clock),
+                                 updated_at = CURRENT_TIMESTAMP
+            WHERE id = new.id;
+        END;
+        CREATE TRIGGER IF NOT EXISTS inventory_stamp_update AFTER UPDATE ON inventory
+        WHEN new.row_version = old.row_version BEGIN
+            UPDATE inventory_clock SET version = version + 1;
+            UPDATE inventory SET row_version = (SELECT version FROM inventory_clock),
+                                 updated_at = CURRENT_TIMESTAMP
+            WHERE id = new.id;
+        END;
+    """)
+
+def pause_search_trigger(cur):
+    """
+    For bulk loads: drop the per-row FTS insert trigger inside the caller's
+    transaction and return its SQL for resume_search_trigger(). Indexing the
+    new rows in one statement afterwards is several times faster.
+    """
+    cur.execute("SELECT sql FROM sqlite_master WHERE type='trigger' AND name='inventory_fts_insert'")
+    row = cur.fetchone()
+    if row:
+        cur.execute("DROP TRIGGER inventory_fts_insert")
+    return row[0] if row else None
+
+def resume_search_trigger(cur, trigger_sql, after_id):
+    """Index every row with id > after_id and put the insert trigger back."""
+    if not trigger_sql:
+        return
+    cols = ", ".join(SEARCH_COLUMNS)
+    cur.execute(f"INSERT INTO inventory_fts(rowid, {cols}) SELECT id, {cols} FROM inventory WHERE id > ?",
+                (after_id,))
+    cur.execute(trigger_sql)
+
+def init_asset_sequence(cur):
+    """
+    Sequence table behind the ASSET_xxxxx allocator, seeded once from the
+    highest ASSET_ number already in inventory. Timestamp-style ids
+    (ASSET_yyyymmddHHMMSS, 14 digits) are ignored: the sequence never reaches them.
+    """
+    cur.execute("CREATE TABLE IF NOT EXISTS sequences (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+    cur.execute("""
+        INSERT OR IGNORE INTO sequences (name, value)
+        SELECT 'asset_id', IFNULL(MAX(CAST(SUBSTR(asset_id, 7) AS INTEGER)), 0)
+        FROM inventory WHERE asset_id GLOB 'ASSET_[0-9]*' AND LENGTH(asset_id) < 20
+    """)
+
+def format_asset_id(number):
+    return f"ASSET_{number:05d}"
+
+def reserve_asset_ids(conn, count=1):
+    """
+    Atomically reserve ``count`` consecutive asset numbers and return them as a
+    range. Runs inside the caller's transaction, so the reservation commits (or
+    rolls back) together with the rows that use it.
+    """
+    cur = conn.cursor()
+    cur.execute("UPDATE sequences SET value = value + ? WHERE name='asset_id' RETURNING value", (count,))
+    last = cur.fetchone()[0]
+    return range(last - count + 1, last + 1)
+
+def advance_asset_sequence(conn, asset_ids):
+    """
+    Move the sequence past explicitly given ASSET_ numbers (e.g. imported rows),
+    so later allocations never collide with them. Timestamp-style ids are
+    ignored, as in init_asset_sequence().
+    """
+    numbers = [int(a[6:]) for a in asset_ids
+               if a.startswith("ASSET_") and a[6:].isascii() and a[6:].isdigit() and len(a) < 20]
+    if numbers:
+        conn.execute("UPDATE sequences SET value = MAX(value, ?) WHERE name='asset_id'", (max(numbers),))
+
+def next_asset_id(conn):
+    """Allocate a single ASSET_xxxxx id."""
+    return format_asset_id(reserve_asset_ids(conn, 1)[0])
+
+def peek_asset_id(conn):
+    """The id next_asset_id() would hand out now, without reserving it."""
+    cur = conn.cursor()
+    cur.execute("SELECT value FROM sequences WHERE name='asset_id'")
+    return format_asset_id(cur.fetchone()[0] + 1)
+
+def has_search_index(conn):
+    cur = conn.cursor()
+    cur.execute("SELECT 1 FROM sqlite_master WHERE name='inventory_fts'")
+    return cur.fetchone() is not None
+
+# --- Schema migrations ---
+# Each migration runs once, in order, inside its own transaction; PRAGMA
+# user_version records the last one applied. Append new steps, never edit old ones.
+# They run on top of the base schema from init_inventory_db().
+
+def _migration_hot_path_indexes(cur):
+    # cancelled=? (and keyset paging by id within it), branch / status filters
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_inventory_cancelled ON inventory(cancelled)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_inventory_cancelled_branch ON inventory(cancelled, branch)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_inventory_cancelled_status ON inventory(cancelled, device_status)")
+
+def _migration_active_serial_index(cur):
+    # serial_number=? AND cancelled=0: unique among active records, unless the
+    # existing data already has duplicates, in which case it is a plain index
+    cur.execute("""
+        SELECT 1 FROM inventory WHERE cancelled=0
+        GROUP BY serial_number HAVING COUNT(*) > 1 LIMIT 1
+    """)
+    unique = "" if cur.fetchone() else "UNIQUE"
+    name = "ux_inventory_active_serial" if unique else "idx_inventory_active_serial"
+    cur.execute(f"CREATE {unique} INDEX IF NOT EXISTS {name} ON inventory(serial_number) WHERE cancelled=0")
+
+def _migration_reference_versions(cur):
+    # per-lookup-table change counters for the reference data cache
+    cur.execute("CREATE TABLE IF NOT EXISTS reference_versions (name TEXT PRIMARY KEY, version INTEGER NOT NULL)")
+    for table in REFERENCE_TABLES:
+        cur.execute("INSERT OR IGNORE INTO reference_versions (name, version) VALUES (?, 0)", (table,))
+        for event in ("INSERT", "UPDATE", "DELETE"):
+            cur.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {table}_version_{event.lower()} AFTER {event} ON {table} BEGIN
+                    UPDATE reference_versions SET version = version + 1 WHERE name = '{table}';
+                END
+            """)
+
+def _migration_sort_indexes(cur):
+    # ORDER BY IFNULL(col, ''), id within cancelled=?: the keyset pages of a
+    # sorted grid are index range scans, and key_at() (OFFSET) never reads the table
+    for column in SORT_INDEX_COLUMNS:
+        cur.execute(f"CREATE INDEX IF NOT EXISTS idx_inventory_sort_{column} "
+                    f"ON inventory(cancelled, IFNULL({column}, ''), id)")
+
+def _migration_facet_indexes(cur):
+    # IFNULL(col, '') IN (...) filters and GROUP BY counts of the facet sidebar;
+    # branch and device_status are covered by the sort indexes
+    for column in ("business_unit", "department", "asset_class"):
+        cur.execute(f"CREATE INDEX IF NOT EXISTS idx_inventory_facet_{column} "
+                    f"ON inventory(cancelled, IFNULL({column}, ''))")
+
+def _migration_monthly_rollup(cur):
+    # record counts per month of date_acquired / manufactured_date, branch,
+    # department and cancelled, kept by triggers: the aging and trend reports
+    # read a few thousand rollup rows instead of scanning inventory
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS inventory_monthly (
+            kind TEXT NOT NULL,
+            month TEXT NOT NULL,
+            branch TEXT NOT NULL,
+            department TEXT NOT NULL,
+            cancelled INTEGER NOT NULL,
+            total INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (kind, month, branch, department, cancelled)
+        ) WITHOUT ROWID
+    """)
+    def add(row):
+        return "".join(f"""
+            INSERT INTO inventory_monthly (kind, month, branch, department, cancelled, total)
+            VALUES ('{kind}', {_month_of(f"{row}.{column}")}, IFNULL({row}.branch, ''),
+                    IFNULL({row}.department, ''), IFNULL({row}.cancelled, 0), 1)
+            ON CONFLICT (kind, month, branch, department, cancelled) DO UPDATE SET total = total + 1;"""
+            for kind, column in ROLLUP_DATES.items())
+    def remove(row):
+        return "".join(f"""
+            UPDATE inventory_monthly SET total = total - 1
+            WHERE kind = '{kind}' AND month = {_month_of(f"{row}.{column}")}
+              AND branch = IFNULL({row}.branch, '') AND department = IFNULL({row}.department, '')
+              AND cancelled = IFNULL({row}.cancelled, 0);"""
+            for kind, column in ROLLUP_DATES.items())
+    cur.execute(f"CREATE TRIGGER IF NOT EXISTS inventory_monthly_insert AFTER INSERT ON inventory BEGIN {add('new')} END")
+    cur.execute(f"CREATE TRIGGER IF NOT EXISTS inventory_monthly_delete AFTER DELETE ON inventory BEGIN {remove('old')} END")
+    cur.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS inventory_monthly_update
+        AFTER UPDATE OF date_acquired, manufactured_date, branch, department, cancelled ON inventory
+        BEGIN {remove('old')} {add('new')} END
+    """)
+    cur.execute("DELETE FROM inventory_monthly")
+    cur.execute(f"INSERT INTO inventory_monthly (kind, month, branch, department, cancelled, total) "
+                f"{MONTHLY_REBUILD_SQL}")
+
+INVENTORY_MIGRATIONS = [
+    _migration_hot_path_indexes,
+    _migration_active_serial_index,
+    _migration_reference_versions,
+    _migration_sort_indexes,
+    _migration_facet_indexes,
+    _migration_monthly_rollup,
+]
+
+def migrate_inventory_db(conn):
+    """Bring an existing DeviceInventory.db up to the latest schema version in place."""
+    cur = conn.cursor()
+    cur.execute("PRAGMA user_version")
+    version = cur.fetchone()[0]
+    applied = False
+    for number, migration in enumerate(INVENTORY_MIGRATIONS, start=1):
+        if number <= version:
+            continue
+        with conn:
+            cur.execute("BEGIN IMMEDIATE")
+            migration(cur)
+            cur.execute(f"PRAGMA user_version = {number}")
+        applied = True
+    if applied:
+        cur.execute("ANALYZE")
+        conn.commit()
+
+def init_user_db(path=ACCOUNTS_DB):
+    if SERVICE_URL:
+        return
+    conn = get_manager(path).writer()
     cur = conn.cursor()
     cur.execute("""
         CREATE TABLE IF NOT EXISTS accounts (
@@ -72,34 +595,74 @@ def init_user_db():
         cur.execute("INSERT INTO accounts (username, password, role) VALUES (?, ?, ?)",
                     ("USER", "123USER", "User"))
     conn.commit()
-    conn.close()
 
-def fetch_values(table):
-    conn = get_inventory_conn()
-    cur = conn.cursor()
+# --- Reference data cache ---
+# Lookup lists (the combobox values) are cached per table. An entry stays valid
+# until managerole calls invalidate_reference(), or another process commits a
+# change to that table: the shared writer's PRAGMA data_version only moves on
+# other connections' commits, and reference_versions says which table changed.
+REFERENCE_TABLES = ("asset_classes", "business_units", "departments", "branches", "device_status", "description")
+
+_reference_cache = {}  # table -> (version, values)
+_reference_lock = threading.Lock()
+_reference_data_version = [None]
+
+def _reference_versions(cur):
     try:
-        cur.execute(f"SELECT name FROM {table} ORDER BY name")
-        vals = [row[0] for row in cur.fetchall()]
+        cur.execute("SELECT name, version FROM reference_versions")
+        return dict(cur.fetchall())
     except sqlite3.OperationalError:
-        vals = []
-    conn.close()
-    return vals
+        return {}
+
+def _validate_reference_cache():
+    cur = get_inventory_conn().cursor()
+    cur.execute("PRAGMA data_version")
+    data_version = cur.fetchone()[0]
+    if data_version == _reference_data_version[0]:
+        return
+    _reference_data_version[0] = data_version
+    versions = _reference_versions(cur)
+    for table, (version, _) in list(_reference_cache.items()):
+        if versions.get(table) != version:
+            del _reference_cache[table]
+
+def invalidate_reference(table=None):
+    """Forget the cached values of one lookup table (or all of them)."""
+    with _reference_lock:
+        if table is None:
+            _reference_cache.clear()
+        else:
+            _reference_cache.pop(table, None)
+
+def fetch_values(table):
+    with _reference_lock:
+        _validate_reference_cache()
+        if table in _reference_cache:
+            return list(_reference_cache[table][1])
+    with inventory_reader() as conn:
+        cur = conn.cursor()
+        # read the version first: a change in between only makes the entry stale sooner
+        version = _reference_versions(cur).get(table)
+        try:
+            cur.execute(f"SELECT name FROM {table} ORDER BY name")
+            vals = [row[0] for row in cur.fetchall()]
+        except sqlite3.OperationalError:
+            vals = []
+    if version is not None:
+        with _reference_lock:
+            _reference_cache[table] = (version, vals)
+    return list(vals)
 
 def get_branches():
-    conn = get_inventory_conn()
-    cur = conn.cursor()
-    try:
-        cur.execute("SELECT name FROM branches ORDER BY name")
-        rows = [r[0] for r in cur.fetchall() if r[0]]
-        if rows:
-            conn.close()
-            return rows
-    except sqlite3.OperationalError:
-        pass
-    try:
-        cur.execute("SELECT DISTINCT branch FROM inventory WHERE branch IS NOT NULL AND branch<>'' ORDER BY branch")
-        rows = [r[0] for r in cur.fetchall() if r[0]]
-    except sqlite3.OperationalError:
-        rows = []
-    conn.close()
-    return rows
+    rows = [r for r in fetch_values("branches") if r]
+    if rows:
+        return rows
+    # no branches table entries yet: fall back to the branches used in inventory,
+    # cached until the next write so the scan doesn't run on every call
+    with inventory_reader() as conn:
+        try:
+            rows = inventory_cache().fetch(
+                conn, "SELECT DISTINCT branch FROM inventory WHERE branch IS NOT NULL AND branch<>'' ORDER BY branch")
+        except sqlite3.OperationalError:
+            rows = []
+    return [r[0] for r in rows if r[0]]
@@ -0,0 +1,114 @@
+import tkinter as tk
+from tkinter import ttk, messagebox
+import tracing
+
+def build_diagnostics_tab(root, notebook, current_user_role, tab=None):
+    """
+    Diagnostics tab (Administrators only): per-statement timings collected by
+    tracing.py, with the latency histogram and call sites of the selected
+    statement, and the tail of the slow-query log.
+    Returns the tab and its refresh callback.
+    """
+    if current_user_role != "Administrator":
+        messagebox.showerror("Access Denied", "Only Administrators can access Diagnostics.")
+        return None
+
+    if tab is None:
+        tab = ttk.Frame(notebook)
+        notebook.add(tab, text="🩺 DIAGNOSTICS")
+
+    # --- Controls ---
+    control_frame = ttk.LabelFrame(tab, text="Query Tracing", padding=10)
+    control_frame.pack(fill="x", padx=20, pady=10)
+    status_text = "enabled" if tracing.TRACE_ENABLED else "disabled (INVENTORY_TRACE=0)"
+    tk.Label(control_frame, text=f"Tracing {status_text}").grid(row=0, column=0, padx=5, sticky="w")
+    tk.Label(control_frame, text="Slow query threshold (ms):").grid(row=0, column=1, padx=5)
+    threshold_var = tk.StringVar(value=f"{tracing.SLOW_QUERY_MS:g}")
+    tk.Entry(control_frame, textvariable=threshold_var, width=8).grid(row=0, column=2, padx=5)
+
+    # --- Statement statistics ---
+    HEADERS = ["CALLS", "TOTAL MS", "AVG MS", "P95 MS", "MAX MS", "ROWS", "STATEMENT"]
+    stats_frame = ttk.LabelFrame(tab, text="Statements (slowest total time first)", padding=10)
+    stats_frame.pack(fill="both", expand=True, padx=20, pady=5)
+    stats_tree = ttk.Treeview(stats_frame, columns=HEADERS, show="headings", height=12)
+    for col in HEADERS:
+        stats_tree.heading(col, text=col)
+        stats_tree.column(col, width=80, anchor="e", stretch=False)
+    stats_tree.column("STATEMENT", width=700, anchor="w", stretch=True)
+    stats_tree.pack(fill="both", expand=True, side="left")
+    scroll_y = ttk.Scrollbar(stats_frame, orient="vertical", command=stats_tree.yview)
+    stats_tree.configure(yscroll=scroll_y.set)
+    scroll_y.pack(side="right", fill="y")
+
+    # --- Details: histogram + call sites of the selected statement, or the slow log ---
+    detail_frame = ttk.LabelFrame(tab, text="Details", padding=10)
+    detail_frame.pack(fill="both", expand=True, padx=20, pady=5)
+    detail_text = tk.Text(detail_frame, height=14, wrap="none", font=("Consolas", 9))
+    detail_text.pack(fill="both", expand=True, side="left")
+    detail_scroll = ttk.Scrollbar(detail_frame, orient="vertical", command=detail_text.yview)
+    detail_text.configure(yscrollcommand=detail_scroll.set)
+    detail_scroll.pack(side="right", fill="y")
+
+    statements = {}
+
+    def show_text(text):
+        detail_text.config(state="normal")
+        detail_text.delete("1.0", tk.END)
+        detail_text.insert(tk.END, text)
+        detail_text.config(state="disabled")
+
+    def refresh_diagnostics():
+        statements.clear()
+        stats_tree.delete(*stats_tree.get_children())
+        for i, s in enumerate(tracing.snapshot()):
+            statements[str(i)] = s
+            stats_tree.insert("", tk.END, iid=str(i), values=(
+                s.calls, f"{s.total_ms:.1f}", f"{s.total_ms / s.calls:.2f}", f"{s.percentile(0.95):g}",
+                f"{s.max_ms:.1f}", s.rows, s.sql[:300]))
+
+    def on_select(event=None):
+        s = statements.get(stats_tree.focus())
+        if s is None:
+            return
+        lines = [s.sql, "", "Latency histogram:"]
+        peak = max(s.histogram) or 1
+        lower = 0
+        for bound, count in zip(list(tracing.BUCKETS_MS) + [None], s.histogram):
+            label = f"{lower:g}-{bound:g} ms" if bound is not None else f"> {lower:g} ms"
+            lines.append(f"  {label:>16} {count:8}  {'#' * round(40 * count / peak)}")
+            lower = bound
+        lines += ["", "Call sites:"]
+        lines += [f"  {count:8}  {site}" for site, count in s.call_sites.most_common()]
+        show_text("\n".join(lines))
+
+    def apply_threshold():
+        try:
+            tracing.set_slow_threshold(float(threshold_var.get()))
+        except ValueError:
+            messagebox.showwarning("Invalid Threshold", "Enter the threshold in milliseconds.")
+
+    def reset_stats():
+        tracing.reset()
+        refresh_diagnostics()
+        show_text("")
+
+    def show_slow_log():
+        try:
+            with open(tracing.slow_log_path(), encoding="utf-8") as f:
+                lines = f.readlines()
+        except OSError:
+            show_text("No slow queries logged yet.")
+            return
+        show_text(f"{tracing.slow_log_path()} (last 200 lines)\n\n" + "".join(lines[-200:]))
+        detail_text.see(tk.END)
+
+    tk.Button(control_frame, text="Apply", command=apply_threshold, width=10).grid(row=0, column=3, padx=5)
+    tk.Button(control_frame, text="🔄 Refresh", command=refresh_diagnostics, width=12).grid(row=0, column=4, padx=5)
+    tk.Button(control_frame, text="🧹 Reset", command=reset_stats, width=12).grid(row=0, column=5, padx=5)
+    tk.Button(control_frame, text="🐢 Slow Query Log", command=show_slow_log, width=16).grid(row=0, column=6, padx=5)
+
+    stats_tree.bind("<<TreeviewSelect>>", on_select)
+
+    refresh_diagnostics()
+
+    return tab, refresh_diagnostics
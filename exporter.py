@@ -0,0 +1,60 @@
+"""
+Streaming export of inventory records to XLSX or CSV.
+
+Rows come straight from a database cursor over the active record source (not
+from the Treeview), so values keep their types and memory stays flat however
+many rows are exported. Through the inventory service, whose answers arrive
+as one response each, the view is paged by keyset instead.
+"""
+import copy
+import csv
+
+from service_client import ServiceConnection
+
+
+def _chunks(source, chunk_size):
+    if not isinstance(source.conn, ServiceConnection):
+        yield from source.stream(chunk_size)
+        return
+    source = copy.copy(source)
+    source.cache = None  # export pages are read once
+    chunk = []
+    for row in source.iter_rows(chunk_size):
+        chunk.append(row)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def export_records(source, path, headers, progress=None, chunk_size=2000):
+    """
+    Write every row of ``source`` to ``path`` (.csv -> CSV, anything else ->
+    XLSX through an openpyxl write-only workbook).
+    progress(written) is called after each chunk. Returns the number of rows.
+    """
+    written = 0
+    if path.lower().endswith(".csv"):
+        with open(path, "w", newline="", encoding="utf-8-sig") as f:
+            writer = csv.writer(f)
+            writer.writerow(headers)
+            for chunk in _chunks(source, chunk_size):
+                writer.writerows(chunk)
+                written += len(chunk)
+                if progress:
+                    progress(written)
+        return written
+
+    from openpyxl import Workbook
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Inventory")
+    ws.append(headers)
+    for chunk in _chunks(source, chunk_size):
+        for row in chunk:
+            ws.append(row)
+        written += len(chunk)
+        if progress:
+            progress(written)
+    wb.save(path)
+    return written
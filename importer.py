@@ -0,0 +1,193 @@
+"""
+Streaming bulk import of inventory spreadsheets (CSV / XLSX).
+
+Rows are read a chunk at a time (csv module / openpyxl read-only mode), checked
+against the set of active serial numbers loaded once at the start of the
+import transaction, and written with executemany inside that transaction.
+"""
+import csv
+from datetime import date, datetime
+from itertools import islice
+
+from db import (pause_search_trigger, resume_search_trigger, reserve_asset_ids, format_asset_id,
+                advance_asset_sequence)
+from resultcache import note_write
+
+# spreadsheet header -> inventory column
+IMPORT_COLUMNS = {
+    "TOOL OF TRADE": "asset_class",
+    "ASSET ID": "asset_id",
+    "ASSET NAME": "asset_name",
+    "MANUFACTURED DATE": "manufactured_date",
+    "DATE RECEIVED": "date_acquired",
+    "BUSINESS UNIT": "business_unit",
+    "DEPARTMENT": "department",
+    "BRANCH": "branch",
+    "BRAND": "brand",
+    "ASSET DESCRIPTION": "description",
+    "SERIAL NUMBER": "serial_number",
+    "CUSTODIAN": "custodian",
+    "ASSET STATUS": "device_status",
+}
+
+INSERT_SQL = f"""
+    INSERT INTO inventory ({', '.join(IMPORT_COLUMNS.values())})
+    VALUES ({', '.join('?' * len(IMPORT_COLUMNS))})
+"""
+
+
+def _cell(value):
+    """Spreadsheet cell -> clean string ('' for empty cells, ISO dates)."""
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d")
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, float):
+        if value != value:  # NaN from pandas
+            return ""
+        if value.is_integer():
+            value = int(value)
+    return str(value).strip()
+
+
+def _chunks(header, rows, chunk_size):
+    header = [_cell(h).upper() for h in header]
+    while True:
+        chunk = [dict(zip(header, (_cell(v) for v in row))) for row in islice(rows, chunk_size)]
+        if not chunk:
+            return
+        yield chunk
+
+
+def read_chunks(path, chunk_size=5000):
+    """
+    Yield (chunk, total) for the file, where chunk is a list of {HEADER: value}
+    dicts and total is the number of data rows when the format tells us
+    up front (XLSX), otherwise None.
+    """
+    lower = path.lower()
+    if lower.endswith(".csv"):
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            reader = csv.reader(f)
+            header = next(reader, [])
+            for chunk in _chunks(header, reader, chunk_size):
+                yield chunk, None
+    elif lower.endswith(".xlsx"):
+        from openpyxl import load_workbook
+        wb = load_workbook(path, read_only=True, data_only=True)
+        try:
+            ws = wb.active
+            rows = ws.iter_rows(values_only=True)
+            header = next(rows, ())
+            total = ws.max_row - 1 if ws.max_row else None
+            for chunk in _chunks(header, rows, chunk_size):
+                yield chunk, total
+        finally:
+            wb.close()
+    else:
+        # legacy .xls: openpyxl cannot read it, fall back to pandas
+        import pandas as pd
+        df = pd.read_excel(path, dtype=object)
+        for chunk in _chunks(df.columns, df.itertuples(index=False, name=None), chunk_size):
+            yield chunk, len(df)
+
+
+def import_records(conn, path, chunk_size=5000, progress=None):
+    """
+    Import every row of ``path`` into inventory in one transaction.
+    Rows without a serial number, or whose serial is already active, are skipped.
+    progress(processed, total) is called after each chunk (total may be None).
+    Returns (imported, skipped).
+    """
+    return import_chunks(conn, read_chunks(path, chunk_size), progress)
+
+
+def import_chunks(conn, chunks, progress=None):
+    """import_records() over already-parsed (chunk, total) pairs, e.g. from parallel_chunks()."""
+    cur = conn.cursor()
+    imported = skipped = processed = 0
+    with conn:
+        # one write transaction for the whole file; the FTS index is filled
+        # set-based at the end instead of row by row
+        if not conn.in_transaction:
+            cur.execute("BEGIN IMMEDIATE")
+        # read under the write lock, so no serial can become active in between
+        cur.execute("SELECT serial_number FROM inventory WHERE cancelled=0")
+        active_serials = {r[0] for r in cur.fetchall()}
+        cur.execute("SELECT IFNULL(MAX(id), 0) FROM inventory")
+        last_id = cur.fetchone()[0]
+        search_trigger = pause_search_trigger(cur)
+        for chunk, total in chunks:
+            batch = []
+            for row in chunk:
+                serial = row.get("SERIAL NUMBER", "")
+                if not serial or serial in active_serials:
+                    skipped += 1
+                    continue
+                active_serials.add(serial)
+                batch.append([row.get(header, "") for header in IMPORT_COLUMNS])
+            # explicit ASSET IDs push the sequence past them; missing ones are
+            # auto-generated from one reserved block per chunk
+            advance_asset_sequence(conn, [values[1] for values in batch if values[1]])
+            missing = [values for values in batch if not values[1]]
+            if missing:
+                for values, number in zip(missing, reserve_asset_ids(conn, len(missing))):
+                    values[1] = format_asset_id(number)
+            cur.executemany(INSERT_SQL, batch)
+            imported += len(batch)
+            processed += len(chunk)
+            if progress:
+                progress(processed, total)
+        resume_search_trigger(cur, search_trigger, last_id)
+    note_write()
+    return imported, skipped
+
+
+# --- multi-process parsing (headless batch imports) ---
+def _parse_file(path, chunk_size, results):
+    """Worker process: stream one file's chunks into ``results``, then a sentinel."""
+    try:
+        for chunk, total in read_chunks(path, chunk_size):
+            results.put(("chunk", path, chunk, total))
+    except Exception as exc:
+        results.put(("error", path, f"{type(exc).__name__}: {exc}", None))
+    results.put(("done", path, None, None))
+
+
+def parallel_chunks(paths, chunk_size=5000, workers=None):
+    """
+    Parse ``paths`` in up to ``workers`` processes (one file per process at a
+    time) and yield (chunk, total) in arrival order, so parsing runs on other
+    cores while the caller writes. Order is kept within a file, not across
+    files. A bounded queue keeps memory flat when parsing outruns the writer.
+    """
+    import multiprocessing
+    workers = max(1, min(workers or multiprocessing.cpu_count(), len(paths)))
+    results = multiprocessing.Queue(maxsize=workers * 4)
+    pending = list(reversed(paths))
+    running = {}
+
+    def start_next():
+        path = pending.pop()
+        process = multiprocessing.Process(target=_parse_file, args=(path, chunk_size, results), daemon=True)
+        process.start()
+        running[path] = process
+
+    try:
+        while pending and len(running) < workers:
+            start_next()
+        while running:
+            kind, path, chunk, total = results.get()
+            if kind == "chunk":
+                yield chunk, total
+            elif kind == "error":
+                raise ValueError(f"Could not read {path}: {chunk}")
+            else:
+                running.pop(path).join()
+                if pending:
+                    start_next()
+    finally:
+        for process in running.values():
+            process.terminate()
@@ -0,0 +1,195 @@
+"""
+Headless command line for scheduled jobs, using the same database layer as the GUI.
+
+    python -m inventory import branch_a.xlsx branch_b.csv [--workers 4]
+    python -m inventory export monthly.xlsx [--branch "HOME OFFICE"] [--status ACTIVE] [--search TERM]
+    python -m inventory report [--by-branch] [--format text|json|csv] [--output FILE]
+    python -m inventory reindex [--vacuum] [--check]
+
+Every command takes --db PATH (default: DeviceInventory.db next to the app).
+Imports parse files in worker processes while the main process writes one
+transaction; exports stream from a cursor. Exit status is 0 on success,
+1 on failure (the message goes to stderr), 130 when interrupted.
+"""
+import argparse
+import csv
+import io
+import json
+import multiprocessing
+import sys
+import time
+
+from db import DB_FILE, get_manager, init_inventory_db, rebuild_derived_tables
+from records import FIELDS, FIELD_HEADERS, REPORT_METRICS, RecordSource, search_source, report_counts
+from importer import import_chunks, parallel_chunks, read_chunks
+from exporter import export_records
+
+
+class Progress:
+    """Throttled "label: n rows" line on stderr (suppressed with --quiet)."""
+    def __init__(self, label, quiet=False, interval=1.0):
+        self.label = label
+        self.quiet = quiet
+        self.interval = interval
+        self.started = self.last = time.perf_counter()
+
+    def __call__(self, processed, total=None):
+        now = time.perf_counter()
+        if self.quiet or now - self.last < self.interval:
+            return
+        self.last = now
+        of_total = f" of {total:,}" if total else ""
+        print(f"\r{self.label}: {processed:,}{of_total} rows ({processed / (now - self.started):,.0f}/s)",
+              end="", file=sys.stderr, flush=True)
+
+    def done(self, message):
+        if not self.quiet:
+            print(f"\r{message} in {time.perf_counter() - self.started:.1f}s", file=sys.stderr)
+
+
+# --- commands ---
+def cmd_import(args, manager):
+    progress = Progress("Importing", args.quiet)
+    if args.workers == 0:
+        chunks = (item for path in args.files for item in read_chunks(path, args.chunk_size))
+    else:
+        chunks = parallel_chunks(args.files, args.chunk_size, args.workers)
+    imported, skipped = import_chunks(manager.writer(), chunks, progress)
+    progress.done(f"Imported {imported:,} records, skipped {skipped:,} (missing or duplicate serial number)")
+    return 0
+
+
+def export_source(args, conn):
+    """The RecordSource selected by the export filters."""
+    conditions = ["cancelled=1" if args.cancelled else "cancelled=0"]
+    params = []
+    for column, values in (("branch", args.branch), ("device_status", args.status),
+                           ("department", args.department), ("business_unit", args.business_unit)):
+        if values:
+            conditions.append(f"{column} IN ({', '.join('?' * len(values))})")
+            params.extend(values)
+    if args.metric:
+        conditions.append(REPORT_METRICS[args.metric])
+    where = " AND ".join(conditions)
+    if args.search:
+        return search_source(conn, args.search, FIELDS, where, params)
+    return RecordSource(conn, FIELDS, where, params)
+
+
+def cmd_export(args, manager):
+    progress = Progress("Exporting", args.quiet)
+    with manager.reader() as conn:
+        written = export_records(export_source(args, conn), args.output, FIELD_HEADERS,
+                                 progress=progress, chunk_size=args.chunk_size)
+    progress.done(f"Exported {written:,} records to {args.output}")
+    return 0
+
+
+def cmd_report(args, manager):
+    with manager.reader() as conn:
+        rows = [{"metric": metric, "count": count} for metric, count in report_counts(conn).items()]
+        if args.by_branch:
+            cur = conn.cursor()
+            cur.execute("SELECT branch, device_status, SUM(total) FROM inventory_summary "
+                        "WHERE cancelled=0 GROUP BY branch, device_status HAVING SUM(total) > 0 "
+                        "ORDER BY branch, device_status")
+            rows += [{"metric": f"{branch or '(NO BRANCH)'} / {status or '(NO STATUS)'}", "count": count}
+                     for branch, status, count in cur.fetchall()]
+
+    if args.format == "json":
+        text = json.dumps(rows, indent=2) + "\n"
+    elif args.format == "csv":
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, ["metric", "count"], lineterminator="\n")
+        writer.writeheader()
+        writer.writerows(rows)
+        text = buffer.getvalue()
+    else:
+        width = max(len(r["metric"]) for r in rows)
+        text = "".join(f"{r['metric']:<{width}}  {r['count']:>10,}\n" for r in rows)
+
+    if args.output:
+        with open(args.output, "w", newline="", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        sys.stdout.write(text)
+    return 0
+
+
+def cmd_reindex(args, manager):
+    progress = Progress("Reindexing", args.quiet)
+    conn = manager.writer()
+    rebuild_derived_tables(conn)
+    conn.execute("ANALYZE")
+    conn.execute("PRAGMA optimize")
+    if args.vacuum:
+        conn.execute("VACUUM")
+    status = 0
+    if args.check:
+        problems = [r[0] for r in conn.execute("PRAGMA integrity_check").fetchall()]
+        if problems != ["ok"]:
+            print("\n".join(problems), file=sys.stderr)
+            status = 1
+    progress.done("Rebuilt search index, summary counts and monthly rollup" + (", vacuumed" if args.vacuum else ""))
+    return status
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m inventory", description=__doc__.strip().splitlines()[0])
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--db", default=DB_FILE, help="inventory database (default: %(default)s)")
+    common.add_argument("--quiet", action="store_true", help="no progress output")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    p = commands.add_parser("import", parents=[common], help="import CSV/XLSX/XLS files")
+    p.add_argument("files", nargs="+")
+    p.add_argument("--workers", type=int, default=None,
+                   help="parser processes (default: one per file up to the CPU count; 0 = parse in-process)")
+    p.add_argument("--chunk-size", type=int, default=5000)
+    p.set_defaults(run=cmd_import)
+
+    p = commands.add_parser("export", parents=[common], help="export records to XLSX or CSV")
+    p.add_argument("output", help="destination file (.csv for CSV, anything else XLSX)")
+    p.add_argument("--branch", action="append", help="repeatable")
+    p.add_argument("--status", action="append", help="repeatable")
+    p.add_argument("--department", action="append", help="repeatable")
+    p.add_argument("--business-unit", action="append", help="repeatable")
+    p.add_argument("--metric", choices=sorted(REPORT_METRICS), help="records behind a report metric")
+    p.add_argument("--search", help="free-text search, as in the Manage Devices tab")
+    p.add_argument("--cancelled", action="store_true", help="export cancelled records instead of active ones")
+    p.add_argument("--chunk-size", type=int, default=2000)
+    p.set_defaults(run=cmd_export)
+
+    p = commands.add_parser("report", parents=[common], help="print the report metrics")
+    p.add_argument("--by-branch", action="store_true", help="add active counts per branch and status")
+    p.add_argument("--format", choices=("text", "json", "csv"), default="text")
+    p.add_argument("--output", help="write to a file instead of stdout")
+    p.set_defaults(run=cmd_report)
+
+    p = commands.add_parser("reindex", parents=[common],
+                            help="rebuild the search index, summary counts and monthly rollup, refresh statistics")
+    p.add_argument("--vacuum", action="store_true", help="also VACUUM the database")
+    p.add_argument("--check", action="store_true", help="also run PRAGMA integrity_check")
+    p.set_defaults(run=cmd_reindex)
+    return parser
+
+
+def main(argv=None):
+    multiprocessing.freeze_support()
+    args = build_parser().parse_args(argv)
+    init_inventory_db(args.db)
+    manager = get_manager(args.db)
+    try:
+        return args.run(args, manager)
+    except KeyboardInterrupt:
+        print("\nInterrupted", file=sys.stderr)
+        return 130
+    except Exception as exc:
+        print(f"\nError: {exc}", file=sys.stderr)
+        return 1
+    finally:
+        manager.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
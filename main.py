@@ -1,19 +1,25 @@
+import time
+_startup_marks = [("start", time.perf_counter())]
+
+def mark(label):
+    """Record a startup milestone for the timing report."""
+    _startup_marks.append((label, time.perf_counter()))
+
 import tkinter as tk
 from tkinter import ttk, messagebox
-from tkcalendar import DateEntry
 from datetime import datetime
-import platform, subprocess, sys, getpass
+import sys, getpass
 
-from db import init_inventory_db, init_user_db, get_inventory_conn, get_accounts_conn
-from tabs.add_device import build_add_tab
-from tabs.manage import build_manage_tab
-from tabs.managerole import build_manage_role_tab
-from tabs.manageuser import build_manageuser_tab
-from tabs.reports import build_reports_tab
+from db import EXE_DIR, init_inventory_db, init_user_db, get_inventory_conn, get_accounts_conn, accounts_reader
+from probe import current_info, start_background_probe
+
+STARTUP_LOG = EXE_DIR / "startup.log"
+mark("imports")
 
 
 init_inventory_db()
 init_user_db()
+mark("init databases")
 
 def login_prompt():
     login_window = tk.Tk()
@@ -41,11 +47,10 @@ def login_prompt():
     def check_login():
         user = username_entry.get().strip()
         pwd = password_entry.get().strip()
-        conn = get_accounts_conn()
-        cur = conn.cursor()
-        cur.execute("SELECT role FROM accounts WHERE username=? AND password=?", (user, pwd))
-        row = cur.fetchone()
-        conn.close()
+        with accounts_reader() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT role FROM accounts WHERE username=? AND password=?", (user, pwd))
+            row = cur.fetchone()
         if row:
             role_var.set(row[0])
             login_window.destroy()
@@ -61,89 +66,14 @@ def login_prompt():
     return role_var.get()
 
 
+mark("before login")
 current_user_role = login_prompt()
 if not current_user_role:
     sys.exit()
+mark("login")
 
 
 
-def get_platform_info():
-    device_name = platform.node()
-    serial_number = brand = manufactured_date = "Unknown"
-
-    if platform.system() == "Windows":
- 
-        try:
-            serial_number = (
-                subprocess.check_output("wmic bios get serialnumber", shell=True)
-                .decode(errors="ignore")
-                .split("\n")[1].strip()
-            ) or "Unknown"
-        except Exception:
-            serial_number = "Unknown"
-
-        if serial_number == "Unknown":
-            try:
-                serial_number = (
-                    subprocess.check_output(
-                        'powershell -Command "Get-WmiObject win32_bios | Select-Object -ExpandProperty SerialNumber"',
-                        shell=True,
-                    ).decode(errors="ignore").strip()
-                ) or "Unknown"
-            except Exception:
-                pass
-
-
-        try:
-            brand = (
-                subprocess.check_output("wmic computersystem get manufacturer", shell=True)
-                .decode(errors="ignore")
-                .split("\n")[1].strip()
-            ) or "Unknown"
-        except Exception:
-            brand = "Unknown"
-
-        if brand == "Unknown":
-            try:
-                brand = (
-                    subprocess.check_output(
-                        'powershell -Command "Get-WmiObject win32_computersystem | Select-Object -ExpandProperty Manufacturer"',
-                        shell=True,
-                    ).decode(errors="ignore").strip()
-                ) or "Unknown"
-            except Exception:
-                pass
-
-        try:
-            raw_date = (
-                subprocess.check_output("wmic bios get ReleaseDate", shell=True)
-                .decode(errors="ignore")
-                .split("\n")[1].strip()
-            )
-            manufactured_date = (
-                f"{raw_date[0:4]}-{raw_date[4:6]}-{raw_date[6:8]}" if raw_date else "Unknown"
-            )
-        except Exception:
-            manufactured_date = "Unknown"
-
-        if manufactured_date == "Unknown":
-            try:
-                raw_date = (
-                    subprocess.check_output(
-                        'powershell -Command "Get-WmiObject win32_bios | Select-Object -ExpandProperty ReleaseDate"',
-                        shell=True,
-                    ).decode(errors="ignore").strip()
-                )
-                manufactured_date = (
-                    f"{raw_date[0:4]}-{raw_date[4:6]}-{raw_date[6:8]}" if raw_date else "Unknown"
-                )
-            except Exception:
-                pass
-
-    return (brand, device_name, serial_number, manufactured_date)
-
-
-platform_info = get_platform_info()
 
 root = tk.Tk()
 root.title("📋 Asset Inventory System")
@@ -175,12 +105,96 @@ conn = get_inventory_conn()
 accounts_conn = get_accounts_conn()
 cursor = conn.cursor()
 
-refresh_manage_callback = build_manage_tab(root, notebook, current_user_role)
-build_add_tab(root, notebook, platform_info, refresh_manage_callback=refresh_manage_callback)
-build_reports_tab(root, notebook)
+# --- Lazy tabs: each page is a placeholder until it is first selected ---
+lazy_tabs = {}      # placeholder widget name -> builder(tab)
+tab_refreshers = {} # built tab widget name -> refresh callback run on re-selection
+
+def add_lazy_tab(text, builder):
+    tab = ttk.Frame(notebook)
+    notebook.add(tab, text=text)
+    lazy_tabs[str(tab)] = (tab, builder)
+
+def on_tab_changed(event=None):
+    global startup_reported
+    name = notebook.select()
+    if name in lazy_tabs:
+        tab, builder = lazy_tabs.pop(name)
+        started = time.perf_counter()
+        result = builder(tab)
+        if isinstance(result, tuple):
+            tab_refreshers[name] = result[1]
+        mark(f"build {notebook.tab(name, 'text')} ({time.perf_counter() - started:.3f}s)")
+        if not startup_reported:
+            startup_reported = True
+            root.after_idle(write_startup_report)
+    elif name in tab_refreshers:
+        # catch up on changes made from other tabs since this one was last shown
+        tab_refreshers[name]()
+
+startup_reported = False
+
+def write_startup_report():
+    """Log the startup milestones; the windowed exe has no console, so append to startup.log."""
+    mark("first tab shown")
+    start = _startup_marks[0][1]
+    marks = dict(_startup_marks)
+    waiting = marks["login"] - marks["before login"]
+    lines = [f"{datetime.now():%Y-%m-%d %H:%M:%S} startup {(_startup_marks[-1][1] - start - waiting):.3f}s "
+             f"(excluding {waiting:.1f}s at the login prompt)"]
+    previous = start
+    for label, at in _startup_marks[1:]:
+        lines.append(f"    {at - start:8.3f}s  +{at - previous:.3f}s  {label}")
+        previous = at
+    try:
+        with open(STARTUP_LOG, "a", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+    except OSError:
+        pass
+    if sys.stderr:
+        print("\n".join(lines), file=sys.stderr)
+
+
+def manage_tab(tab):
+    from tabs.manage import build_manage_tab
+    return build_manage_tab(root, notebook, current_user_role, tab=tab)
+
+def cancelled_tab(tab):
+    from tabs.manage import build_cancelled_tab
+    return build_cancelled_tab(root, notebook, tab=tab)
+
+def add_tab(tab):
+    from tabs.add_device import build_add_tab
+    return build_add_tab(root, notebook, current_info(), tab=tab)
+
+def reports_tab(tab):
+    from tabs.reports import build_reports_tab
+    return build_reports_tab(root, notebook, tab=tab)
+
+def manageuser_tab(tab):
+    from tabs.manageuser import build_manageuser_tab
+    return build_manageuser_tab(root, notebook, current_user_role, tab=tab)
+
+def diagnostics_tab(tab):
+    from tabs.diagnostics import build_diagnostics_tab
+    return build_diagnostics_tab(root, notebook, current_user_role, tab=tab)
+
+def manage_role_tab(tab):
+    from tabs.managerole import build_manage_role_tab
+    return build_manage_role_tab(root, notebook, cursor, conn, current_user_role, tab=tab)
+
+
+notebook.bind("<<NotebookTabChanged>>", on_tab_changed)
+add_lazy_tab("📂 Manage Devices", manage_tab)
+if current_user_role == "Administrator":
+    add_lazy_tab("🗑 Cancelled Records", cancelled_tab)
+add_lazy_tab("➕ ADD DEVICE", add_tab)
+add_lazy_tab("📊 REPORTS", reports_tab)
 
 if current_user_role == "Administrator":
-    build_manageuser_tab(root, notebook, current_user_role)
-    build_manage_role_tab(root, notebook, cursor, conn, current_user_role)
+    add_lazy_tab("👤 MANAGE USER", manageuser_tab)
+    add_lazy_tab("🛠 EDIT CATEGORIES", manage_role_tab)
+    add_lazy_tab("🩺 DIAGNOSTICS", diagnostics_tab)
+start_background_probe(root)
+mark("main window")
 
 root.mainloop()
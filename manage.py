@@ -1,14 +1,22 @@
+import copy
+import sqlite3
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-from openpyxl import Workbook
-from db import get_inventory_conn
+from db import get_inventory_conn, inventory_writes
+from records import (FIELDS, FIELD_HEADERS, FACETS, RecordSource, search_source, search_filter, summary_total,
+                     current_version, changed_since, load_record, update_record, merge_changes, diff_record,
+                     facet_filter, facet_counts)
+from widgets import FacetPanel, ProgressDialog, VirtualTreeview
+from worker import get_executor
+from exporter import export_records
 
-def build_manage_tab(root, notebook, current_user_role):
+def build_manage_tab(root, notebook, current_user_role, tab=None):
     conn = get_inventory_conn()
-    cursor = conn.cursor()
+    executor = get_executor(root)
 
-    tab = ttk.Frame(notebook)
-    notebook.add(tab, text="📂 Manage Devices")
+    if tab is None:
+        tab = ttk.Frame(notebook)
+        notebook.add(tab, text="📂 Manage Devices")
 
    
     search_frame = ttk.LabelFrame(tab, text="Search", padding=10)
@@ -20,123 +28,148 @@ def build_manage_tab(root, notebook, current_user_role):
 
     tk.Button(search_frame, text="Search", command=lambda: search_records(), width=12).grid(row=0, column=2, padx=5)
     search_entry.bind("<Return>", lambda e: search_records())
+    search_status = tk.Label(search_frame, text="", fg="gray")
+    search_status.grid(row=0, column=3, padx=5)
 
    
-    FIELDS = [
-        "id", "asset_class", "asset_id", "asset_name", "manufactured_date", "date_acquired",
-        "business_unit", "department", "branch", "brand", "description", "serial_number",
-        "custodian", "device_status", "cancelled"
-    ]
-    HEADERS = [
-        "ID", "TOOL OF TRADE", "ASSET ID", "ASSET NAME", "MANUFACTURED DATE", "DATE ACQUIRED",
-        "BUSINESS UNIT", "DEPARTMENT", "BRANCH", "BRAND", "ASSET DESCRIPTION",
-        "SERIAL NUMBER", "CUSTODIAN", "ASSET STATUS", "CANCELLED"
-    ]
+    HEADERS = FIELD_HEADERS
+
+    # --- Facet sidebar ---
+    facet_panel = FacetPanel(tab, [(f, FIELD_LABELS[f]) for f in FACETS], lambda: search_records())
+    facet_panel.pack(side="left", fill="y", padx=(20, 0), pady=10)
 
    
     display_frame = ttk.LabelFrame(tab, text="Inventory Records", padding=10)
     display_frame.pack(fill="both", expand=True, padx=20, pady=10)
-    tree = ttk.Treeview(display_frame, columns=HEADERS, show="headings", height=18)
+    tree = VirtualTreeview(display_frame, columns=HEADERS, show="headings", height=18)
     for col in HEADERS:
         tree.heading(col, text=col)
         tree.column(col, width=120, stretch=True)
     tree.pack(fill="both", expand=True, side="left")
+    tree.enable_sorting(executor, key="search")
     scroll_y = ttk.Scrollbar(display_frame, orient="vertical", command=tree.yview)
     tree.configure(yscroll=scroll_y.set)
     scroll_y.pack(side="right", fill="y")
 
-   
-    cancelled_tree = None
-    if current_user_role == "Administrator":
-        tab_cancelled = ttk.Frame(notebook)
-        notebook.add(tab_cancelled, text="🗑 Cancelled Records")
-        cancelled_frame = ttk.LabelFrame(tab_cancelled, text="Cancelled Records", padding=10)
-        cancelled_frame.pack(fill="both", expand=True, padx=20, pady=10)
-        cancelled_tree = ttk.Treeview(cancelled_frame, columns=HEADERS, show="headings", height=18)
-        for col in HEADERS:
-            cancelled_tree.heading(col, text=col)
-            cancelled_tree.column(col, width=120, stretch=True)
-        cancelled_tree.pack(fill="both", expand=True, side="left")
-        cancelled_scroll_y = ttk.Scrollbar(cancelled_frame, orient="vertical", command=cancelled_tree.yview)
-        cancelled_tree.configure(yscroll=cancelled_scroll_y.set)
-        cancelled_scroll_y.pack(side="right", fill="y")
-
-        def restore_record():
-            selected = cancelled_tree.focus()
-            if not selected:
-                messagebox.showwarning("Select Record", "Please select a record to restore.")
-                return
-            record_id = cancelled_tree.item(selected, "values")[0]
-            if messagebox.askyesno("Restore", "Do you want to restore this record?"):
-                cursor.execute("UPDATE inventory SET cancelled=0 WHERE id=?", (record_id,))
-                conn.commit()
-                refresh_manage()
-                load_cancelled_records()
-                messagebox.showinfo("Restored", "Record has been restored.")
-
-        tk.Button(tab_cancelled, text="♻️ Restore Selected", command=restore_record,
-                  bg="#27ae60", fg="white", width=18, height=2).pack(pady=10)
-
  
     filter_applied = False
 
     def load_all_records():
         nonlocal filter_applied
-        cursor.execute(f"SELECT {', '.join(FIELDS)} FROM inventory WHERE cancelled=0")
-        records = cursor.fetchall()
-        tree.delete(*tree.get_children())
-        for r in records:
-            tree.insert("", tk.END, values=r)
+        executor.cancel("search")
+        search_status.config(text="")
+        tree.set_source(RecordSource(conn, FIELDS, "cancelled=0", counter=lambda: summary_total(conn, 0)))
         filter_applied = False
+        refresh_facets()
+
+    # --- Search as you type ---
+    SEARCH_DELAY_MS = 300
+    MIN_TYPED_CHARS = 3  # shorter terms are a LIKE scan of every column: only on Return
+    pending_search = None
+    searched_term = ""
+
+    def on_search_typed(*_):
+        nonlocal pending_search
+        if pending_search is not None:
+            search_entry.after_cancel(pending_search)
+        pending_search = search_entry.after(SEARCH_DELAY_MS, search_as_you_type)
 
-    def load_cancelled_records():
-        if cancelled_tree is None:
+    def search_as_you_type():
+        nonlocal pending_search
+        pending_search = None
+        term = search_var.get().strip()
+        if term == searched_term or 0 < len(term) < MIN_TYPED_CHARS:
             return
-        cursor.execute(f"SELECT {', '.join(FIELDS)} FROM inventory WHERE cancelled=1")
-        records = cursor.fetchall()
-        cancelled_tree.delete(*cancelled_tree.get_children())
-        for r in records:
-            cancelled_tree.insert("", tk.END, values=r)
+        search_records()
 
-  
-    def search_records(event=None):
-        nonlocal filter_applied
+    search_var.trace_add("write", on_search_typed)
+
+    def refresh_facets():
+        # live counts for every facet value: one grouped query on a worker thread
         term = search_var.get().strip()
-        if not term:
+        selection, date_range = facet_panel.selection(), facet_panel.date_range()
+        try:
+            facet_filter(selection, date_range)
+        except ValueError:
+            return  # search_records() reports it
+
+        def run(reader):
+            where, params = "cancelled=0", ()
+            if term:
+                search_where, params = search_filter(reader, term)
+                where += f" AND {search_where}"
+            return facet_counts(reader, where, params, selection, date_range)
+
+        executor.submit(run, facet_panel.set_counts, key="facets")
+
+    def search_records(event=None):
+        nonlocal searched_term
+        term = searched_term = search_var.get().strip()
+        try:
+            where, params = facet_filter(facet_panel.selection(), facet_panel.date_range())
+        except ValueError as e:
+            messagebox.showwarning("Invalid Date", str(e))
+            return
+        if not term and not facet_panel.is_active():
             load_all_records()
             return
+        where = f"cancelled=0 AND {where}"
+
+        # count + first page on a worker thread; later pages are small keyset reads
+        def run(reader):
+            if term:
+                source = search_source(reader, term, FIELDS, where, params)
+            else:
+                source = RecordSource(reader, FIELDS, where, params)
+            return source, source.count(), source.fetch(None, tree.page_size)
 
-        search_columns = [
-            "asset_class", "asset_id", "asset_name", "manufactured_date", "business_unit",
-            "department", "branch", "brand", "description", "serial_number",
-            "custodian", "device_status"
-        ]
-        conditions = " OR ".join([f"{col} LIKE ? COLLATE NOCASE" for col in search_columns])
-        params = [f"%{term}%"] * len(search_columns)
-
-        cursor.execute(f"SELECT {', '.join(FIELDS)} FROM inventory WHERE cancelled=0 AND ({conditions})", params)
-        records = cursor.fetchall()
-        tree.delete(*tree.get_children())
-        for r in records:
-            tree.insert("", tk.END, values=r)
-        filter_applied = True
+        def show(result):
+            nonlocal filter_applied
+            source, total, first_page = result
+            source.conn = conn
+            tree.set_source(source, total=total, first_page=first_page)
+            search_status.config(text=f"{total:,} found")
+            filter_applied = True
+
+        def failed(e):
+            search_status.config(text="")
+            messagebox.showerror("Database Error", str(e))
+
+        # the current results stay up until the new ones arrive; a search still
+        # running for an older term is interrupted by the executor
+        search_status.config(text="Searching...")
+        executor.submit(run, show, failed, key="search")
+        refresh_facets()
 
    
     def export_filtered():
-        records = [tree.item(child)["values"] for child in tree.get_children()]
-        if not records:
+        if not tree.total:
             messagebox.showwarning("No Data", "No records to export.")
             return
-        file = filedialog.asksaveasfilename(defaultextension=".xlsx", filetypes=[("Excel files","*.xlsx")])
+        file = filedialog.asksaveasfilename(defaultextension=".xlsx",
+                                            filetypes=[("Excel files","*.xlsx"), ("CSV files","*.csv")])
         if not file:
             return
-        wb = Workbook()
-        ws = wb.active
-        ws.append(HEADERS)
-        for r in records:
-            ws.append(r)
-        wb.save(file)
-        messagebox.showinfo("Exported", f"Data exported to {file}")
+
+        # re-run the active filter as a cursor on a worker thread and stream it out
+        source, total = tree.source, tree.total
+        progress_win = ProgressDialog(root, "Exporting...", verb="Exported")
+
+        def run(reader):
+            export_source = copy.copy(source)  # the grid keeps paging through the original
+            export_source.conn = reader
+            return export_records(export_source, file, HEADERS,
+                                  progress=lambda written: executor.post(progress_win.update_progress, written, total))
+
+        def done(written):
+            progress_win.destroy()
+            messagebox.showinfo("Exported", f"{written:,} records exported to {file}")
+
+        def failed(e):
+            progress_win.destroy()
+            messagebox.showerror("Export Failed", f"Could not export to {file}:\n{e}")
+
+        executor.submit(run, done, failed)
 
  
     def cancel_record():
@@ -149,10 +182,8 @@ def build_manage_tab(root, notebook, current_user_role):
             return
         record_id = tree.item(selected, "values")[0]
         if messagebox.askyesno("Cancel", "Are you sure you want to cancel this record?"):
-            cursor.execute("UPDATE inventory SET cancelled=1 WHERE id=?", (record_id,))
-            conn.commit()
+            inventory_writes().execute("UPDATE inventory SET cancelled=1 WHERE id=?", (record_id,))
             refresh_manage()
-            load_cancelled_records()
             messagebox.showinfo("Cancelled", "Record has been cancelled.")
 
    
@@ -161,30 +192,57 @@ def build_manage_tab(root, notebook, current_user_role):
         if not selected:
             messagebox.showwarning("Select Record", "Please select a record to edit.")
             return
-        record = tree.item(selected, "values")
-        record_id = record[0]
+        record_id = tree.item(selected, "values")[0]
+        # the grid row may be minutes old: edit the current row and remember its version
+        base, base_version = load_record(conn, record_id)
+        if base is None:
+            messagebox.showwarning("Record Gone", "This record no longer exists.")
+            refresh_manage()
+            return
 
         edit_win = tk.Toplevel(root)
         edit_win.title(f"Edit Record ID {record_id}")
         edit_entries = {}
-        for i, field in enumerate(HEADERS[1:-1]):  
-            tk.Label(edit_win, text=field).grid(row=i, column=0, padx=5, pady=3, sticky="w")
+        for i, field in enumerate(base):
+            tk.Label(edit_win, text=FIELD_LABELS[field]).grid(row=i, column=0, padx=5, pady=3, sticky="w")
             entry = tk.Entry(edit_win, width=35)
-            entry.insert(0, record[i+1])
+            entry.insert(0, "" if base[field] is None else base[field])
             entry.grid(row=i, column=1, padx=5, pady=3)
             edit_entries[field] = entry
 
         def save_edit():
-            values = [e.get() for e in edit_entries.values()]
-            cursor.execute(f"""
-                UPDATE inventory SET
-                asset_class=?, asset_id=?, asset_name=?, manufactured_date=?, date_acquired=?,
-                business_unit=?, department=?, branch=?, brand=?, description=?,
-                serial_number=?, custodian=?, device_status=?
-                WHERE id=?
-            """, values + [record_id])
-            conn.commit()
-            messagebox.showinfo("Updated", "Record updated successfully!")
+            nonlocal base, base_version
+            wanted = {field: e.get() for field, e in edit_entries.items()}
+            changes = diff_record(base, wanted)
+            merged_theirs = False
+            while changes:
+                try:
+                    saved = inventory_writes().run(
+                        lambda c: update_record(c, record_id, base_version, changes))
+                except sqlite3.IntegrityError:
+                    messagebox.showwarning("Duplicate Entry", "This serial number already exists in the database!")
+                    return
+                if saved:
+                    break
+                # someone saved this record since it was opened: merge field by field
+                theirs, version = load_record(conn, record_id)
+                if theirs is None:
+                    messagebox.showwarning("Record Gone", "This record was removed while you were editing it.")
+                    edit_win.destroy()
+                    refresh_manage()
+                    return
+                merged, conflicts = merge_changes(base, wanted, theirs)
+                if conflicts:
+                    merged = ask_merge(edit_win, record_id, base, wanted, theirs, merged, conflicts)
+                    if merged is None:
+                        return  # keep editing; the next save merges again
+                base, base_version, wanted = theirs, version, merged
+                changes = diff_record(theirs, merged)
+                merged_theirs = True
+            if merged_theirs:
+                messagebox.showinfo("Updated", "Record updated. Changes saved meanwhile by someone else were merged in.")
+            else:
+                messagebox.showinfo("Updated", "Record updated successfully!" if changes else "Nothing was changed.")
             edit_win.destroy()
             refresh_manage()
 
@@ -199,11 +257,127 @@ def build_manage_tab(root, notebook, current_user_role):
     tk.Button(btn_manage_frame, text="📤 Export Filtered", command=export_filtered, bg="#f39c12", fg="white", width=15, height=2).grid(row=0,column=2,padx=5)
 
     
+    follow_changes = change_follower(conn, tree)
+
     def refresh_manage():
-        load_all_records()
+        follow_changes()
+        refresh_facets()
 
     # --- Initial load ---
-    refresh_manage()
-    load_cancelled_records()
+    load_all_records()
 
     return tab, refresh_manage
+
+
+FIELD_LABELS = dict(zip(FIELDS, FIELD_HEADERS))
+
+
+def ask_merge(parent, record_id, base, mine, theirs, merged, conflicts):
+    """
+    Per-field merge dialog for an edit that lost a race. Lists every field
+    either side changed; ``conflicts`` (changed by both) are highlighted and
+    must be decided, the others start on the side that changed them.
+    Returns the chosen {field: value}, or None when cancelled.
+    """
+    win = tk.Toplevel(parent)
+    win.title(f"Merge Changes - Record ID {record_id}")
+    win.transient(parent)
+    win.grab_set()
+    tk.Label(win, text="This record was changed by someone else while you were editing it.\n"
+                       "Choose which value to keep for each field.", justify="left")\
+        .grid(row=0, column=0, columnspan=4, padx=10, pady=8, sticky="w")
+    for col, text in enumerate(("FIELD", "ORIGINAL", "YOURS", "THEIRS")):
+        tk.Label(win, text=text, font=("Segoe UI", 9, "bold")).grid(row=1, column=col, padx=5, sticky="w")
+
+    shown = lambda v: "" if v is None else str(v)
+    choices = {}
+    row = 2
+    for field in base:
+        if shown(mine[field]) == shown(base[field]) and shown(theirs[field]) == shown(base[field]):
+            continue
+        conflict = field in conflicts
+        tk.Label(win, text=FIELD_LABELS[field], fg="#c0392b" if conflict else "black")\
+            .grid(row=row, column=0, padx=5, pady=2, sticky="w")
+        tk.Label(win, text=shown(base[field]), fg="gray").grid(row=row, column=1, padx=5, sticky="w")
+        choice = tk.StringVar(value="theirs" if conflict or shown(merged[field]) == shown(theirs[field]) else "mine")
+        tk.Radiobutton(win, text=shown(mine[field]), variable=choice, value="mine")\
+            .grid(row=row, column=2, padx=5, sticky="w")
+        tk.Radiobutton(win, text=shown(theirs[field]), variable=choice, value="theirs")\
+            .grid(row=row, column=3, padx=5, sticky="w")
+        choices[field] = choice
+        row += 1
+
+    result = {}
+
+    def apply():
+        result.update(merged)
+        for field, choice in choices.items():
+            result[field] = mine[field] if choice.get() == "mine" else theirs[field]
+        win.destroy()
+
+    buttons = tk.Frame(win)
+    buttons.grid(row=row, column=0, columnspan=4, pady=10)
+    tk.Button(buttons, text="✔ Save Merged", command=apply, bg="#28b463", fg="white", width=14).pack(side="left", padx=5)
+    tk.Button(buttons, text="Cancel", command=win.destroy, width=10).pack(side="left", padx=5)
+    win.wait_window()
+    return result or None
+
+
+def build_cancelled_tab(root, notebook, tab=None):
+    """Cancelled Records tab (Administrators only). Returns the tab and its refresh callback."""
+    conn = get_inventory_conn()
+    HEADERS = FIELD_HEADERS
+
+    if tab is None:
+        tab = ttk.Frame(notebook)
+        notebook.add(tab, text="🗑 Cancelled Records")
+    cancelled_frame = ttk.LabelFrame(tab, text="Cancelled Records", padding=10)
+    cancelled_frame.pack(fill="both", expand=True, padx=20, pady=10)
+    cancelled_tree = VirtualTreeview(cancelled_frame, columns=HEADERS, show="headings", height=18)
+    for col in HEADERS:
+        cancelled_tree.heading(col, text=col)
+        cancelled_tree.column(col, width=120, stretch=True)
+    cancelled_tree.pack(fill="both", expand=True, side="left")
+    cancelled_tree.enable_sorting(get_executor(root), key="cancelled-sort")
+    cancelled_scroll_y = ttk.Scrollbar(cancelled_frame, orient="vertical", command=cancelled_tree.yview)
+    cancelled_tree.configure(yscroll=cancelled_scroll_y.set)
+    cancelled_scroll_y.pack(side="right", fill="y")
+
+    def restore_record():
+        selected = cancelled_tree.focus()
+        if not selected:
+            messagebox.showwarning("Select Record", "Please select a record to restore.")
+            return
+        record_id = cancelled_tree.item(selected, "values")[0]
+        if messagebox.askyesno("Restore", "Do you want to restore this record?"):
+            try:
+                inventory_writes().execute("UPDATE inventory SET cancelled=0 WHERE id=?", (record_id,))
+            except sqlite3.IntegrityError:
+                messagebox.showwarning("Duplicate Entry", "An active record with this serial number already exists!")
+                return
+            refresh_cancelled()
+            messagebox.showinfo("Restored", "Record has been restored.")
+
+    tk.Button(tab, text="♻️ Restore Selected", command=restore_record,
+              bg="#27ae60", fg="white", width=18, height=2).pack(pady=10)
+
+    refresh_cancelled = change_follower(conn, cancelled_tree)
+    cancelled_tree.set_source(RecordSource(conn, FIELDS, "cancelled=1", counter=lambda: summary_total(conn, 1)))
+
+    return tab, refresh_cancelled
+
+
+def change_follower(conn, view):
+    """
+    Callback that patches ``view`` with the rows changed since it last ran.
+    Each view keeps its own version, so one that was built (or refreshed)
+    later still catches up on edits made from any other tab.
+    """
+    seen_version = current_version(conn)
+
+    def refresh():
+        nonlocal seen_version
+        changed, seen_version = changed_since(conn, seen_version)
+        if changed:
+            view.apply_changes(changed)
+    return refresh
@@ -2,9 +2,13 @@ import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog
 import sqlite3
 
-def build_manage_role_tab(root, notebook, cursor, conn, refresh_all_comboboxes):
-    tab_roles = ttk.Frame(notebook)
-    notebook.add(tab_roles, text="🛠 EDIT CATEGORIES")
+from db import fetch_values, invalidate_reference, inventory_writes
+
+def build_manage_role_tab(root, notebook, cursor, conn, refresh_all_comboboxes, tab=None):
+    tab_roles = tab
+    if tab_roles is None:
+        tab_roles = ttk.Frame(notebook)
+        notebook.add(tab_roles, text="🛠 EDIT CATEGORIES")
 
     role_frame = ttk.LabelFrame(tab_roles, text="EDIT CATEGORIES", padding=15)
     role_frame.pack(fill="x", padx=20, pady=15)
@@ -32,10 +36,7 @@ def build_manage_role_tab(root, notebook, cursor, conn, refresh_all_comboboxes):
 
     def refresh_role_items(event=None):
         table = role_tables[role_type_var.get()]
-        conn.commit() 
-        cur = conn.cursor()
-        cur.execute(f"SELECT name FROM {table} ORDER BY name")
-        items = [row[0] for row in cur.fetchall()]
+        items = fetch_values(table)
         role_item_cb['values'] = items
         if items:
             role_item_cb.current(0)
@@ -51,8 +52,8 @@ def build_manage_role_tab(root, notebook, cursor, conn, refresh_all_comboboxes):
         new_item = simpledialog.askstring("Add", f"Enter new {role_type_var.get()}:")
         if new_item:
             try:
-                cursor.execute(f"INSERT INTO {table} (name) VALUES (?)", (new_item.strip(),))
-                conn.commit()
+                inventory_writes().execute(f"INSERT INTO {table} (name) VALUES (?)", (new_item.strip(),))
+                invalidate_reference(table)
                 
                 refresh_role_items()
                 messagebox.showinfo("Added", f"{role_type_var.get()} '{new_item}' added!")
@@ -68,8 +69,8 @@ def build_manage_role_tab(root, notebook, cursor, conn, refresh_all_comboboxes):
         new = simpledialog.askstring("Edit", f"Rename '{old}' to:", initialvalue=old)
         if new and new.strip():
             try:
-                cursor.execute(f"UPDATE {table} SET name=? WHERE name=?", (new.strip(), old))
-                conn.commit()
+                inventory_writes().execute(f"UPDATE {table} SET name=? WHERE name=?", (new.strip(), old))
+                invalidate_reference(table)
                 refresh_role_items()
                 messagebox.showinfo("Updated", f"{old} updated to '{new}'")
             except sqlite3.IntegrityError:
@@ -82,8 +83,8 @@ def build_manage_role_tab(root, notebook, cursor, conn, refresh_all_comboboxes):
             messagebox.showwarning("Select", f"Please select a {role_type_var.get()} to delete.")
             return
         if messagebox.askyesno("Delete", f"Are you sure you want to delete '{selected}'?"):
-            cursor.execute(f"DELETE FROM {table} WHERE name=?", (selected,))
-            conn.commit()
+            inventory_writes().execute(f"DELETE FROM {table} WHERE name=?", (selected,))
+            invalidate_reference(table)
             
             refresh_role_items()
             messagebox.showinfo("Deleted", f"{selected} deleted!")
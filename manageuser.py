@@ -3,7 +3,9 @@ import tkinter as tk
 from tkinter import ttk, messagebox
 import sqlite3
 
-def build_manageuser_tab(root, notebook, current_user_role):
+from db import get_accounts_conn, accounts_reader
+
+def build_manageuser_tab(root, notebook, current_user_role, tab=None):
     """
     Build the 'Manage Users' tab for Administrators only.
     """
@@ -11,8 +13,9 @@ def build_manageuser_tab(root, notebook, current_user_role):
         messagebox.showerror("Access Denied", "Only Administrators can access User Management.")
         return None
 
-    tab = ttk.Frame(notebook)
-    notebook.add(tab, text="👤 MANAGE USER")
+    if tab is None:
+        tab = ttk.Frame(notebook)
+        notebook.add(tab, text="👤 MANAGE USER")
 
     HEADERS = ["ID", "USERNAME", "ROLE"]
     tree_frame = ttk.LabelFrame(tab, text="USER LIST", padding=10)
@@ -28,18 +31,14 @@ def build_manageuser_tab(root, notebook, current_user_role):
     tree.configure(yscroll=scroll_y.set)
     scroll_y.pack(side="right", fill="y")
 
-    def get_accounts_conn():
-        return sqlite3.connect("accounts.db")
-
     def load_users():
-        conn = get_accounts_conn()
-        cur = conn.cursor()
-        cur.execute("SELECT id, username, role FROM accounts")
-        records = cur.fetchall()
+        with accounts_reader() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT id, username, role FROM accounts")
+            records = cur.fetchall()
         tree.delete(*tree.get_children())
         for r in records:
             tree.insert("", tk.END, values=r)
-        conn.close()
 
     def add_user():
         add_win = tk.Toplevel(root)
@@ -71,11 +70,11 @@ def build_manageuser_tab(root, notebook, current_user_role):
                 cur.execute("INSERT INTO accounts (username, password, role) VALUES (?, ?, ?)",
                             (username, password, role))
                 conn.commit()
-                conn.close()
                 load_users()
                 messagebox.showinfo("Success", f"User '{username}' added successfully.")
                 add_win.destroy()
             except sqlite3.IntegrityError:
+                get_accounts_conn().rollback()
                 messagebox.showerror("Error", "Username already exists.")
 
         tk.Button(add_win, text="💾 Save", command=save_user, bg="#28b463", fg="white").grid(row=3, column=0, columnspan=2, pady=10)
@@ -122,11 +121,11 @@ def build_manageuser_tab(root, notebook, current_user_role):
                     cur.execute("UPDATE accounts SET username=?, role=? WHERE id=?",
                                 (new_username, new_role, user_id))
                 conn.commit()
-                conn.close()
                 load_users()
                 messagebox.showinfo("Updated", "User updated successfully.")
                 edit_win.destroy()
             except sqlite3.IntegrityError:
+                get_accounts_conn().rollback()
                 messagebox.showerror("Error", "Username already exists.")
 
         tk.Button(edit_win, text="💾 Save Changes", command=save_edit, bg="#28b463", fg="white").grid(row=3, column=0, columnspan=2, pady=10)
@@ -143,7 +142,6 @@ def build_manageuser_tab(root, notebook, current_user_role):
             cur = conn.cursor()
             cur.execute("DELETE FROM accounts WHERE id=?", (user_id,))
             conn.commit()
-            conn.close()
             load_users()
             messagebox.showinfo("Deleted", f"User '{username}' deleted successfully.")
 
@@ -0,0 +1,201 @@
+"""
+Hardware probe: serial number, manufacturer and BIOS date of this machine.
+
+Each platform is read with a single batched query (one PowerShell call on
+Windows, sysfs files on Linux, one ioreg call on macOS). Results are cached in
+hardware_probe.json next to the database, keyed by machine name because the
+exe folder may be shared, and refreshed in the background once they are older
+than PROBE_TTL, so startup never waits on a probe.
+"""
+import json
+import os
+import platform
+import queue
+import subprocess
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+from db import EXE_DIR
+
+CACHE_FILE = EXE_DIR / "hardware_probe.json"
+PROBE_TTL = int(os.environ.get("INVENTORY_PROBE_TTL", 7 * 24 * 3600))  # seconds
+PROBE_TIMEOUT = 20  # seconds for the probe subprocess
+DMI_DIR = Path("/sys/class/dmi/id")
+
+UNKNOWN = "Unknown"
+
+# one PowerShell process for all three values, printed as one "|"-separated line
+# (empty fields stay in place); CIM returns ReleaseDate as a DateTime
+_POWERSHELL_QUERY = (
+    "$b = Get-CimInstance Win32_BIOS; $c = Get-CimInstance Win32_ComputerSystem; "
+    "$d = if ($b.ReleaseDate) { $b.ReleaseDate.ToString('yyyy-MM-dd') } else { '' }; "
+    "\"$($b.SerialNumber)|$($c.Manufacturer)|$d\""
+)
+
+
+def _run(args):
+    kwargs = {}
+    if os.name == "nt":
+        kwargs["creationflags"] = subprocess.CREATE_NO_WINDOW  # no console flash from the windowed exe
+    return subprocess.run(args, capture_output=True, timeout=PROBE_TIMEOUT,
+                          **kwargs).stdout.decode(errors="ignore")
+
+
+def _clean(value):
+    value = (value or "").strip()
+    # placeholder strings firmware vendors leave in unset DMI fields
+    if not value or value.lower() in ("to be filled by o.e.m.", "default string", "system serial number", "none"):
+        return UNKNOWN
+    return value
+
+
+def _probe_windows():
+    try:
+        out = _run(["powershell", "-NoProfile", "-NonInteractive", "-Command", _POWERSHELL_QUERY]).strip()
+    except (OSError, subprocess.SubprocessError):
+        out = ""
+    if out.count("|") == 2:
+        serial, brand, date = out.split("|")
+        return _clean(brand), _clean(serial), _clean(date)
+    # PowerShell unavailable: one cmd invocation running both wmic queries
+    values = {}
+    try:
+        out = _run(["cmd", "/c", "wmic bios get SerialNumber,ReleaseDate /value & "
+                    "wmic computersystem get Manufacturer /value"])
+    except (OSError, subprocess.SubprocessError):
+        out = ""
+    for line in out.splitlines():
+        key, sep, value = line.partition("=")
+        if sep:
+            values[key.strip().lower()] = value.strip()
+    raw_date = values.get("releasedate", "")
+    date = f"{raw_date[0:4]}-{raw_date[4:6]}-{raw_date[6:8]}" if len(raw_date) >= 8 else ""
+    return _clean(values.get("manufacturer")), _clean(values.get("serialnumber")), _clean(date)
+
+
+def _read_dmi(name):
+    try:
+        return (DMI_DIR / name).read_text(errors="ignore").strip()
+    except OSError:  # product_serial is root-only on most distributions
+        return ""
+
+
+def _probe_linux():
+    raw_date = _read_dmi("bios_date")  # MM/DD/YYYY
+    try:
+        date = datetime.strptime(raw_date, "%m/%d/%Y").strftime("%Y-%m-%d")
+    except ValueError:
+        date = raw_date
+    serial = _read_dmi("product_serial") or _read_dmi("board_serial") or _read_dmi("chassis_serial")
+    return _clean(_read_dmi("sys_vendor")), _clean(serial), _clean(date)
+
+
+def _probe_mac():
+    try:
+        out = _run(["ioreg", "-rd1", "-c", "IOPlatformExpertDevice"])
+    except (OSError, subprocess.SubprocessError):
+        out = ""
+    serial = ""
+    for line in out.splitlines():
+        if "IOPlatformSerialNumber" in line:
+            serial = line.split("=", 1)[-1].strip().strip('"')
+    return "Apple", _clean(serial), UNKNOWN
+
+
+def probe():
+    """Query the hardware now: (brand, device_name, serial_number, manufactured_date)."""
+    system = platform.system()
+    if system == "Windows":
+        brand, serial, date = _probe_windows()
+    elif system == "Linux":
+        brand, serial, date = _probe_linux()
+    elif system == "Darwin":
+        brand, serial, date = _probe_mac()
+    else:
+        brand = serial = date = UNKNOWN
+    return (brand, platform.node(), serial, date)
+
+
+# --- disk cache ---
+def _load_cache():
+    try:
+        with open(CACHE_FILE, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def cached_info(ttl=PROBE_TTL):
+    """
+    (info, fresh) from the disk cache. info is None when this machine was never
+    probed; fresh is False once the entry is older than ``ttl`` seconds.
+    """
+    entry = _load_cache().get(platform.node())
+    if not entry:
+        return None, False
+    return tuple(entry["info"]), time.time() - entry["probed_at"] < ttl
+
+
+def save_info(info):
+    cache = _load_cache()
+    cache[platform.node()] = {"probed_at": time.time(), "info": list(info)}
+    try:
+        with open(CACHE_FILE, "w", encoding="utf-8") as f:
+            json.dump(cache, f, indent=1)
+    except OSError:
+        pass  # read-only install folder: probe again next launch
+
+
+# --- background probing for the UI ---
+_listeners = []
+_current = None
+
+
+def current_info():
+    """Best hardware info known right now, without probing."""
+    global _current
+    if _current is None:
+        info, _ = cached_info()
+        _current = info or (UNKNOWN, platform.node(), UNKNOWN, UNKNOWN)
+    return _current
+
+
+def on_info(callback):
+    """Call callback(info) on the Tk thread whenever a background probe finishes."""
+    _listeners.append(callback)
+
+
+def start_background_probe(root, ttl=PROBE_TTL, poll_ms=200):
+    """Refresh the cached info on a worker thread if it is missing or stale."""
+    current_info()
+    info, fresh = cached_info(ttl)
+    if fresh:
+        return
+    results = queue.Queue()
+
+    def work():
+        try:
+            result = probe()
+        except Exception:
+            result = None
+        else:
+            save_info(result)
+        results.put(result)
+
+    def poll():
+        global _current
+        try:
+            result = results.get_nowait()
+        except queue.Empty:
+            root.after(poll_ms, poll)
+            return
+        if result is None:
+            return
+        _current = result
+        for callback in _listeners:
+            callback(result)
+
+    threading.Thread(target=work, name="hardware-probe", daemon=True).start()
+    root.after(poll_ms, poll)
@@ -0,0 +1,472 @@
+"""
+Keyset-paginated record sources for the inventory views.
+
+A source describes *which* inventory rows a view shows (a WHERE clause and
+its parameters) and knows how to hand them out one page at a time using
+keyset queries (``id > ?``) instead of loading the whole result set.
+Sources never touch Tk, so the same code can be driven headlessly.
+"""
+import copy
+import re
+from datetime import date
+
+from db import SEARCH_COLUMNS, ROLLUP_DATES, has_search_index
+
+FIELDS = [
+    "id", "asset_class", "asset_id", "asset_name", "manufactured_date", "date_acquired",
+    "business_unit", "department", "branch", "brand", "description", "serial_number",
+    "custodian", "device_status", "cancelled"
+]
+
+# column headings used by the record grids and exports, in FIELDS order
+FIELD_HEADERS = [
+    "ID", "TOOL OF TRADE", "ASSET ID", "ASSET NAME", "MANUFACTURED DATE", "DATE ACQUIRED",
+    "BUSINESS UNIT", "DEPARTMENT", "BRANCH", "BRAND", "ASSET DESCRIPTION",
+    "SERIAL NUMBER", "CUSTODIAN", "ASSET STATUS", "CANCELLED"
+]
+
+# the columns a user can edit on an existing record
+EDITABLE_FIELDS = FIELDS[1:-1]
+
+# columns of the facet sidebar, in display order
+FACETS = ["branch", "business_unit", "department", "device_status", "asset_class"]
+
+# Report metrics and the filter each one drills down to. The filters only use
+# device_status / branch / cancelled so they can be evaluated against the
+# trigger-maintained inventory_summary table as well as inventory itself.
+REPORT_METRICS = {
+    "TOTAL DEVICE ACTIVE": "cancelled=0 AND device_status IN ('ACTIVE', 'FOR REPLACEMENT')",
+    "TOTAL CANCELLED ENTRIES": "cancelled=1",
+    "TOTAL DEVICE UNDER HEAD OFFICE": "cancelled=0 AND branch='HOME OFFICE'",
+    "TOTAL DEVICE FOR REPLACEMENT": "cancelled=0 AND device_status='FOR REPLACEMENT'",
+    "TOTAL DEVICE FOR REPAIR": "cancelled=0 AND device_status='FOR REPAIR'",
+    "TOTAL DEVICE FOR RETIRED": "cancelled=0 AND device_status='RETIRED'",
+    "TOTAL DEVICE FOR DISPOSAL": "cancelled=0 AND device_status='FOR DISPOSAL'",
+}
+
+
+def report_counts(conn, metrics=REPORT_METRICS):
+    """All metric counts in one query over inventory_summary: {metric: count}."""
+    sums = ", ".join(f"IFNULL(SUM(CASE WHEN {where} THEN total END), 0)" for where in metrics.values())
+    cur = conn.cursor()
+    cur.execute(f"SELECT {sums} FROM inventory_summary")
+    return dict(zip(metrics, cur.fetchone()))
+
+
+def summary_branches(conn):
+    """Branches that currently have active records."""
+    cur = conn.cursor()
+    cur.execute("SELECT DISTINCT branch FROM inventory_summary "
+                "WHERE cancelled=0 AND total > 0 AND branch <> '' ORDER BY branch")
+    return [r[0] for r in cur.fetchall()]
+
+
+# age buckets of the aging report: (label, upper bound in months, exclusive); None = no bound
+AGE_BUCKETS = [("0-2 YEARS", 24), ("2-4 YEARS", 48), ("4+ YEARS", None)]
+
+
+def _rollup_group(group_by):
+    if group_by not in (None, "branch", "department"):
+        raise ValueError(f"Cannot group by {group_by!r}")
+    return group_by or "''"
+
+
+def aging_report(conn, kind="acquired", group_by=None, today=None):
+    """
+    Active records per age bucket of their date_acquired (kind "acquired") or
+    manufactured_date ("manufactured"), optionally per branch or department:
+    [(group, [count per AGE_BUCKETS], undated, total)]. Reads inventory_monthly;
+    ages are whole months computed against ``today`` at query time, so the
+    rollup never needs re-bucketing as time passes.
+    """
+    if kind not in ROLLUP_DATES:
+        raise ValueError(f"Unknown date kind {kind!r}")
+    today = today or date.today()
+    age = "(? - CAST(substr(month, 1, 4) AS INTEGER) * 12 - CAST(substr(month, 6, 2) AS INTEGER))"
+    buckets = " ".join(f"WHEN {age} < {upper} THEN {i}"
+                       for i, (_, upper) in enumerate(AGE_BUCKETS) if upper is not None)
+    cur = conn.cursor()
+    cur.execute(f"""
+        SELECT {_rollup_group(group_by)},
+               CASE WHEN month = '' THEN -1 {buckets} ELSE {len(AGE_BUCKETS) - 1} END,
+               SUM(total)
+        FROM inventory_monthly WHERE kind = ? AND cancelled = 0
+        GROUP BY 1, 2 HAVING SUM(total) > 0 ORDER BY 1
+    """, [today.year * 12 + today.month] * (len(AGE_BUCKETS) - 1) + [kind])
+    rows = {}
+    for group, bucket, count in cur.fetchall():
+        counts = rows.setdefault(group, [[0] * len(AGE_BUCKETS), 0])
+        if bucket < 0:
+            counts[1] += count
+        else:
+            counts[0][bucket] += count
+    return [(group, counts, undated, sum(counts) + undated) for group, (counts, undated) in rows.items()]
+
+
+def acquisition_trend(conn, group_by=None, kind="acquired"):
+    """
+    [(group, month, count)] of active records per 'YYYY-MM' of their
+    date_acquired (or manufactured_date), newest month first within each
+    group; month '' collects records without a usable date. From inventory_monthly.
+    """
+    if kind not in ROLLUP_DATES:
+        raise ValueError(f"Unknown date kind {kind!r}")
+    cur = conn.cursor()
+    cur.execute(f"""
+        SELECT {_rollup_group(group_by)}, month, SUM(total)
+        FROM inventory_monthly WHERE kind = ? AND cancelled = 0
+        GROUP BY 1, 2 HAVING SUM(total) > 0 ORDER BY 1, 2 DESC
+    """, (kind,))
+    return cur.fetchall()
+
+
+def summary_total(conn, cancelled=0):
+    """Number of records with the given cancelled flag, from inventory_summary."""
+    cur = conn.cursor()
+    cur.execute("SELECT IFNULL(SUM(total), 0) FROM inventory_summary WHERE cancelled=?", (cancelled,))
+    return cur.fetchone()[0]
+
+
+def current_version(conn):
+    """The latest row_version handed out (see db.init_change_tracking)."""
+    cur = conn.cursor()
+    cur.execute("SELECT version FROM inventory_clock")
+    row = cur.fetchone()
+    return row[0] if row else 0
+
+
+def changed_since(conn, version):
+    """Ids of records inserted/updated after ``version``, and the new version."""
+    cur = conn.cursor()
+    cur.execute("SELECT id, row_version FROM inventory WHERE row_version > ?", (version,))
+    rows = cur.fetchall()
+    return [r[0] for r in rows], max([version] + [r[1] for r in rows])
+
+
+def facet_filter(selection, date_range=(None, None), exclude=None):
+    """
+    (where, params) for a facet selection {column: [values]} and a
+    date_acquired (start, end) range; either end may be None and may be a
+    year, year-month or full date. '' stands for an empty/NULL value.
+    ``exclude`` leaves one facet's own selection out. Raises ValueError for a
+    malformed date.
+    """
+    conditions, params = [], []
+    for column in FACETS:
+        values = selection.get(column)
+        if values and column != exclude:
+            # same expression as the (cancelled, IFNULL(col, '')) indexes
+            conditions.append(f"IFNULL({column}, '') IN ({', '.join('?' * len(values))})")
+            params.extend(values)
+    start, end = date_range
+    for bound in (start, end):
+        if bound and not re.fullmatch(r"\d{4}(-\d{2}){0,2}", bound):
+            raise ValueError(f"'{bound}' is not a date: use YYYY, YYYY-MM or YYYY-MM-DD")
+    if start:
+        conditions.append("IFNULL(date_acquired, '') >= ?")
+        params.append(start)
+    if end:
+        # '2021' must include '2021-12-31': compare against the end of that prefix
+        conditions.append("IFNULL(date_acquired, '') <= ?")
+        params.append(end + "\uffff")
+    return " AND ".join(conditions) or "1", params
+
+
+def facet_counts(conn, where="1", params=(), selection=None, date_range=(None, None)):
+    """
+    {column: [(value, count)]} for every facet, in one UNION ALL query over
+    the rows matching ``where``. Each facet's counts apply every other
+    facet's selection but not its own, so its alternatives stay visible.
+    """
+    parts, all_params = [], []
+    for index, column in enumerate(FACETS):
+        others, other_params = facet_filter(selection or {}, date_range, exclude=column)
+        parts.append(f"SELECT {index}, IFNULL({column}, ''), COUNT(*) FROM inventory "
+                     f"WHERE ({where}) AND ({others}) GROUP BY 2")
+        all_params += [*params, *other_params]
+    cur = conn.cursor()
+    cur.execute(" UNION ALL ".join(parts) + " ORDER BY 1, 2", all_params)
+    counts = {column: [] for column in FACETS}
+    for index, value, count in cur.fetchall():
+        counts[FACETS[index]].append((value, count))
+    return counts
+
+
+def load_record(conn, record_id):
+    """({field: value} for EDITABLE_FIELDS, row_version) of a record, or (None, None) if it is gone."""
+    cur = conn.cursor()
+    cur.execute(f"SELECT {', '.join(EDITABLE_FIELDS)}, row_version FROM inventory WHERE id=?", (record_id,))
+    row = cur.fetchone()
+    if row is None:
+        return None, None
+    return dict(zip(EDITABLE_FIELDS, row[:-1])), row[-1]
+
+
+def update_record(conn, record_id, row_version, changes):
+    """
+    Optimistic update: write only ``changes`` ({field: value}) and only if the
+    record still has ``row_version``. Returns False when someone else changed
+    it first (the row_version trigger stamps a new version on every update).
+    """
+    if not changes:
+        return True
+    assignments = ", ".join(f"{field}=?" for field in changes)
+    cur = conn.cursor()
+    cur.execute(f"UPDATE inventory SET {assignments} WHERE id=? AND row_version=?",
+                list(changes.values()) + [record_id, row_version])
+    return cur.rowcount == 1
+
+
+def merge_changes(base, mine, theirs):
+    """
+    Three-way merge of a record edited from ``base`` while it became ``theirs``.
+    Returns (merged, conflicts): fields only one side changed take that side's
+    value; ``conflicts`` lists the fields both changed to different values
+    (``merged`` holds their value for those).
+    """
+    merged, conflicts = dict(theirs), []
+    for field, value in mine.items():
+        if _text(value) == _text(base[field]):
+            continue
+        if _text(theirs[field]) not in (_text(base[field]), _text(value)):
+            conflicts.append(field)
+        else:
+            merged[field] = value
+    return merged, conflicts
+
+
+def diff_record(current, wanted):
+    """The {field: value} of ``wanted`` that differ from ``current``."""
+    return {f: v for f, v in wanted.items() if _text(v) != _text(current[f])}
+
+
+def _text(value):
+    # form entries hand back strings; NULL and '' look the same in the grid
+    return "" if value is None else str(value)
+
+
+class RecordSource:
+    """
+    A filtered, ordered view over the inventory table.
+
+    - columns: the columns returned for every row (the first one must be ``id``)
+    - where / params: the SQL filter for this view
+    - counter: optional callable returning the row count without a scan
+    - sort: None (by id) or (column, descending); see sorted_by()
+    - cache: optional resultcache.ResultCache for the paging queries
+    Rows are handed out as (key, values) pairs; ``key`` is what the next page
+    continues after: the id, or (sort value, id) for a sorted view.
+    """
+    def __init__(self, conn, columns=FIELDS, where="1", params=(), counter=None, sort=None, cache=None):
+        self.conn = conn
+        self.columns = list(columns)
+        self.where = where
+        self.params = tuple(params)
+        self.counter = counter
+        self.sort = sort
+        self.cache = cache
+
+    def sorted_by(self, column, descending=False):
+        """
+        The same view ordered by ``column`` (ties by id), in SQL. The keyset
+        key becomes (IFNULL(column, ''), id); db.SORT_INDEX_COLUMNS have indexes
+        on exactly that, so the first page of a sort needs no table scan.
+        """
+        if column not in FIELDS:
+            raise ValueError(f"Cannot sort by {column!r}")
+        source = copy.copy(self)
+        source.sort = None if column == "id" and not descending else (column, descending)
+        return source
+
+    @property
+    def descending(self):
+        return bool(self.sort and self.sort[1])
+
+    def _sort_expr(self):
+        column = self.sort[0]
+        return "id" if column == "id" else f"IFNULL({column}, '')"
+
+    def _order_by(self):
+        if self.sort is None:
+            return "id"
+        direction = " DESC" if self.descending else ""
+        return f"{self._sort_expr()}{direction}, id{direction}"
+
+    def _select(self):
+        sort = f"{self._sort_expr()}, " if self.sort else ""
+        return f"SELECT {sort}{', '.join(self.columns)} FROM inventory WHERE ({self.where})"
+
+    def _rows(self, sql, params):
+        if self.cache is not None:
+            return self.cache.fetch(self.conn, sql, params)
+        cur = self.conn.cursor()
+        cur.execute(sql, params)
+        return cur.fetchall()
+
+    def _pairs(self, rows):
+        if self.sort is None:
+            return [(self.key_of(r), r) for r in rows]
+        return [((r[0], r[1]), r[1:]) for r in rows]
+
+    def count(self):
+        if self.counter is not None:
+            return self.counter()
+        return self._rows(f"SELECT COUNT(*) FROM inventory WHERE ({self.where})", self.params)[0][0]
+
+    def fetch_ids(self, ids):
+        """(key, values) pairs for those of ``ids`` that are (still) in this view."""
+        ids = list(ids)
+        return self._pairs(self._rows(f"{self._select()} AND id IN ({', '.join('?' * len(ids))})",
+                                      self.params + tuple(ids)))
+
+    def key_of(self, row):
+        return row[0]
+
+    def key_for_id(self, record_id):
+        """The key a record with this id has (or had) in this view, if knowable without a query."""
+        return record_id if self.sort is None else None
+
+    def fetch(self, after, limit):
+        """Return up to ``limit`` (key, values) pairs that come after ``after``."""
+        sql = self._select()
+        params = list(self.params)
+        if after is not None and self.sort is None:
+            sql += " AND id > ?"
+            params.append(after)
+        elif after is not None:
+            # spelled out rather than a row value so the sort index gives the range start
+            op = "<" if self.descending else ">"
+            expr = self._sort_expr()
+            sql += f" AND {expr} {op}= ? AND ({expr} {op} ? OR id {op} ?)"
+            params.extend((after[0], after[0], after[1]))
+        sql += f" ORDER BY {self._order_by()} LIMIT ?"
+        params.append(limit)
+        return self._pairs(self._rows(sql, params))
+
+    def key_at(self, offset):
+        """Key of the row at ``offset`` (0-based), or None when out of range."""
+        if offset < 0:
+            return None
+        sort = f"{self._sort_expr()}, " if self.sort else ""
+        rows = self._rows(f"SELECT {sort}id FROM inventory WHERE ({self.where}) "
+                          f"ORDER BY {self._order_by()} LIMIT 1 OFFSET ?", self.params + (offset,))
+        if not rows:
+            return None
+        row = rows[0]
+        return tuple(row) if self.sort else row[0]
+
+    def stream(self, chunk_size=1000):
+        """Run the view's query once and yield its rows in chunks, in view order."""
+        cur = self.conn.cursor()
+        cur.execute(f"SELECT {', '.join(self.columns)} FROM inventory WHERE ({self.where}) "
+                    f"ORDER BY {self._order_by()}", self.params)
+        while True:
+            chunk = cur.fetchmany(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+    def iter_rows(self, chunk_size=1000):
+        """Walk every row of the view page by page."""
+        after = None
+        while True:
+            page = self.fetch(after, chunk_size)
+            if not page:
+                return
+            for _, row in page:
+                yield row
+            after = page[-1][0]
+
+
+class SearchSource(RecordSource):
+    """
+    Full-text search over the FTS5 trigram index, best matches first.
+    Pages continue after the (score, id) of the previous page's last row.
+    """
+    def __init__(self, conn, term, columns=FIELDS, where="1", params=()):
+        super().__init__(conn, columns, where, params)
+        # quote the term as a single phrase so it matches as a substring
+        self.match = '"' + term.replace('"', '""') + '"'
+
+    def _hits(self):
+        return ("(SELECT rowid AS hit, bm25(inventory_fts) AS score FROM inventory_fts "
+                "WHERE inventory_fts MATCH ?) AS hits JOIN inventory ON inventory.id = hits.hit")
+
+    def key_for_id(self, record_id):
+        return None  # depends on the match score
+
+    def sorted_by(self, column, descending=False):
+        # a column order over the matches: a plain source filtered by the same MATCH
+        where = f"({self.where}) AND id IN (SELECT rowid FROM inventory_fts WHERE inventory_fts MATCH ?)"
+        source = RecordSource(self.conn, self.columns, where, self.params + (self.match,))
+        return source.sorted_by(column, descending)
+
+    def fetch_ids(self, ids):
+        ids = list(ids)
+        cols = ", ".join(f"inventory.{c}" for c in self.columns)
+        cur = self.conn.cursor()
+        cur.execute(f"SELECT hits.score, {cols} FROM {self._hits()} WHERE ({self.where}) "
+                    f"AND inventory.id IN ({', '.join('?' * len(ids))})",
+                    (self.match,) + self.params + tuple(ids))
+        return [((r[0], r[1]), r[1:]) for r in cur.fetchall()]
+
+    def count(self):
+        cur = self.conn.cursor()
+        cur.execute(f"SELECT COUNT(*) FROM {self._hits()} WHERE ({self.where})",
+                    (self.match,) + self.params)
+        return cur.fetchone()[0]
+
+    def fetch(self, after, limit):
+        cols = ", ".join(f"inventory.{c}" for c in self.columns)
+        sql = f"SELECT hits.score, {cols} FROM {self._hits()} WHERE ({self.where})"
+        params = [self.match, *self.params]
+        if after is not None:
+            sql += " AND (hits.score, inventory.id) > (?, ?)"
+            params.extend(after)
+        sql += " ORDER BY hits.score, inventory.id LIMIT ?"
+        params.append(limit)
+        cur = self.conn.cursor()
+        cur.execute(sql, params)
+        return [((r[0], r[1]), r[1:]) for r in cur.fetchall()]
+
+    def stream(self, chunk_size=1000):
+        cols = ", ".join(f"inventory.{c}" for c in self.columns)
+        cur = self.conn.cursor()
+        cur.execute(f"SELECT {cols} FROM {self._hits()} WHERE ({self.where}) "
+                    "ORDER BY hits.score, inventory.id", (self.match,) + self.params)
+        while True:
+            chunk = cur.fetchmany(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+    def key_at(self, offset):
+        if offset < 0:
+            return None
+        cur = self.conn.cursor()
+        cur.execute(f"SELECT hits.score, inventory.id FROM {self._hits()} WHERE ({self.where}) "
+                    "ORDER BY hits.score, inventory.id LIMIT 1 OFFSET ?",
+                    (self.match,) + self.params + (offset,))
+        row = cur.fetchone()
+        return tuple(row) if row else None
+
+
+def search_source(conn, term, columns=FIELDS, where="1", params=()):
+    """
+    Source for a free-text search. Uses the trigram index when it exists and the
+    term is long enough for trigrams (3+ characters), otherwise falls back to
+    LIKE '%term%' over SEARCH_COLUMNS.
+    """
+    if len(term) >= 3 and has_search_index(conn):
+        return SearchSource(conn, term, columns, where, params)
+    search_where, search_params = search_filter(conn, term)
+    return RecordSource(conn, columns, f"({where}) AND {search_where}", tuple(params) + search_params)
+
+
+def search_filter(conn, term):
+    """(where, params) matching the same records as search_source(), for counting."""
+    if len(term) >= 3 and has_search_index(conn):
+        match = '"' + term.replace('"', '""') + '"'
+        return "id IN (SELECT rowid FROM inventory_fts WHERE inventory_fts MATCH ?)", (match,)
+    conditions = " OR ".join(f"{col} LIKE ? COLLATE NOCASE" for col in SEARCH_COLUMNS)
+    return f"({conditions})", (f"%{term}%",) * len(SEARCH_COLUMNS)
@@ -1,22 +1,32 @@
 import tkinter as tk
 from tkinter import ttk
-from db import get_inventory_conn
+from db import get_inventory_conn, inventory_cache
+from records import (FIELDS, REPORT_METRICS, AGE_BUCKETS, RecordSource, report_counts, summary_branches,
+                     aging_report, acquisition_trend)
+from widgets import VirtualTreeview
+from worker import get_executor
 
-def build_reports_tab(root, notebook):
+def build_reports_tab(root, notebook, tab=None):
     """
     Reports tab: Summary metrics + interactive records Treeview
-    Includes a dropdown for branches.
+    Includes a dropdown for branches, and aging / acquisition trend reports
+    read from the inventory_monthly rollup.
     Display style matches Manage Devices tab with color-coded device_status.
     Returns the tab and refresh_reports callback for auto-refresh.
     """
 
     conn = get_inventory_conn()
-    cursor = conn.cursor()
-    tab = ttk.Frame(notebook)
-    notebook.add(tab, text="📊 REPORTS")
-
-    frame = ttk.LabelFrame(tab, text="Inventory Summary", padding=15)
-    frame.pack(fill="both", expand=False, padx=20, pady=10)
+    executor = get_executor(root)
+    # repeated drill-downs are served from memory until the inventory changes
+    result_cache = inventory_cache()
+    if tab is None:
+        tab = ttk.Frame(notebook)
+        notebook.add(tab, text="📊 REPORTS")
+
+    top_frame = tk.Frame(tab)
+    top_frame.pack(fill="x", padx=20, pady=10)
+    frame = ttk.LabelFrame(top_frame, text="Inventory Summary", padding=15)
+    frame.pack(side="left", fill="both", expand=False)
 
     stats_tree = ttk.Treeview(frame, columns=("DEVICE STATUS", "COUNT"), show="headings", height=12)
     stats_tree.heading("DEVICE STATUS", text="DEVICE STATUS")
@@ -29,6 +39,70 @@ def build_reports_tab(root, notebook):
     stats_tree.configure(yscroll=scroll_y.set)
     scroll_y.pack(side="right", fill="y")
 
+    # --- Aging & acquisition trends ---
+    TREND_REPORTS = {
+        "AGE BY DATE ACQUIRED": ("aging", "acquired"),
+        "AGE BY MANUFACTURED DATE": ("aging", "manufactured"),
+        "ACQUISITIONS BY MONTH": ("trend", "acquired"),
+    }
+    TREND_GROUPS = {"ALL": None, "BRANCH": "branch", "DEPARTMENT": "department"}
+
+    trend_frame = ttk.LabelFrame(top_frame, text="Aging & Trends", padding=15)
+    trend_frame.pack(side="left", fill="both", expand=True, padx=(10, 0))
+    trend_controls = tk.Frame(trend_frame)
+    trend_controls.pack(fill="x")
+    trend_report_var = tk.StringVar(value="AGE BY DATE ACQUIRED")
+    trend_group_var = tk.StringVar(value="ALL")
+    ttk.Combobox(trend_controls, textvariable=trend_report_var, state="readonly", width=28,
+                 values=list(TREND_REPORTS)).pack(side="left", padx=5)
+    tk.Label(trend_controls, text="PER:").pack(side="left", padx=5)
+    ttk.Combobox(trend_controls, textvariable=trend_group_var, state="readonly", width=14,
+                 values=list(TREND_GROUPS)).pack(side="left", padx=5)
+
+    trend_tree = ttk.Treeview(trend_frame, show="headings", height=10)
+    trend_tree.pack(fill="both", expand=True, side="left", pady=(5, 0))
+    trend_scroll = ttk.Scrollbar(trend_frame, orient="vertical", command=trend_tree.yview)
+    trend_tree.configure(yscroll=trend_scroll.set)
+    trend_scroll.pack(side="right", fill="y", pady=(5, 0))
+
+    def refresh_trends(*_):
+        report, kind = TREND_REPORTS[trend_report_var.get()]
+        group_by = TREND_GROUPS[trend_group_var.get()]
+        group_label = trend_group_var.get() if group_by else None
+
+        # a few thousand rollup rows at most, but keep the Tk thread free all the same
+        def run(reader):
+            if report == "aging":
+                headers = [label for label, _ in AGE_BUCKETS] + ["NO DATE", "TOTAL"]
+                rows = [(group, *counts, undated, total)
+                        for group, counts, undated, total in aging_report(reader, kind, group_by)]
+            else:
+                headers = ["MONTH", "COUNT"]
+                rows = [(group, month or "(NO DATE)", count)
+                        for group, month, count in acquisition_trend(reader, group_by, kind)]
+            if group_label:
+                headers.insert(0, group_label)
+                rows = [(group or f"(NO {group_label})", *rest) for group, *rest in rows]
+            else:
+                rows = [tuple(rest) for _, *rest in rows]
+            return headers, rows
+
+        def show(result):
+            headers, rows = result
+            trend_tree.delete(*trend_tree.get_children())
+            trend_tree["columns"] = headers
+            for col in headers:
+                numeric = col not in (group_label, "MONTH")
+                trend_tree.heading(col, text=col)
+                trend_tree.column(col, width=100 if numeric else 200, anchor="e" if numeric else "w")
+            for row in rows:
+                trend_tree.insert("", "end", values=[f"{v:,}" if isinstance(v, int) else v for v in row])
+
+        executor.submit(run, show, key="trends")
+
+    trend_report_var.trace_add("write", refresh_trends)
+    trend_group_var.trace_add("write", refresh_trends)
+
     branch_frame = ttk.LabelFrame(tab, text="Select Branch", padding=10)
     branch_frame.pack(fill="x", expand=False, padx=20, pady=5)
 
@@ -47,94 +121,80 @@ def build_reports_tab(root, notebook):
         "SERIAL NUMBER", "CUSTODIAN", "ASSET STATUS"
     ]
 
-    records_tree = ttk.Treeview(records_frame, columns=HEADERS, show="headings", height=18)
+    STATUS_TAGS = ("FOR REPLACEMENT", "FOR REPAIR", "RETIRED", "FOR DISPOSAL", "ACTIVE")
+
+    def status_tag(values):
+        status = str(values[13]).upper()
+        return status if status in STATUS_TAGS else ""
+
+    records_tree = VirtualTreeview(records_frame, columns=HEADERS, show="headings", height=18,
+                                   row_tags=status_tag)
     for col in HEADERS:
         records_tree.heading(col, text=col)
         records_tree.column(col, width=120, stretch=True)
     records_tree.pack(fill="both", expand=True, side="left")
+    records_tree.enable_sorting(executor, key="drilldown")
 
     scroll_y2 = ttk.Scrollbar(records_frame, orient="vertical", command=records_tree.yview)
     records_tree.configure(yscroll=scroll_y2.set)
     scroll_y2.pack(side="right", fill="y")
 
 
-    metric_queries = {
-        "TOTAL DEVICE ACTIVE": "SELECT * FROM inventory WHERE cancelled=0 AND device_status='ACTIVE'OR device_status= 'FOR REPLACEMENT'",
-        "TOTAL CANCELLED ENTRIES": "SELECT * FROM inventory WHERE cancelled=1",
-        "TOTAL DEVICE UNDER HEAD OFFICE": "SELECT * FROM inventory WHERE cancelled=0 AND branch='HOME OFFICE'",
-        "TOTAL DEVICE FOR REPLACEMENT": "SELECT * FROM inventory WHERE cancelled=0 AND device_status='FOR REPLACEMENT'",
-        "TOTAL DEVICE FOR REPAIR": "SELECT * FROM inventory WHERE cancelled=0 AND device_status='FOR REPAIR'",
-        "TOTAL DEVICE FOR RETIRED": "SELECT * FROM inventory WHERE cancelled=0 AND device_status='RETIRED'",
-        "TOTAL DEVICE FOR DISPOSAL": "SELECT * FROM inventory WHERE cancelled=0 AND device_status='FOR DISPOSAL'",
-    }
+    RECORD_FIELDS = FIELDS[:-1]  # same columns as HEADERS (no CANCELLED flag)
 
     def refresh_reports():
-    # Use a fresh connection every refresh
-        conn = get_inventory_conn()
-        cursor = conn.cursor()
-
-    # Clear previous stats
-    stats_tree.delete(*stats_tree.get_children())
-    for metric, query in metric_queries.items():
-        cursor.execute(query)
-        rows = cursor.fetchall()
-        stats_tree.insert("", "end", values=(metric, len(rows)))
-
-    # Update branch list
-    cursor.execute("SELECT DISTINCT branch FROM inventory WHERE cancelled=0 ORDER BY branch")
-    branches = [r[0] for r in cursor.fetchall() if r[0]]
-    branch_combo['values'] = branches
-    if branches:
-        branch_combo.set("Select Branch")
+        # Counts come from the trigger-maintained summary table in one small query;
+        # records are only loaded when a metric or branch is picked.
+        stats_tree.delete(*stats_tree.get_children())
+        for metric, count in report_counts(conn).items():
+            stats_tree.insert("", "end", values=(metric, count))
 
-    # Clear records tree
-    records_tree.delete(*records_tree.get_children())
+        # Update branch list
+        branches = summary_branches(conn)
+        branch_combo['values'] = branches
+        if branches:
+            branch_combo.set("Select Branch")
 
-    # Close this refresh connection
+        refresh_trends()
 
+        # Clear records tree
+        executor.cancel("drilldown")
+        records_tree.set_source(None)
 
     def on_tree_click(event):
         selected = stats_tree.focus()
         if not selected:
             return
         metric_name = stats_tree.item(selected, "values")[0]
-        query = metric_queries.get(metric_name)
-        if query:
-            cursor.execute(query)
-            records = cursor.fetchall()
-            display_records(records)
+        where = REPORT_METRICS.get(metric_name)
+        if where:
+            display_records(RecordSource(conn, RECORD_FIELDS, where, cache=result_cache))
 
     def on_branch_select(event):
         selected_branch = branch_var.get()
         if not selected_branch:
             return
-        cursor.execute("SELECT * FROM inventory WHERE cancelled=0 AND branch=?", (selected_branch,))
-        records = cursor.fetchall()
-        display_records(records)
-
-    def display_records(records):
-        records_tree.delete(*records_tree.get_children())
-        for r in records:
-            tag = ""
-            status = r[13].upper() 
-            if status == "FOR REPLACEMENT":
-                tag = "FOR REPLACEMENT"
-            elif status == "FOR REPAIR":
-                tag = "FOR REPAIR"
-            elif status == "RETIRED":
-                tag = "RETIRED"
-            elif status == "FOR DISPOSAL":
-                tag = "FOR DISPOSAL"
-            elif status == "ACTIVE":
-                tag = "ACTIVE"
-
-            records_tree.insert("", "end", values=r, tags=(tag,))
-
-        records_tree.tag_configure("FOR REPLACEMENT", background="#f9e79f")  
-        records_tree.tag_configure("FOR REPAIR", background="#546d0f")       
-        records_tree.tag_configure("RETIRED", background="#11a4ee")      
-        records_tree.tag_configure("FOR DISPOSAL", background="#f5b7b1")    
-        records_tree.tag_configure("ACTIVE", background="#02db4a")  
+        display_records(RecordSource(conn, RECORD_FIELDS, "cancelled=0 AND branch=?", (selected_branch,),
+                                     cache=result_cache))
+
+    def display_records(source):
+        # the drill-down count and first page can be large scans: run them off the Tk thread
+        def run(reader):
+            source.conn = reader
+            return source.count(), source.fetch(None, records_tree.page_size)
+
+        def show(result):
+            total, first_page = result
+            source.conn = conn
+            records_tree.set_source(source, total=total, first_page=first_page)
+
+        executor.submit(run, show, key="drilldown")
+
+    records_tree.tag_configure("FOR REPLACEMENT", background="#f9e79f")  
+    records_tree.tag_configure("FOR REPAIR", background="#546d0f")       
+    records_tree.tag_configure("RETIRED", background="#11a4ee")      
+    records_tree.tag_configure("FOR DISPOSAL", background="#f5b7b1")    
+    records_tree.tag_configure("ACTIVE", background="#02db4a")  
 
     stats_tree.bind("<ButtonRelease-1>", on_tree_click)
     branch_combo.bind("<<ComboboxSelected>>", on_branch_select)
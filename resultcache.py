@@ -0,0 +1,115 @@
+"""
+Memory-bounded LRU cache of read query results, for reads that repeat far
+more often than the data changes (report drill-downs, paging back and forth).
+
+Entries are keyed by (sql, params) and stamped with a token taken before the
+query ran: PRAGMA data_version of a watcher connection, which changes
+whenever any other connection commits, plus a process-wide write counter
+bumped by note_write() after this process commits. A lookup under a newer
+token is a miss, so a result is never served once the inventory changed and
+no caller has to invalidate anything.
+"""
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+MAX_BYTES = int(float(os.environ.get("INVENTORY_RESULT_CACHE_MB", 32)) * 1024 * 1024)
+
+_writes = 0
+_writes_lock = threading.Lock()
+
+
+def note_write():
+    """Record that this process committed a write (see writequeue / importer)."""
+    global _writes
+    with _writes_lock:
+        _writes += 1
+
+
+def _size(rows):
+    # rough footprint: the list, each row tuple and each value
+    size = sys.getsizeof(rows)
+    for row in rows:
+        size += sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row)
+    return size
+
+
+class ResultCache:
+    """
+    - fetch(conn, sql, params): the rows of a read query, cached until the data changes
+    - token(): the current data version token; clear(); stats()
+    Thread-safe; ``connect`` opens the watcher connection on first use.
+    """
+    def __init__(self, connect, max_bytes=MAX_BYTES):
+        self.connect = connect
+        self.max_bytes = max_bytes
+        self._watcher = None
+        self._entries = OrderedDict()  # (sql, params) -> (token, rows, size)
+        self._token = None  # newest token seen; every entry under an older one is dead
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def token(self):
+        with self._lock:
+            if self._watcher is None:
+                self._watcher = self.connect()
+            cur = self._watcher.cursor()
+            cur.execute("PRAGMA data_version")
+            token = (cur.fetchone()[0], _writes)
+            if token != self._token:
+                self._token = token
+                self._entries.clear()
+                self._bytes = 0
+            return token
+
+    def fetch(self, conn, sql, params=()):
+        key = (sql, tuple(params))
+        # taken before the query: a commit landing meanwhile makes this entry stale at once
+        token = self.token()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == token:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        cur = conn.cursor()
+        cur.execute(sql, params)
+        rows = cur.fetchall()
+        self._store(key, token, rows)
+        return rows
+
+    def _store(self, key, token, rows):
+        size = _size(rows)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[2]
+            if token != self._token or size > self.max_bytes // 4:
+                return  # already stale, or so big it would flush everything else
+            self._entries[key] = (token, rows, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, _, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes,
+                    "hits": self.hits, "misses": self.misses}
+
+    def close(self):
+        with self._lock:
+            if self._watcher is not None:
+                self._watcher.close()
+                self._watcher = None
+            self._entries.clear()
+            self._bytes = 0
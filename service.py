@@ -0,0 +1,331 @@
+"""
+Inventory service: one process that owns DeviceInventory.db / accounts.db and
+serves every desktop client over HTTP/JSON, instead of each client locking
+the file on a network share.
+
+    python service.py [--host 127.0.0.1] [--port 8765] [--db PATH] [--accounts-db PATH]
+
+Clients set INVENTORY_SERVICE_URL=http://host:port (see service_client.py).
+Reads run concurrently on a thread pool over the WAL reader connections;
+writes are funnelled through a single writer per database, one transaction
+at a time in arrival order, and group-committed (see WriterQueue). Set
+INVENTORY_SERVICE_TOKEN on both sides to require a shared token; the service
+binds to 127.0.0.1 unless told otherwise, and refuses any other interface
+without a token. Clients send single statements: ATTACH, DETACH and
+VACUUM INTO are refused, and so are multi-statement scripts (see ALLOWED_SCRIPTS).
+
+Endpoints (POST, JSON bodies): /<db>/query, /<db>/execute, /<db>/commit,
+/<db>/rollback, where <db> is "inventory" or "accounts"; GET /health.
+"""
+import argparse
+import asyncio
+import ipaddress
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import db
+import writequeue
+
+SERVICE_TOKEN = os.environ.get("INVENTORY_SERVICE_TOKEN", "")
+DEFAULT_PORT = 8765
+SESSION_TIMEOUT = 30  # seconds a client transaction may sit idle before it is rolled back
+MAX_BODY = 256 * 1024 * 1024
+
+# multi-statement scripts clients may send verbatim; no client needs one today
+ALLOWED_SCRIPTS = frozenset()
+
+REASONS = {200: "OK", 400: "Bad Request", 401: "Unauthorized", 404: "Not Found", 413: "Payload Too Large"}
+
+
+def _authorize(action, arg1, arg2, db_name, trigger):
+    # VACUUM INTO attaches its target too, so this covers it as well: no
+    # client may reach files beyond the databases the service owns
+    if action in (sqlite3.SQLITE_ATTACH, sqlite3.SQLITE_DETACH):
+        return sqlite3.SQLITE_DENY
+    return sqlite3.SQLITE_OK
+
+
+def _run_statement(conn, request):
+    """Execute one request body on ``conn``; the result in the wire format."""
+    if request.get("script") and request["sql"].strip() not in ALLOWED_SCRIPTS:
+        raise sqlite3.ProgrammingError("The service does not run SQL scripts; send one statement at a time")
+    cur = conn.cursor()
+    conn.set_authorizer(_authorize)
+    try:
+        if request.get("script"):
+            cur.executescript(request["sql"])
+        elif request.get("many"):
+            cur.executemany(request["sql"], request["params"])
+        else:
+            cur.execute(request["sql"], request.get("params") or ())
+    finally:
+        conn.set_authorizer(None)
+    columns = [d[0] for d in cur.description] if cur.description else None
+    rows = cur.fetchall() if columns else []
+    return {"columns": columns, "rows": rows, "rowcount": cur.rowcount, "lastrowid": cur.lastrowid}
+
+
+class WriterQueue:
+    """
+    The single writer of one database, with group commit.
+
+    Each client transaction (session) holds the writer from its first
+    statement until commit/rollback; everyone else queues on the lock in
+    arrival order. A session runs as a SAVEPOINT inside a shared outer
+    transaction. Its commit releases the savepoint and waits for the next
+    group COMMIT, issued WINDOW_MS later (or at once after MAX_BATCH
+    sessions) for every session released in between. The client's commit
+    is acknowledged only after that COMMIT. Statements sent without a
+    session are one-statement sessions. SQLite work happens on one
+    dedicated thread.
+    """
+    def __init__(self, manager, window_ms=writequeue.WINDOW_MS):
+        self.conn = manager.writer()
+        self.thread = ThreadPoolExecutor(1, thread_name_prefix="service-writer")
+        self.lock = asyncio.Lock()
+        self.session = None
+        self.last_used = 0.0  # when the session's last statement finished
+        self.in_flight = 0  # statements of the session still running; never expired meanwhile
+        self.expired = deque(maxlen=1000)  # sessions rolled back for being idle
+        self.version = 0  # bumped on every commit, served as PRAGMA data_version
+        self.window = window_ms / 1000
+        self.pending = []  # futures of released sessions waiting for the group COMMIT
+        self.flush_scheduled = False
+
+    async def _call(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.thread, fn, *args)
+
+    def _savepoint(self, session):
+        if not self.conn.in_transaction:
+            self.conn.execute("BEGIN IMMEDIATE")
+        self.conn.execute(f'SAVEPOINT "{session}"')
+
+    def _release(self, session, commit):
+        if not commit:
+            self.conn.execute(f'ROLLBACK TO "{session}"')
+        self.conn.execute(f'RELEASE "{session}"')
+
+    async def execute(self, session, request):
+        if session is None:
+            session = uuid.uuid4().hex
+            try:
+                result = await self.execute(session, request)
+            except Exception:
+                await self.finish(session, commit=False)
+                raise
+            await self.finish(session, commit=True)
+            return result
+        if not re.fullmatch(r"[0-9a-f]{32}", session):
+            raise sqlite3.InterfaceError("Invalid session id")
+        if self.session != session:
+            self._check_expired(session)
+            await self.lock.acquire()
+            try:
+                await self._call(self._savepoint, session)
+            except Exception:
+                self.lock.release()
+                raise
+            self.session = session
+        if re.match(r"\s*BEGIN\b", request["sql"], re.IGNORECASE):
+            self.last_used = time.monotonic()
+            return {"columns": None, "rows": [], "rowcount": -1, "lastrowid": None}  # the session is the transaction
+        self.in_flight += 1
+        try:
+            return await self._call(_run_statement, self.conn, request)
+        finally:
+            self.in_flight -= 1
+            self.last_used = time.monotonic()
+
+    def _check_expired(self, session):
+        if session in self.expired:
+            raise sqlite3.OperationalError(
+                f"Transaction rolled back by the service after {SESSION_TIMEOUT}s without activity")
+
+    async def finish(self, session, commit):
+        if session is None or self.session != session:
+            if commit:
+                self._check_expired(session)
+            return  # nothing was written in this session
+        try:
+            await self._call(self._release, session, commit)
+        except sqlite3.Error as exc:
+            # the savepoint is gone (e.g. the whole transaction was aborted): fail the group
+            await self._abort(exc)
+            raise
+        finally:
+            self.session = None
+            self.lock.release()
+        if commit:
+            future = asyncio.get_running_loop().create_future()
+            self.pending.append(future)
+            if len(self.pending) >= writequeue.MAX_BATCH:
+                asyncio.get_running_loop().create_task(self._flush())
+            elif not self.flush_scheduled:
+                self.flush_scheduled = True
+                asyncio.get_running_loop().call_later(
+                    self.window, lambda: asyncio.get_running_loop().create_task(self._flush()))
+            await future
+
+    async def _flush(self):
+        self.flush_scheduled = False
+        async with self.lock:  # FIFO: sessions already waiting finish (and join) first
+            pending, self.pending = self.pending, []
+            if not pending:
+                return
+            try:
+                await self._call(self.conn.commit)
+            except sqlite3.Error as exc:
+                await self._call(self.conn.rollback)
+                for future in pending:
+                    future.set_exception(exc)
+                return
+            self.version += 1
+            for future in pending:
+                future.set_result(None)
+
+    async def _abort(self, exc):
+        await self._call(self.conn.rollback)
+        pending, self.pending = self.pending, []
+        for future in pending:
+            future.set_exception(exc)
+
+    async def expire_idle(self):
+        """
+        Roll back a transaction whose client went quiet (crashed, lost its
+        network). Idle time counts from the last completed statement, so a
+        long-running one is never rolled back underneath its client.
+        """
+        while True:
+            await asyncio.sleep(SESSION_TIMEOUT / 3)
+            if (self.session is not None and not self.in_flight
+                    and time.monotonic() - self.last_used > SESSION_TIMEOUT):
+                print(f"rolling back idle transaction {self.session}", file=sys.stderr)
+                self.expired.append(self.session)
+                await self.finish(self.session, commit=False)
+
+
+class InventoryService:
+    def __init__(self, paths, readers=db.READER_POOL_SIZE):
+        self.managers = {name: db.ConnectionManager(path) for name, path in paths.items()}
+        self.reader_pool = ThreadPoolExecutor(readers, thread_name_prefix="service-reader")
+        self.writers = {}
+
+    async def start(self, host, port):
+        for name, manager in self.managers.items():
+            self.writers[name] = WriterQueue(manager)
+            asyncio.get_running_loop().create_task(self.writers[name].expire_idle())
+        return await asyncio.start_server(self.handle, host, port)
+
+    def _read(self, name, request):
+        with self.managers[name].reader() as conn:
+            return _run_statement(conn, request)
+
+    async def dispatch(self, method, path, headers, body):
+        if method == "GET" and path == "/health":
+            return 200, {"status": "ok", "databases": sorted(self.managers)}
+        if SERVICE_TOKEN and headers.get("x-inventory-token") != SERVICE_TOKEN:
+            return 401, {"error": {"type": "DatabaseError", "message": "Invalid service token"}}
+        match = re.fullmatch(r"/(\w+)/(query|execute|commit|rollback)", path)
+        if method != "POST" or not match or match.group(1) not in self.managers:
+            return 404, {"error": {"type": "DatabaseError", "message": f"No such endpoint: {method} {path}"}}
+        name, action = match.groups()
+        writer = self.writers[name]
+        request = json.loads(body or b"{}")
+        session = request.get("session")
+        try:
+            if action == "query":
+                if re.fullmatch(r"\s*PRAGMA\s+data_version\s*;?\s*", request["sql"], re.IGNORECASE):
+                    # per-connection in SQLite; clients need one counter for the whole service
+                    return 200, {"columns": ["data_version"], "rows": [[writer.version]]}
+                result = await asyncio.get_running_loop().run_in_executor(
+                    self.reader_pool, self._read, name, request)
+            elif action == "execute":
+                result = await writer.execute(session, request)
+            else:
+                await writer.finish(session, commit=action == "commit")
+                result = {}
+        except sqlite3.Error as exc:
+            return 400, {"error": {"type": type(exc).__name__, "message": str(exc)}}
+        return 200, result
+
+    async def handle(self, reader, writer):
+        """HTTP/1.1 with keep-alive: one request at a time per client socket."""
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                method, path, _ = line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    header = await reader.readline()
+                    if header in (b"\r\n", b"\n", b""):
+                        break
+                    key, _, value = header.decode("latin-1").partition(":")
+                    headers[key.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", 0))
+                if length > MAX_BODY:
+                    status, payload = 413, {"error": {"type": "DatabaseError", "message": "Request too large"}}
+                    body = None
+                else:
+                    body = await reader.readexactly(length)
+                    status, payload = await self.dispatch(method, path, headers, body)
+                data = json.dumps(payload).encode()
+                writer.write(f"HTTP/1.1 {status} {REASONS[status]}\r\nContent-Type: application/json\r\n"
+                             f"Content-Length: {len(data)}\r\n\r\n".encode("latin-1") + data)
+                await writer.drain()
+                if body is None or headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+
+def _is_loopback(host):
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return host == "localhost"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the inventory databases to desktop clients.")
+    parser.add_argument("--host", default="127.0.0.1",
+                        help="interface to bind (default: %(default)s; use 0.0.0.0 to serve other machines, "
+                             "which requires INVENTORY_SERVICE_TOKEN)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--db", default=db.DB_FILE, help="inventory database (default: %(default)s)")
+    parser.add_argument("--accounts-db", default=db.ACCOUNTS_DB, help="accounts database (default: %(default)s)")
+    parser.add_argument("--readers", type=int, default=db.READER_POOL_SIZE, help="concurrent read threads")
+    args = parser.parse_args(argv)
+    if not SERVICE_TOKEN and not _is_loopback(args.host):
+        parser.error(f"set INVENTORY_SERVICE_TOKEN before serving on {args.host}: "
+                     "without it anyone who can reach the port can read and change both databases")
+
+    db.use_service(None)  # the service itself always opens the files
+    db.init_inventory_db(args.db)
+    db.init_user_db(args.accounts_db)
+    service = InventoryService({"inventory": args.db, "accounts": args.accounts_db}, args.readers)
+
+    async def serve():
+        server = await service.start(args.host, args.port)
+        print(f"Inventory service listening on http://{args.host}:{args.port}", file=sys.stderr)
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,339 @@
+"""
+Client side of the inventory service (see service.py).
+
+When INVENTORY_SERVICE_URL is set, db.get_manager() hands out a
+ServiceManager instead of opening the database file. Its connections mimic
+the parts of sqlite3.Connection the app uses (cursor/execute/commit/rollback,
+``with conn:``, in_transaction) and turn them into JSON requests:
+
+- reads outside a transaction go to the service's reader pool;
+- INSERT/UPDATE/DELETE/REPLACE (and BEGIN/SAVEPOINT) open a server-side transaction on
+  the single writer, which later statements join until commit()/rollback(),
+  just like sqlite3's implicit transactions;
+- other statements (DDL, PRAGMA x=y) run as their own write.
+
+SQLite errors come back as the matching sqlite3 exception class, so
+``except sqlite3.IntegrityError`` keeps working.
+"""
+import http.client
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from concurrent.futures import Future
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+from resultcache import note_write
+
+SERVICE_TOKEN = os.environ.get("INVENTORY_SERVICE_TOKEN", "")
+REQUEST_TIMEOUT = 120  # seconds; bulk imports send large batches
+
+_READ_KEYWORDS = ("SELECT", "WITH", "EXPLAIN", "VALUES")
+_TRANSACTION_KEYWORDS = ("BEGIN", "SAVEPOINT", "INSERT", "UPDATE", "DELETE", "REPLACE")
+READER_POOL_SIZE = 4
+
+
+def _keyword(sql):
+    words = sql.lstrip(" \t\r\n(").split(None, 1)
+    return words[0].upper() if words else ""
+
+
+def _is_read(sql):
+    keyword = _keyword(sql)
+    if keyword == "PRAGMA":
+        return "=" not in sql
+    return keyword in _READ_KEYWORDS
+
+
+class ServiceError(sqlite3.OperationalError):
+    """The service could not be reached or answered with something unexpected."""
+
+
+class ServiceClient:
+    """One keep-alive HTTP connection to the service, safe to share between threads."""
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self.host = parts.hostname or "127.0.0.1"
+        self.port = parts.port or 8765
+        self._http = None
+        self._lock = threading.Lock()
+
+    def request(self, path, payload):
+        body = json.dumps(payload).encode()
+        headers = {"Content-Type": "application/json", "X-Inventory-Token": SERVICE_TOKEN}
+        # only reads may be sent twice: once an /execute or /commit may have
+        # reached the service, resending it could apply it a second time
+        idempotent = path.endswith("/query")
+        with self._lock:
+            for attempt in (1, 2):
+                reused = self._http is not None
+                if not reused:
+                    self._http = http.client.HTTPConnection(self.host, self.port, timeout=REQUEST_TIMEOUT)
+                sent = False
+                try:
+                    self._http.request("POST", path, body, headers)
+                    sent = True
+                    response = self._http.getresponse()
+                    data = response.read()
+                    break
+                except (OSError, http.client.HTTPException) as exc:
+                    self._http.close()
+                    self._http = None
+                    # a kept-alive socket may have been closed by the server while idle:
+                    # retry once on a fresh one, unless the service may be working on it
+                    retry = reused and attempt == 1 and not isinstance(exc, TimeoutError) and (idempotent or not sent)
+                    if not retry:
+                        raise ServiceError(f"Inventory service at {self.host}:{self.port} unavailable: {exc}")
+        try:
+            result = json.loads(data)
+        except ValueError:
+            raise ServiceError(f"Unexpected response from the inventory service (HTTP {response.status})")
+        if "error" in result:
+            error = getattr(sqlite3, result["error"]["type"], None)
+            if not (isinstance(error, type) and issubclass(error, sqlite3.Error)):
+                error = sqlite3.DatabaseError
+            raise error(result["error"]["message"])
+        return result
+
+    def close(self):
+        with self._lock:
+            if self._http is not None:
+                self._http.close()
+                self._http = None
+
+
+class ServiceCursor:
+    """sqlite3.Cursor look-alike over results already returned by the service."""
+    arraysize = 1
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.description = None
+        self.rowcount = -1
+        self.lastrowid = None
+        self._rows = []
+        self._pos = 0
+
+    def _load(self, result):
+        columns = result.get("columns")
+        self.description = tuple((name, None, None, None, None, None, None) for name in columns) if columns else None
+        self._rows = [tuple(row) for row in result.get("rows", [])]
+        self._pos = 0
+        self.rowcount = result.get("rowcount", -1)
+        self.lastrowid = result.get("lastrowid")
+        return self
+
+    def execute(self, sql, parameters=()):
+        return self._load(self.connection._send(sql, list(parameters)))
+
+    def executemany(self, sql, seq_of_parameters):
+        return self._load(self.connection._send(sql, [list(p) for p in seq_of_parameters], many=True))
+
+    def executescript(self, sql_script):
+        return self._load(self.connection._send(sql_script, [], script=True))
+
+    def fetchone(self):
+        if self._pos >= len(self._rows):
+            return None
+        self._pos += 1
+        return self._rows[self._pos - 1]
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        rows = self._rows[self._pos:self._pos + size]
+        self._pos += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._rows[self._pos:]
+        self._pos = len(self._rows)
+        return rows
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        row = self.fetchone()
+        if row is None:
+            raise StopIteration
+        return row
+
+    def close(self):
+        self._rows = []
+
+
+class ServiceConnection:
+    """sqlite3.Connection look-alike bound to one database of the service."""
+    def __init__(self, client, database, read_only=False):
+        self.client = client
+        self.database = database
+        self.read_only = read_only
+        self._session = None
+
+    @property
+    def in_transaction(self):
+        return self._session is not None
+
+    def _send(self, sql, params, many=False, script=False):
+        keyword = _keyword(sql)
+        if keyword in ("COMMIT", "END"):
+            self.commit()
+            return {}
+        if keyword == "ROLLBACK" and "TO" not in sql.upper().split():
+            self.rollback()
+            return {}
+        payload = {"sql": sql, "params": params, "many": many, "script": script}
+        if self.read_only or (self._session is None and not script and _is_read(sql)):
+            return self.client.request(f"/{self.database}/query", payload)
+        if self._session is None and keyword in _TRANSACTION_KEYWORDS:
+            self._session = uuid.uuid4().hex
+        payload["session"] = self._session
+        return self.client.request(f"/{self.database}/execute", payload)
+
+    def cursor(self):
+        return ServiceCursor(self)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
+
+    def commit(self):
+        session, self._session = self._session, None
+        if session is not None:
+            self.client.request(f"/{self.database}/commit", {"session": session})
+
+    def rollback(self):
+        session, self._session = self._session, None
+        if session is not None:
+            self.client.request(f"/{self.database}/rollback", {"session": session})
+
+    def interrupt(self):
+        pass  # statements run to completion on the service
+
+    def close(self):
+        self.rollback()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+        return False
+
+
+class ServiceWriteQueue:
+    """
+    writequeue.WriteQueue API for client mode: each mutation runs as one
+    service transaction, and the service group-commits them with everyone else's.
+    """
+    def __init__(self, manager):
+        self.manager = manager
+
+    def run(self, fn, timeout=None):
+        # a socket of its own: a shared one would block our commit behind a
+        # statement of another thread that is queued on the service's writer
+        with self.manager.borrow_client() as client:
+            conn = ServiceConnection(client, self.manager.database)
+            try:
+                result = fn(conn)
+            except Exception:
+                conn.rollback()
+                raise
+            conn.commit()
+            note_write()
+            return result
+
+    def submit(self, fn):
+        future = Future()
+        try:
+            future.set_result(self.run(fn))
+        except Exception as exc:
+            future.set_exception(exc)
+        return future
+
+    def execute(self, sql, parameters=()):
+        return self.run(lambda conn: conn.execute(sql, parameters).rowcount)
+
+    def close(self):
+        pass
+
+
+class ServiceManager:
+    """Drop-in for db.ConnectionManager that talks to the service instead of the file."""
+    def __init__(self, url, database):
+        self.url = url
+        self.database = database
+        self.client = ServiceClient(url)
+        self._writer = None
+        self._result_cache = None
+        self._idle = []  # kept-alive clients for reader() and write_queue()
+        self._lock = threading.Lock()
+
+    def writer(self):
+        with self._lock:
+            if self._writer is None:
+                self._writer = ServiceConnection(self.client, self.database)
+            return self._writer
+
+    def write_queue(self):
+        return ServiceWriteQueue(self)
+
+    def result_cache(self):
+        # the service answers PRAGMA data_version with one counter for all its clients
+        with self._lock:
+            if self._result_cache is None:
+                from resultcache import ResultCache
+                self._result_cache = ResultCache(
+                    lambda: ServiceConnection(ServiceClient(self.url), self.database, read_only=True))
+            return self._result_cache
+
+    @contextmanager
+    def borrow_client(self):
+        # own socket per borrower so worker threads do not queue behind each other
+        with self._lock:
+            client = self._idle.pop() if self._idle else ServiceClient(self.url)
+        try:
+            yield client
+        finally:
+            with self._lock:
+                if len(self._idle) < READER_POOL_SIZE:
+                    self._idle.append(client)
+                    client = None
+            if client is not None:
+                client.close()
+
+    @contextmanager
+    def reader(self):
+        with self.borrow_client() as client:
+            yield ServiceConnection(client, self.database, read_only=True)
+
+    @contextmanager
+    def connection(self):
+        conn = ServiceConnection(ServiceClient(self.url), self.database)
+        try:
+            yield conn
+        finally:
+            conn.close()
+            conn.client.close()
+
+    def close(self):
+        with self._lock:
+            if self._result_cache is not None:
+                self._result_cache.close()
+                self._result_cache = None
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+            idle, self._idle = self._idle, []
+        for client in idle + [self.client]:
+            client.close()
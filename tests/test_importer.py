@@ -0,0 +1,49 @@
+import csv
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import inventory
+from db import next_asset_id
+
+
+class ImportAssetIdTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.db = os.path.join(self.dir.name, "inventory.db")
+        self.csv = os.path.join(self.dir.name, "devices.csv")
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def write_csv(self, rows):
+        with open(self.csv, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["ASSET ID", "ASSET NAME", "SERIAL NUMBER"])
+            writer.writerows(rows)
+
+    def test_allocation_after_explicit_ids(self):
+        self.write_csv([
+            ["ASSET_09000", "Laptop", "SN-1"],
+            ["ASSET_20240101120000", "Legacy", "SN-2"],  # timestamp id: must not move the sequence
+            ["", "Printer", "SN-3"],
+        ])
+        self.assertEqual(inventory.main(["import", "--db", self.db, "--quiet", "--workers", "0", self.csv]), 0)
+        conn = sqlite3.connect(self.db)
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT asset_id FROM inventory WHERE serial_number='SN-3'")
+            self.assertEqual(cur.fetchone()[0], "ASSET_09001")
+            with conn:
+                allocated = next_asset_id(conn)
+            self.assertEqual(allocated, "ASSET_09002")
+        finally:
+            conn.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,136 @@
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+from records import FIELDS, RecordSource, SearchSource, load_record, merge_changes, update_record
+
+BRANCHES = ["HOME OFFICE", "NORTH", "SOUTH", "", None]
+STATUSES = ["ACTIVE", "FOR REPAIR", "RETIRED", "", None]
+
+
+def seed_inventory(path, rows=300, seed=7):
+    """A fresh inventory database with many ties, '' and NULLs in every column."""
+    db.init_inventory_db(path)
+    db.get_manager(path).close()
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.executemany(
+            "INSERT INTO inventory (asset_class, asset_id, asset_name, date_acquired, branch, "
+            "device_status, custodian, serial_number, cancelled) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [(rng.choice(["LAPTOP", "DESKTOP", None]), f"ASSET_{rng.randrange(40):05d}",
+              rng.choice(["LAPTOP 14", "PRINTER", "", None]),
+              rng.choice(["2021-03-01", "2022-11-15", "2022-11-15", "", None]),
+              rng.choice(BRANCHES), rng.choice(STATUSES), rng.choice(["ANA", "BEN", None]),
+              f"SN-{i}", rng.random() < 0.2)
+             for i in range(rows)])
+    return conn
+
+
+class SortedPagingTest(unittest.TestCase):
+    PAGE = 7
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.conn = seed_inventory(os.path.join(self.dir.name, "inventory.db"))
+
+    def tearDown(self):
+        self.conn.close()
+        self.dir.cleanup()
+
+    def expected(self, column, descending, where="cancelled=0"):
+        direction = " DESC" if descending else ""
+        cur = self.conn.execute(f"SELECT id FROM inventory WHERE {where} "
+                                f"ORDER BY IFNULL({column}, ''){direction}, id{direction}")
+        return [r[0] for r in cur.fetchall()]
+
+    def page_through(self, source):
+        ids, keys, after = [], [], None
+        while True:
+            page = source.fetch(after, self.PAGE)
+            if not page:
+                return ids, keys
+            ids += [values[0] for _, values in page]
+            keys += [key for key, _ in page]
+            after = page[-1][0]
+
+    def test_every_column_both_directions(self):
+        source = RecordSource(self.conn, FIELDS, "cancelled=0")
+        for column in FIELDS:
+            for descending in (False, True):
+                with self.subTest(column=column, descending=descending):
+                    ids, keys = self.page_through(source.sorted_by(column, descending))
+                    self.assertEqual(ids, self.expected(column, descending))
+
+    def test_key_at_matches_paging(self):
+        for column in ("branch", "date_acquired", "id"):
+            for descending in (False, True):
+                with self.subTest(column=column, descending=descending):
+                    sorted_source = RecordSource(self.conn, FIELDS, "cancelled=0").sorted_by(column, descending)
+                    _, keys = self.page_through(sorted_source)
+                    for offset in (0, 1, self.PAGE, len(keys) // 2, len(keys) - 1):
+                        self.assertEqual(sorted_source.key_at(offset), keys[offset])
+                    self.assertIsNone(sorted_source.key_at(len(keys)))
+
+    def test_search_sorted_by_column(self):
+        if not db.has_search_index(self.conn):
+            self.skipTest("SQLite built without FTS5")
+        search = SearchSource(self.conn, "LAPTOP", FIELDS, "cancelled=0")
+        where = ("cancelled=0 AND id IN (SELECT rowid FROM inventory_fts "
+                 "WHERE inventory_fts MATCH '\"LAPTOP\"')")
+        for descending in (False, True):
+            with self.subTest(descending=descending):
+                ids, _ = self.page_through(search.sorted_by("branch", descending))
+                self.assertEqual(ids, self.expected("branch", descending, where))
+                self.assertTrue(ids)
+
+
+class OptimisticEditTest(unittest.TestCase):
+    BASE = {"branch": "NORTH", "custodian": "ANA", "device_status": "ACTIVE"}
+
+    def test_disjoint_edits_merge(self):
+        mine = dict(self.BASE, custodian="BEN")
+        theirs = dict(self.BASE, branch="SOUTH")
+        merged, conflicts = merge_changes(self.BASE, mine, theirs)
+        self.assertEqual(conflicts, [])
+        self.assertEqual(merged, {"branch": "SOUTH", "custodian": "BEN", "device_status": "ACTIVE"})
+
+    def test_same_field_edits_conflict(self):
+        mine = dict(self.BASE, custodian="BEN")
+        theirs = dict(self.BASE, custodian="CARLA", branch="SOUTH")
+        merged, conflicts = merge_changes(self.BASE, mine, theirs)
+        self.assertEqual(conflicts, ["custodian"])
+        self.assertEqual(merged["custodian"], "CARLA")
+        self.assertEqual(merged["branch"], "SOUTH")
+
+    def test_same_value_on_both_sides_is_no_conflict(self):
+        mine = dict(self.BASE, custodian=None)
+        theirs = dict(self.BASE, custodian="")
+        self.assertEqual(merge_changes(self.BASE, mine, theirs)[1], [])
+
+    def test_stale_row_version_updates_nothing(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            conn = seed_inventory(os.path.join(tmp, "inventory.db"), rows=3)
+            try:
+                fields, version = load_record(conn, 1)
+                with conn:
+                    self.assertTrue(update_record(conn, 1, version, {"custodian": "BEN"}))
+                before = conn.total_changes
+                with conn:
+                    self.assertFalse(update_record(conn, 1, version, {"custodian": "CARLA"}))
+                self.assertEqual(conn.total_changes, before)
+                fields, new_version = load_record(conn, 1)
+                self.assertEqual(fields["custodian"], "BEN")
+                self.assertGreater(new_version, version)
+            finally:
+                conn.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from resultcache import ResultCache
+from writequeue import run_batch
+
+COUNT_SQL = "SELECT COUNT(*) FROM items"
+
+
+class ResultCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, "cache.db")
+        self.conn = self.connect()
+        with self.conn:
+            self.conn.execute("CREATE TABLE items (name TEXT)")
+            self.conn.execute("INSERT INTO items VALUES ('a')")
+        self.cache = ResultCache(self.connect)
+
+    def tearDown(self):
+        self.cache.close()
+        self.conn.close()
+        self.dir.cleanup()
+
+    def connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode = WAL")
+        return conn
+
+    def count(self):
+        return self.cache.fetch(self.conn, COUNT_SQL)[0][0]
+
+    def test_repeated_read_is_a_hit(self):
+        self.assertEqual(self.count(), 1)
+        self.assertEqual(self.count(), 1)
+        self.assertEqual(self.cache.stats()["hits"], 1)
+
+    def test_write_through_the_writer_connection_invalidates(self):
+        # the watcher is the writer itself, so data_version stays put: only the
+        # note_write() in run_batch tells the cache
+        cache = ResultCache(lambda: self.conn)
+        self.assertEqual(cache.fetch(self.conn, COUNT_SQL)[0][0], 1)
+        run_batch(self.conn, [lambda conn: conn.execute("INSERT INTO items VALUES ('b')")])
+        self.assertEqual(cache.fetch(self.conn, COUNT_SQL)[0][0], 2)
+        self.assertEqual(cache.stats()["hits"], 0)
+
+    def test_write_from_another_connection_invalidates(self):
+        self.assertEqual(self.count(), 1)
+        other = sqlite3.connect(self.path)  # no note_write(): only data_version tells
+        try:
+            with other:
+                other.execute("INSERT INTO items VALUES ('b')")
+        finally:
+            other.close()
+        self.assertEqual(self.count(), 2)
+        self.assertEqual(self.cache.stats()["hits"], 0)
+
+    def test_entry_over_a_quarter_of_the_budget_is_not_stored(self):
+        with self.conn:
+            self.conn.executemany("INSERT INTO items VALUES (?)", [("x" * 100,)] * 200)
+        self.cache.max_bytes = 16 * 1024
+        rows = self.cache.fetch(self.conn, "SELECT name FROM items")
+        self.assertEqual(len(rows), 201)
+        self.assertEqual(self.cache.stats()["entries"], 0)
+        self.cache.fetch(self.conn, COUNT_SQL)
+        self.assertEqual(self.cache.stats()["entries"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from widgets import AutocompleteCombobox, CompletionIndex
+
+ENTRIES = ["HOME OFFICE", "NORTH", "NORTH EAST", "SOUTH", "SOUTH EAST", "EAST COAST", "NORTHERN ISLES"]
+
+
+class CompletionIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = CompletionIndex(ENTRIES)
+
+    def test_prefix_matches(self):
+        self.assertEqual(self.index.prefixed("NORTH", 10), ["NORTH", "NORTH EAST", "NORTHERN ISLES"])
+        self.assertEqual(self.index.prefixed("NORTH", 2), ["NORTH", "NORTH EAST"])
+        self.assertEqual(self.index.prefixed("WEST", 10), [])
+
+    def test_substring_matches(self):
+        self.assertEqual({self.index.entries[p] for p in self.index.containing("EAST")},
+                         {"NORTH EAST", "SOUTH EAST", "EAST COAST"})
+        self.assertEqual(self.index.containing("WEST"), set())
+
+    def test_ranking(self):
+        # exact/prefix first, then matches at a word start, then other substrings
+        self.assertEqual(self.index.search("EAST"), ["EAST COAST", "NORTH EAST", "SOUTH EAST"])
+        self.assertEqual(self.index.search("OUT"), ["SOUTH", "SOUTH EAST"])
+        self.assertEqual(self.index.search(""), sorted(ENTRIES))
+
+    def test_case_insensitive(self):
+        self.assertEqual(self.index.search("north e"), ["NORTH EAST"])
+        self.assertEqual(self.index.search("Coast"), ["EAST COAST"])
+        self.assertEqual(CompletionIndex(["North", "NORTH"]).entries, ["NORTH"])
+
+    def test_result_cap(self):
+        limit = AutocompleteCombobox.MAX_RESULTS
+        index = CompletionIndex([f"BRANCH {i:03d}" for i in range(limit * 3)]
+                                + [f"OLD BRANCH {i:03d}" for i in range(limit * 3)])
+        self.assertEqual(len(index.search("BRA", limit)), limit)  # prefix matches alone fill it
+        self.assertEqual(len(index.search("RANCH", limit)), limit)  # substring matches only
+        self.assertEqual(index.search("RANCH", limit)[0], "BRANCH 000")
+
+
+if __name__ == "__main__":
+    unittest.main()
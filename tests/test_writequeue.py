@@ -0,0 +1,65 @@
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from writequeue import WriteQueue, run_batch
+
+
+def insert(name, fail=False):
+    def mutation(conn):
+        conn.execute("INSERT INTO items (name) VALUES (?)", (name,))
+        if fail:
+            raise ValueError(f"{name} failed")
+        return name
+    return mutation
+
+
+class GroupCommitTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, "queue.db")
+        conn = sqlite3.connect(self.path)
+        conn.execute("CREATE TABLE items (name TEXT)")
+        conn.close()
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def names(self):
+        conn = sqlite3.connect(self.path)
+        try:
+            return sorted(r[0] for r in conn.execute("SELECT name FROM items"))
+        finally:
+            conn.close()
+
+    def test_failure_rolls_back_only_its_savepoint(self):
+        conn = sqlite3.connect(self.path)
+        try:
+            outcomes = run_batch(conn, [insert("a"), insert("b", fail=True), insert("c")])
+            self.assertFalse(conn.in_transaction)
+        finally:
+            conn.close()
+        self.assertEqual([ok for ok, _ in outcomes], [True, False, True])
+        self.assertIsInstance(outcomes[1][1], ValueError)
+        self.assertEqual(self.names(), ["a", "c"])
+
+    def test_futures_of_one_batch(self):
+        queue = WriteQueue(lambda: sqlite3.connect(self.path), window_ms=500)
+        try:
+            futures = [queue.submit(insert("a")), queue.submit(insert("b", fail=True)),
+                       queue.submit(insert("c"))]
+            self.assertEqual(futures[0].result(10), "a")
+            with self.assertRaisesRegex(ValueError, "b failed"):
+                futures[1].result(10)
+            self.assertEqual(futures[2].result(10), "c")
+        finally:
+            queue.close()
+        self.assertEqual(self.names(), ["a", "c"])
+
+
+if __name__ == "__main__":
+    unittest.main()
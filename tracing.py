@@ -0,0 +1,272 @@
+"""
+Query instrumentation for the inventory and accounts connections.
+
+Connections opened by db.ConnectionManager use TracedConnection, whose cursors
+time every execute and the fetches that follow it. Per statement (whitespace-
+normalised SQL) we keep a call count, a latency histogram, rows returned or
+changed, and the call sites it was issued from. Statements slower than the
+threshold are written, with their bound values as reported by
+set_trace_callback, to a rotating slow_queries.log next to the database.
+
+Set INVENTORY_TRACE=0 to open plain connections instead.
+"""
+import logging
+import logging.handlers
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import Counter
+
+TRACE_ENABLED = os.environ.get("INVENTORY_TRACE", "1") != "0"
+SLOW_QUERY_MS = float(os.environ.get("INVENTORY_SLOW_QUERY_MS", 200))
+SLOW_LOG_BYTES = 1024 * 1024
+SLOW_LOG_BACKUPS = 3
+
+# histogram bucket upper bounds in milliseconds (the last bucket is open-ended)
+BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+MAX_CALL_SITES = 20
+
+_INTERNAL_FILES = (os.path.abspath(__file__), sqlite3.__file__)
+
+
+def normalize(sql):
+    return re.sub(r"\s+", " ", sql).strip()
+
+
+class StatementStats:
+    def __init__(self, sql):
+        self.sql = sql
+        self.calls = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+        self.histogram = [0] * (len(BUCKETS_MS) + 1)
+        self.call_sites = Counter()
+
+    def add(self, elapsed_ms, rows, call_site):
+        self.calls += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.rows += max(rows, 0)
+        for i, bound in enumerate(BUCKETS_MS):
+            if elapsed_ms <= bound:
+                self.histogram[i] += 1
+                break
+        else:
+            self.histogram[-1] += 1
+        if call_site in self.call_sites or len(self.call_sites) < MAX_CALL_SITES:
+            self.call_sites[call_site] += 1
+
+    def percentile(self, fraction):
+        """Upper bound (ms) of the bucket holding the given fraction of calls."""
+        target = fraction * self.calls
+        seen = 0
+        for i, count in enumerate(self.histogram):
+            seen += count
+            if count and seen >= target:
+                return BUCKETS_MS[i] if i < len(BUCKETS_MS) else self.max_ms
+        return 0.0
+
+
+_stats = {}
+_stats_lock = threading.Lock()
+_local = threading.local()  # last expanded statement seen by the trace callback on this thread
+_slow_logger = None
+
+
+def snapshot():
+    """Copy of the collected statistics, slowest total time first."""
+    with _stats_lock:
+        stats = []
+        for s in _stats.values():
+            copy = StatementStats(s.sql)
+            copy.calls, copy.total_ms, copy.max_ms, copy.rows = s.calls, s.total_ms, s.max_ms, s.rows
+            copy.histogram = list(s.histogram)
+            copy.call_sites = Counter(s.call_sites)
+            stats.append(copy)
+    return sorted(stats, key=lambda s: s.total_ms, reverse=True)
+
+
+def reset():
+    with _stats_lock:
+        _stats.clear()
+
+
+def set_slow_threshold(ms):
+    global SLOW_QUERY_MS
+    SLOW_QUERY_MS = float(ms)
+
+
+def slow_log_path():
+    from db import EXE_DIR
+    return EXE_DIR / "slow_queries.log"
+
+
+def _logger():
+    global _slow_logger
+    if _slow_logger is None:
+        logger = logging.getLogger("inventory.slow_queries")
+        logger.propagate = False
+        try:
+            handler = logging.handlers.RotatingFileHandler(slow_log_path(), maxBytes=SLOW_LOG_BYTES,
+                                                           backupCount=SLOW_LOG_BACKUPS, encoding="utf-8")
+        except OSError:
+            handler = logging.NullHandler()  # read-only install folder
+        handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        logger.addHandler(handler)
+        _slow_logger = logger
+    return _slow_logger
+
+
+def _call_site(depth=2):
+    """
+    Where a statement came from: the innermost ``depth`` frames outside this
+    module and sqlite3, e.g. "records.py:198 (fetch) < manage.py:91 (run)".
+    """
+    frame = sys._getframe(2)
+    sites = []
+    while frame is not None and len(sites) < depth:
+        if frame.f_code.co_filename not in _INTERNAL_FILES:
+            sites.append(f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_lineno} ({frame.f_code.co_name})")
+        frame = frame.f_back
+    return " < ".join(sites) or "?"
+
+
+def _trace(statement):
+    # keep the first statement after _begin(): the one issued, not its triggers
+    if getattr(_local, "last", None) is None:
+        _local.last = statement
+
+
+def _record(sql, elapsed_ms, rows, call_site, database):
+    key = normalize(sql)
+    with _stats_lock:
+        stats = _stats.get(key)
+        if stats is None:
+            stats = _stats[key] = StatementStats(key)
+        stats.add(elapsed_ms, rows, call_site)
+    if elapsed_ms >= SLOW_QUERY_MS:
+        expanded = getattr(_local, "last", None) or key
+        _local.last = None
+        _logger().warning("%.1f ms  rows=%d  db=%s  at %s\n    %s",
+                          elapsed_ms, rows, database, call_site, normalize(expanded))
+
+
+class TracedCursor(sqlite3.Cursor):
+    """Times execute*() plus the fetches that drain its result, and records them once done."""
+    _sql = None
+
+    def _begin(self, sql):
+        self._finish()
+        self._sql = sql
+        self._elapsed = 0.0
+        self._rows = 0
+        self._site = _call_site()
+        _local.last = None
+
+    def _finish(self):
+        if self._sql is not None:
+            sql, self._sql = self._sql, None
+            rows = self._rows if self._rows else self.rowcount
+            _record(sql, self._elapsed * 1000, rows, self._site, self.connection.database_name)
+
+    def _timed(self, fn, *args):
+        started = time.perf_counter()
+        try:
+            return fn(*args)
+        except Exception:
+            self._elapsed += time.perf_counter() - started
+            self._finish()
+            raise
+        finally:
+            if self._sql is not None:
+                self._elapsed += time.perf_counter() - started
+
+    def execute(self, sql, parameters=()):
+        self._begin(sql)
+        self._timed(super().execute, sql, parameters)
+        if self.description is None:  # nothing to fetch
+            self._finish()
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        self._begin(sql)
+        self._timed(super().executemany, sql, seq_of_parameters)
+        self._finish()
+        return self
+
+    def executescript(self, sql_script):
+        self._begin(sql_script)
+        self._timed(super().executescript, sql_script)
+        self._finish()
+        return self
+
+    def fetchone(self):
+        row = self._timed(super().fetchone)
+        if row is None:
+            self._finish()
+        else:
+            self._rows += 1
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self._timed(super().fetchmany, self.arraysize if size is None else size)
+        self._rows += len(rows)
+        if not rows:
+            self._finish()
+        return rows
+
+    def fetchall(self):
+        rows = self._timed(super().fetchall)
+        self._rows += len(rows)
+        self._finish()
+        return rows
+
+    def __next__(self):
+        try:
+            row = self._timed(super().__next__)
+        except StopIteration:
+            self._finish()
+            raise
+        self._rows += 1
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        # a result that was never drained (e.g. fetchone() of a single row)
+        if self._sql is not None:
+            try:
+                self._finish()
+            except Exception:
+                pass
+
+
+class TracedConnection(sqlite3.Connection):
+    """sqlite3 connection whose cursors (and execute shortcuts) are traced."""
+    def __init__(self, database, *args, **kwargs):
+        super().__init__(database, *args, **kwargs)
+        self.database_name = os.path.basename(str(database))
+        self.set_trace_callback(_trace)
+
+    def cursor(self, factory=TracedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
+
+
+def connection_factory():
+    """The factory= argument for sqlite3.connect(): traced unless INVENTORY_TRACE=0."""
+    return TracedConnection if TRACE_ENABLED else sqlite3.Connection
@@ -1,3 +1,4 @@
+import bisect
 import tkinter as tk
 from tkinter import ttk
 
@@ -37,17 +38,86 @@ def _attach_uppercase_var(widget):
         pass
 
 
+class CompletionIndex:
+    """
+    Lookup structure for autocompletion, built once per completion list.
+    - prefix matches: bisect over the sorted entries, O(log n + results)
+    - substring matches: trigram postings (built on the first substring
+      lookup), intersected smallest first and then verified, so only
+      candidate entries are compared
+    search() ranks exact match, then prefixes, then matches at a word start,
+    then other substrings (earlier position first), alphabetically within each.
+    Lookups ignore case: entries are kept in UPPERCASE, as the combobox shows them.
+    """
+    N = 3
+
+    def __init__(self, entries):
+        self.entries = sorted({entry.upper() for entry in entries})
+        self._grams = None
+
+    def prefixed(self, prefix, limit):
+        prefix = prefix.upper()
+        start = bisect.bisect_left(self.entries, prefix)
+        matches = []
+        for entry in self.entries[start:start + limit]:
+            if not entry.startswith(prefix):
+                break
+            matches.append(entry)
+        return matches
+
+    def containing(self, text):
+        """Positions of the entries containing ``text`` (3+ characters)."""
+        text = text.upper()
+        if self._grams is None:
+            self._grams = {}
+            for position, entry in enumerate(self.entries):
+                for i in range(len(entry) - self.N + 1):
+                    self._grams.setdefault(entry[i:i + self.N], set()).add(position)
+        postings = [self._grams.get(text[i:i + self.N]) for i in range(len(text) - self.N + 1)]
+        if not all(postings):
+            return set()
+        postings.sort(key=len)
+        candidates = set(postings[0]).intersection(*postings[1:])
+        return {p for p in candidates if text in self.entries[p]}
+
+    def search(self, text, limit=50):
+        text = text.upper()
+        if not text:
+            return self.entries[:limit]
+        ranked = self.prefixed(text, limit)
+        if len(ranked) < limit and len(text) >= self.N:
+            prefixes = set(ranked)
+            others = []
+            for position in self.containing(text):
+                entry = self.entries[position]
+                if entry in prefixes:
+                    continue
+                at = entry.find(text)
+                others.append((0 if not entry[at - 1].isalnum() else 1, at, entry))
+            ranked += [entry for _, _, entry in sorted(others)[:limit - len(ranked)]]
+        return ranked
+
+
 class AutocompleteCombobox(ttk.Combobox):
     """
     Combobox with autocomplete + uppercase behavior.
     - Completion list entries are stored/displayed in UPPERCASE.
     - Typed input is converted to UPPERCASE as the user types.
-    - Autocomplete/filtering starts after 3 characters.
+    - The dropdown is narrowed to the best MAX_RESULTS prefix/substring matches
+      (see CompletionIndex), DELAY_MS after the last key.
     """
+    MAX_RESULTS = 50
+    DELAY_MS = 80
+    NAVIGATION_KEYS = {"Up", "Down", "Return", "Escape", "Tab", "Left", "Right", "Home", "End"}
+
     def __init__(self, master=None, **kwargs):
         # ensure we have a usable textvariable we can trace
         super().__init__(master, **kwargs)
         self._completion_list = []
+        self._index = CompletionIndex([])
+        self._all_values = ()
+        self._shown_for = None
+        self._pending = None
         # attach uppercase var to the internal entry part
         _attach_uppercase_var(self)
 
@@ -70,20 +140,29 @@ class AutocompleteCombobox(ttk.Combobox):
         self.bind("<KeyRelease>", self._on_keyrelease)
 
     def set_completion_list(self, completion_list):
-        """Set and uppercase the completion list and populate values."""
+        """Set and uppercase the completion list, index it and populate values."""
         self._completion_list = [str(x).upper() for x in completion_list if x is not None]
-        self['values'] = tuple(self._completion_list)
+        self._index = CompletionIndex(self._completion_list)
+        self._all_values = tuple(self._completion_list)
+        self._shown_for = None
+        self['values'] = self._all_values
 
     def _on_keyrelease(self, event):
-        typed = self.get().upper()  # user input is kept uppercase by attached var
-        if len(typed) < 3:
-            # show full list for <3 chars
-            self['values'] = tuple(self._completion_list)
-            self.current_index = -1
+        if event.keysym in self.NAVIGATION_KEYS:
             return
+        # narrow once typing pauses, not on every key of a fast typist
+        if self._pending is not None:
+            self.after_cancel(self._pending)
+        self._pending = self.after(self.DELAY_MS, self._update_values)
 
-        matches = [item for item in self._completion_list if item.startswith(typed)]
-        self['values'] = tuple(matches if matches else self._completion_list)
+    def _update_values(self):
+        self._pending = None
+        typed = self.get().upper().strip()  # user input is kept uppercase by attached var
+        if typed == self._shown_for:
+            return
+        self._shown_for = typed
+        matches = self._index.search(typed, self.MAX_RESULTS) if typed else None
+        self['values'] = tuple(matches) if matches else self._all_values
         self.current_index = -1
 
     def _select_next(self, event):
@@ -126,6 +205,32 @@ class UppercaseEntry(ttk.Entry):
             var.trace("w", lambda *a: var.set(var.get().upper()) if var.get() != var.get().upper() else None)
 
 
+class ProgressDialog(tk.Toplevel):
+    """
+    Small modal window with a label and a progress bar for long-running jobs.
+    Call update_progress(processed, total) as work advances (total may be None).
+    """
+    def __init__(self, master, title, verb="Processed"):
+        super().__init__(master)
+        self.title(title)
+        self.transient(master)
+        self.verb = verb
+        self.label = tk.Label(self, text="Starting...", width=40)
+        self.label.pack(padx=15, pady=(15, 5))
+        self.bar = ttk.Progressbar(self, length=300, mode="determinate")
+        self.bar.pack(padx=15, pady=(0, 15))
+        self.grab_set()
+
+    def update_progress(self, processed, total=None):
+        if total:
+            self.bar["value"] = 100 * processed / total
+            self.label.config(text=f"{self.verb} {processed:,} of {total:,} rows")
+        else:
+            self.bar.config(mode="indeterminate")
+            self.bar.step(10)
+            self.label.config(text=f"{self.verb} {processed:,} rows")
+
+
 def add_row(frame, row, col, label_text, widget, label_colspan=1, widget_colspan=1, sticky="w"):
     """
     Place a label and widget in the grid.
@@ -143,3 +248,440 @@ def add_row(frame, row, col, label_text, widget, label_colspan=1, widget_colspan
     widget.grid(
         row=row, column=col + label_colspan, columnspan=widget_colspan, padx=5, pady=5, sticky=sticky
     )
+
+
+class FacetPanel(ttk.Frame):
+    """
+    Filter sidebar: one multi-select list per facet showing "VALUE (count)",
+    plus a From/To date range.
+    - facets: [(key, label)]; on_change() is called (debounced) on every change
+    - selection() -> {key: [values]}, date_range() -> (start, end)
+    - set_counts({key: [(value, count)]}) refills the lists and keeps the selection
+    """
+    def __init__(self, master, facets, on_change, date_label="DATE ACQUIRED", delay_ms=250, **kwargs):
+        super().__init__(master, **kwargs)
+        self.on_change = on_change
+        self.delay_ms = delay_ms
+        self._lists = {}
+        self._values = {}
+        self._selected = {}
+        self._pending = None
+        for key, label in facets:
+            frame = ttk.LabelFrame(self, text=label, padding=3)
+            frame.pack(fill="both", expand=True, pady=2)
+            listbox = tk.Listbox(frame, selectmode="multiple", exportselection=False, height=5, width=30)
+            scroll = ttk.Scrollbar(frame, orient="vertical", command=listbox.yview)
+            listbox.configure(yscrollcommand=scroll.set)
+            listbox.pack(side="left", fill="both", expand=True)
+            scroll.pack(side="right", fill="y")
+            listbox.bind("<<ListboxSelect>>", lambda e, k=key: self._on_select(k))
+            self._lists[key], self._values[key], self._selected[key] = listbox, [], set()
+
+        date_frame = ttk.LabelFrame(self, text=date_label, padding=3)
+        date_frame.pack(fill="x", pady=2)
+        self._start = tk.StringVar()
+        self._end = tk.StringVar()
+        for row, (text, var) in enumerate((("From", self._start), ("To", self._end))):
+            tk.Label(date_frame, text=text).grid(row=row, column=0, padx=3, sticky="w")
+            entry = tk.Entry(date_frame, textvariable=var, width=12)
+            entry.grid(row=row, column=1, padx=3, pady=1, sticky="w")
+            entry.bind("<Return>", lambda e: self._changed())
+            entry.bind("<FocusOut>", lambda e: self._changed())
+        tk.Label(date_frame, text="YYYY[-MM[-DD]]", fg="gray").grid(row=0, column=2, rowspan=2, padx=3)
+        tk.Button(self, text="🧹 Clear Filters", command=self.clear).pack(fill="x", pady=4)
+        self._last = self._state()
+
+    def selection(self):
+        return {key: sorted(values) for key, values in self._selected.items() if values}
+
+    def date_range(self):
+        return (self._start.get().strip() or None, self._end.get().strip() or None)
+
+    def is_active(self):
+        return bool(self.selection()) or self.date_range() != (None, None)
+
+    def set_counts(self, counts):
+        for key, listbox in self._lists.items():
+            pairs = list(counts.get(key, []))
+            # a selected value stays listed even when nothing matches it any more
+            present = {value for value, _ in pairs}
+            pairs = sorted(pairs + [(value, 0) for value in self._selected[key] if value not in present])
+            self._values[key] = [value for value, _ in pairs]
+            listbox.delete(0, tk.END)
+            for index, (value, count) in enumerate(pairs):
+                listbox.insert(tk.END, f"{value or '(BLANK)'} ({count:,})")
+                if value in self._selected[key]:
+                    listbox.selection_set(index)
+
+    def clear(self):
+        for key, listbox in self._lists.items():
+            listbox.selection_clear(0, tk.END)
+            self._selected[key] = set()
+        self._start.set("")
+        self._end.set("")
+        self._changed()
+
+    def _state(self):
+        return self.selection(), self.date_range()
+
+    def _on_select(self, key):
+        values = self._values[key]
+        self._selected[key] = {values[i] for i in self._lists[key].curselection()}
+        self._changed()
+
+    def _changed(self):
+        # coalesce a burst of clicks into one query
+        if self._pending is not None:
+            self.after_cancel(self._pending)
+        self._pending = self.after(self.delay_ms, self._fire)
+
+    def _fire(self):
+        self._pending = None
+        state = self._state()
+        if state != self._last:
+            self._last = state
+            self.on_change()
+
+
+class VirtualTreeview(ttk.Treeview):
+    """
+    Treeview that only materializes the visible window of a record source.
+    - Rows are fetched a page at a time with keyset queries as the user scrolls.
+    - Only the visible rows plus a small buffer exist as Tk items; each item id
+      is the record id, so tree.focus() / tree.item(...) keep working as usual.
+    - Attach a scrollbar the usual way:
+        sb = ttk.Scrollbar(..., command=tree.yview); tree.configure(yscroll=sb.set)
+      the scrollbar then reflects the whole result set, not the materialized rows.
+    - enable_sorting() makes the headings sort the source in SQL.
+    """
+    def __init__(self, master=None, page_size=200, buffer_rows=5, row_tags=None, **kwargs):
+        self._yscroll = kwargs.pop("yscrollcommand", None) or kwargs.pop("yscroll", None)
+        super().__init__(master, **kwargs)
+        self.page_size = page_size
+        self.buffer_rows = buffer_rows
+        self.row_tags = row_tags  # optional callable(values) -> tag name
+
+        self._source = None
+        self._total = 0
+        self._offset = 0
+        self._visible = int(kwargs.get("height", 10))
+        self._pages = {}            # page index -> [(key, values), ...]
+        self._page_after = {0: None}  # page index -> key the page starts after
+        self._shown = {}            # iid -> (values, tags) currently in the widget
+        self._render_pending = False
+        self._headings = None       # column -> heading text without the sort arrow
+        self._sort_executor = None
+        self._sort_key = None
+
+        self.bind("<MouseWheel>", self._on_mousewheel)
+        self.bind("<Button-4>", self._on_mousewheel)
+        self.bind("<Button-5>", self._on_mousewheel)
+        self.bind("<Configure>", self._on_configure)
+        for key in ("<Up>", "<Down>", "<Prior>", "<Next>", "<Home>", "<End>"):
+            self.bind(key, self._on_key)
+
+    # --- public API ---
+    @property
+    def source(self):
+        return self._source
+
+    @property
+    def total(self):
+        return self._total
+
+    def set_source(self, source, total=None, first_page=None):
+        """
+        Show a new record source, starting from the top. ``total`` and
+        ``first_page`` may be passed when they were already fetched (e.g. on a
+        worker thread) to avoid querying again.
+        """
+        self._source = source
+        self._offset = 0
+        self._show_sort()
+        if total is None:
+            self.refresh()
+            return
+        self._pages = {0: first_page} if first_page is not None else {}
+        self._page_after = {0: None}
+        if first_page is not None and len(first_page) == self.page_size:
+            self._page_after[1] = first_page[-1][0]
+        self._total = total
+        self._render()
+
+    def enable_sorting(self, executor=None, key="sort"):
+        """
+        Sort by clicking a column heading, again for descending. The order goes
+        into the source's SQL (source.sorted_by) and only the first page is
+        read; with ``executor`` (worker.QueryExecutor) it is read on a worker
+        thread under ``key``. A new source from set_source() starts unsorted
+        unless it is already sorted.
+        """
+        self._headings = {column: self.heading(column, "text") for column in self["columns"]}
+        self._sort_executor, self._sort_key = executor, key
+        for index, column in enumerate(self["columns"]):
+            self.heading(column, command=lambda i=index: self._on_heading(i))
+        self._show_sort()
+
+    def refresh(self):
+        """Drop cached pages, recount and redraw the current window."""
+        self._pages.clear()
+        self._page_after = {0: None}
+        self._total = self._source.count() if self._source is not None else 0
+        self._offset = max(0, min(self._offset, self._total - self._visible))
+        self._render()
+
+    def apply_changes(self, ids, max_patch=500):
+        """
+        Patch the view after the records in ``ids`` were inserted, updated or
+        cancelled, touching only the affected Tk items. Rows that keep their
+        place are updated in the page cache; pages from the first moved,
+        added or removed row onwards are dropped and re-fetched on render.
+        Large change sets (e.g. an import) fall back to refresh().
+        """
+        if self._source is None or not ids:
+            return
+        ids = {int(i) for i in ids}
+        if len(ids) > max_patch:
+            self.refresh()
+            return
+        now = {values[0]: (key, values) for key, values in self._source.fetch_ids(ids)}
+
+        cached = {}
+        for data in self._pages.values():
+            for position, (key, values) in enumerate(data):
+                if values[0] in ids:
+                    cached[values[0]] = (data, position, key)
+
+        moved = []  # keys where the row sequence changed
+        reset = False
+        for record_id in ids:
+            if record_id in cached:
+                data, position, key = cached[record_id]
+                if record_id in now and now[record_id][0] == key:
+                    data[position] = now[record_id]  # same place, new values
+                    continue
+                moved.append(key)
+            else:
+                key = self._source.key_for_id(record_id)
+                if key is None:
+                    reset = True  # cannot tell where the row used to be
+                else:
+                    moved.append(key)
+            if record_id in now:
+                moved.append(now[record_id][0])
+
+        if reset:
+            self._pages.clear()
+            self._page_after = {0: None}
+        elif moved:
+            # keys grow along the view, or shrink when the source is sorted descending
+            if getattr(self._source, "descending", False):
+                first = max(moved)
+                start = max(i for i, after in self._page_after.items() if after is None or after > first)
+            else:
+                first = min(moved)
+                start = max(i for i, after in self._page_after.items() if after is None or after < first)
+            for index in [i for i in self._pages if i >= start]:
+                del self._pages[index]
+            for index in [i for i in self._page_after if i > start]:
+                del self._page_after[index]
+        self._total = self._source.count()
+        self._offset = max(0, min(self._offset, self._total - self._visible))
+        self._render()
+
+    def configure(self, cnf=None, **kw):
+        # keep the scrollbar callback for ourselves: Tk only knows the materialized rows
+        if isinstance(cnf, dict):
+            kw = dict(cnf, **kw)
+            cnf = None
+        had_options = bool(kw)
+        for name in ("yscrollcommand", "yscroll"):
+            if name in kw:
+                self._yscroll = kw.pop(name)
+        if had_options and not kw:
+            return None
+        return super().configure(cnf, **kw)
+
+    config = configure
+
+    def yview(self, *args):
+        if not args:
+            return self._fractions()
+        if args[0] == "moveto":
+            self._scroll_to(int(float(args[1]) * self._total))
+        elif args[0] == "scroll":
+            step = self._visible if str(args[2]).startswith("page") else 1
+            self._scroll_to(self._offset + int(args[1]) * step)
+
+    def yview_moveto(self, fraction):
+        self.yview("moveto", fraction)
+
+    def yview_scroll(self, number, what):
+        self.yview("scroll", number, what)
+
+    # --- sorting ---
+    def _on_heading(self, index):
+        source = self._source
+        if source is None or not hasattr(source, "sorted_by"):
+            return
+        column = source.columns[index]
+        current, current_descending = source.sort or ("id", False)
+        sorted_source = source.sorted_by(column, current == column and not current_descending)
+        total = self._total  # same rows, new order
+        if self._sort_executor is None:
+            self.set_source(sorted_source, total=total)
+            return
+        conn = sorted_source.conn
+
+        def run(reader):
+            sorted_source.conn = reader
+            return sorted_source.fetch(None, self.page_size)
+
+        def show(first_page):
+            sorted_source.conn = conn
+            self.set_source(sorted_source, total=total, first_page=first_page)
+
+        self._sort_executor.submit(run, show, key=self._sort_key)
+
+    def _show_sort(self):
+        if self._headings is None:
+            return
+        sort = getattr(self._source, "sort", None)
+        for index, column in enumerate(self["columns"]):
+            text = self._headings[column]
+            if sort and self._source.columns[index] == sort[0]:
+                text += " ▼" if sort[1] else " ▲"
+            self.heading(column, text=text)
+
+    # --- paging ---
+    def _page(self, index):
+        if index in self._pages:
+            return self._pages[index]
+        if index in self._page_after:
+            after = self._page_after[index]
+        else:
+            # jumped past the pages we know: find where this page starts once
+            after = self._source.key_at(index * self.page_size - 1)
+            if after is None:
+                return []
+        data = self._source.fetch(after, self.page_size)
+        self._pages[index] = data
+        if len(data) == self.page_size:
+            self._page_after[index + 1] = data[-1][0]
+        return data
+
+    def _window(self, offset, count):
+        rows = []
+        page = offset // self.page_size
+        start = offset - page * self.page_size
+        while len(rows) < count:
+            data = self._page(page)
+            rows.extend(data[start:])
+            if len(data) < self.page_size:
+                break
+            start = 0
+            page += 1
+        # keep only the pages around the current window in memory
+        current = offset // self.page_size
+        for index in [i for i in self._pages if i < current - 1 or i > current + 2]:
+            del self._pages[index]
+        return rows[:count]
+
+    # --- rendering ---
+    def _fractions(self):
+        if not self._total:
+            return (0.0, 1.0)
+        first = self._offset / self._total
+        last = min(1.0, (self._offset + self._visible) / self._total)
+        return (first, last)
+
+    def _scroll_to(self, offset, now=False):
+        offset = max(0, min(offset, self._total - self._visible))
+        if offset == self._offset and not now:
+            return
+        self._offset = offset
+        if now:
+            self._render()
+        elif not self._render_pending:
+            # coalesce bursts of scroll events (e.g. dragging the scrollbar)
+            self._render_pending = True
+            self.after_idle(self._render)
+
+    def _render(self):
+        self._render_pending = False
+        rows = []
+        if self._source is not None and self._total:
+            rows = self._window(self._offset, self._visible + self.buffer_rows)
+
+        wanted = []
+        for index, (_, values) in enumerate(rows):
+            iid = str(values[0])
+            tag = self.row_tags(values) if self.row_tags else ""
+            tags = (tag,) if tag else ()
+            if iid in self._shown:
+                if self._shown[iid] != (values, tags):
+                    self.item(iid, values=values, tags=tags)
+                self.move(iid, "", index)
+            else:
+                self.insert("", index, iid=iid, values=values, tags=tags)
+            self._shown[iid] = (values, tags)
+            wanted.append(iid)
+
+        wanted_set = set(wanted)
+        stale = [iid for iid in self._shown if iid not in wanted_set]
+        if stale:
+            self.delete(*stale)
+            for iid in stale:
+                del self._shown[iid]
+
+        self.tk.call(self._w, "yview", "moveto", 0)
+        if self._yscroll:
+            self._yscroll(*self._fractions())
+
+    # --- events ---
+    def _rowheight(self):
+        try:
+            return int(ttk.Style(self).lookup(self.cget("style") or "Treeview", "rowheight")) or 20
+        except (tk.TclError, ValueError):
+            return 20
+
+    def _on_configure(self, event):
+        rowheight = self._rowheight()
+        # the heading takes roughly one row
+        visible = max(1, (event.height - rowheight) // rowheight)
+        if visible != self._visible:
+            self._visible = visible
+            self._scroll_to(self._offset, now=True)
+
+    def _on_mousewheel(self, event):
+        if event.num == 4:
+            delta = -1
+        elif event.num == 5:
+            delta = 1
+        else:
+            delta = -1 if event.delta > 0 else 1
+        self._scroll_to(self._offset + delta * 3)
+        return "break"
+
+    def _on_key(self, event):
+        if not self._total:
+            return "break"
+        children = self.get_children()
+        focus = self.focus()
+        position = self._offset + (children.index(focus) if focus in children else 0)
+        moves = {
+            "Up": position - 1, "Down": position + 1,
+            "Prior": position - self._visible, "Next": position + self._visible,
+            "Home": 0, "End": self._total - 1,
+        }
+        target = max(0, min(self._total - 1, moves.get(event.keysym, position)))
+        if target < self._offset:
+            self._scroll_to(target, now=True)
+        elif target >= self._offset + self._visible:
+            self._scroll_to(target - self._visible + 1, now=True)
+        children = self.get_children()
+        index = target - self._offset
+        if 0 <= index < len(children):
+            self.focus(children[index])
+            self.selection_set(children[index])
+        return "break"
@@ -0,0 +1,144 @@
+"""
+Background query executor: runs database work on worker threads and hands the
+results back to the Tk main loop, so heavy loads, searches and imports never
+freeze the window.
+"""
+import queue
+import sqlite3
+import sys
+import threading
+from tkinter import messagebox
+
+from db import DB_FILE, get_manager
+
+POLL_MS = 16  # drain results roughly once per frame at 60 fps
+
+
+class Job:
+    def __init__(self, fn, callback, errback, key, write):
+        self.fn = fn
+        self.callback = callback
+        self.errback = errback
+        self.key = key
+        self.write = write
+        self.cancelled = False
+        self.conn = None  # set while fn runs, so cancel() can interrupt it
+        self.lock = threading.Lock()
+
+
+class QueryExecutor:
+    """
+    - submit(fn, callback, errback=None, key=None, write=False):
+        run fn(conn) on a worker thread; callback(result) / errback(exc) are
+        then called on the Tk thread. conn is a pooled read-only connection,
+        or a private write connection when write=True (e.g. bulk imports).
+    - A new submission with the same key supersedes the previous one: a queued
+      job is skipped and a running job is interrupted (Connection.interrupt())
+      with its result dropped.
+    - post(fn, *args) lets a running job schedule UI updates (e.g. progress).
+    """
+    def __init__(self, root, workers=2, path=None):
+        self.root = root
+        self.path = path or DB_FILE
+        self._jobs = queue.Queue()
+        self._results = queue.Queue()
+        self._latest = {}      # key -> newest Job
+        self._outstanding = 0  # jobs submitted but not yet delivered (Tk thread only)
+        self._polling = False
+        for i in range(workers):
+            threading.Thread(target=self._work, name=f"query-worker-{i}", daemon=True).start()
+
+    def submit(self, fn, callback=None, errback=None, key=None, write=False):
+        if key is not None:
+            self.cancel(key)
+        job = Job(fn, callback, errback or self._show_error, key, write)
+        if key is not None:
+            self._latest[key] = job
+        self._outstanding += 1
+        self._jobs.put(job)
+        self._start_polling()
+        return job
+
+    def cancel(self, key):
+        job = self._latest.pop(key, None)
+        if job is not None:
+            job.cancelled = True
+            with job.lock:
+                if job.conn is not None:
+                    job.conn.interrupt()  # its statement fails with "interrupted"
+
+    def post(self, fn, *args):
+        """Thread-safe: call fn(*args) on the Tk thread."""
+        self._results.put((None, fn, args))
+
+    # --- worker side ---
+    def _work(self):
+        manager = get_manager(self.path)
+        while True:
+            job = self._jobs.get()
+            if job.cancelled:
+                self._results.put((job, None, ()))
+                continue
+            try:
+                if job.write:
+                    with manager.connection() as conn:
+                        result = self._run(job, conn)
+                else:
+                    with manager.reader() as conn:
+                        result = self._run(job, conn)
+            except Exception as exc:
+                self._results.put((job, job.errback, (exc,)))
+            else:
+                self._results.put((job, job.callback, (result,)))
+
+    def _run(self, job, conn):
+        with job.lock:
+            if job.cancelled:
+                raise sqlite3.OperationalError("interrupted")
+            job.conn = conn
+        try:
+            return job.fn(conn)
+        finally:
+            # the connection goes back to the pool: it must not be interrupted any more
+            with job.lock:
+                job.conn = None
+
+    # --- Tk side ---
+    def _start_polling(self):
+        if not self._polling:
+            self._polling = True
+            self.root.after(POLL_MS, self._drain)
+
+    def _drain(self):
+        while True:
+            try:
+                job, fn, args = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if job is not None:
+                self._outstanding -= 1
+                if job.cancelled:
+                    continue
+                if job.key is not None and self._latest.get(job.key) is job:
+                    del self._latest[job.key]
+            if fn is not None:
+                try:
+                    fn(*args)
+                except Exception:
+                    self.root.report_callback_exception(*sys.exc_info())
+        if self._outstanding:
+            self.root.after(POLL_MS, self._drain)
+        else:
+            self._polling = False
+
+    def _show_error(self, exc):
+        messagebox.showerror("Database Error", str(exc))
+
+
+_executors = {}
+
+def get_executor(root):
+    """The executor shared by every tab of this Tk root."""
+    if root not in _executors:
+        _executors[root] = QueryExecutor(root)
+    return _executors[root]
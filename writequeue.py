@@ -0,0 +1,118 @@
+"""
+Group commit for small inventory mutations.
+
+Saves, edits, cancels, restores and category changes are submitted as
+mutation callables ``fn(conn)``. A writer thread with its own connection
+gathers the mutations that arrive within WINDOW_MS into a single
+transaction, one SAVEPOINT per mutation, and commits once. Each mutation
+is acknowledged (result or exception) only after that COMMIT has
+succeeded. A failing mutation is rolled back to its savepoint without
+affecting the others.
+
+Mutations must not call commit()/rollback() themselves.
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from resultcache import note_write
+
+WINDOW_MS = float(os.environ.get("INVENTORY_GROUP_COMMIT_MS", 5))
+MAX_BATCH = 200
+
+
+def run_batch(conn, mutations):
+    """
+    Run ``mutations`` in one transaction on ``conn``, each under its own
+    savepoint. Returns [(ok, result_or_exception)] in order. When the
+    transaction itself cannot begin or commit, every mutation fails with that error.
+    """
+    cur = conn.cursor()
+    outcomes = []
+    try:
+        cur.execute("BEGIN IMMEDIATE")
+        for fn in mutations:
+            cur.execute("SAVEPOINT mutation")
+            try:
+                result = fn(conn)
+            except Exception as exc:
+                cur.execute("ROLLBACK TO mutation")
+                cur.execute("RELEASE mutation")
+                outcomes.append((False, exc))
+            else:
+                cur.execute("RELEASE mutation")
+                outcomes.append((True, result))
+        conn.commit()
+        note_write()
+    except Exception as exc:
+        if conn.in_transaction:
+            conn.rollback()
+        return [(False, exc)] * len(mutations)
+    return outcomes
+
+
+class WriteQueue:
+    """
+    - submit(fn): queue fn(conn); returns a Future resolved after the commit.
+    - run(fn): submit and wait; returns fn's result or raises its exception.
+    """
+    def __init__(self, connect, window_ms=WINDOW_MS, max_batch=MAX_BATCH):
+        self.connect = connect
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self._jobs = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, fn):
+        future = Future()
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._work, name="group-commit", daemon=True)
+                self._thread.start()
+        self._jobs.put((fn, future))
+        return future
+
+    def run(self, fn, timeout=None):
+        return self.submit(fn).result(timeout)
+
+    def execute(self, sql, parameters=()):
+        """Queue a single statement; returns its cursor's rowcount."""
+        return self.run(lambda conn: conn.execute(sql, parameters).rowcount)
+
+    def close(self):
+        if self._thread is not None:
+            self._jobs.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def _work(self):
+        conn = self.connect()
+        try:
+            while True:
+                job = self._jobs.get()
+                if job is None:
+                    return
+                batch = [job]
+                # gather whatever else arrives within the window into the same commit
+                deadline = time.monotonic() + self.window
+                while len(batch) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    try:
+                        job = self._jobs.get(timeout=remaining) if remaining > 0 else self._jobs.get_nowait()
+                    except queue.Empty:
+                        break
+                    if job is None:
+                        self._jobs.put(None)  # finish this batch, then stop
+                        break
+                    batch.append(job)
+                outcomes = run_batch(conn, [fn for fn, _ in batch])
+                for (_, future), (ok, value) in zip(batch, outcomes):
+                    if ok:
+                        future.set_result(value)
+                    else:
+                        future.set_exception(value)
+        finally:
+            conn.close()